@@ -19,11 +19,14 @@ import sys
 if sys.hexversion < 0x3040000:
     sys.exit("Python 3.4+ required")
 
+import os
 import json
+import signal
 import logging
 from . import version, config, option, output, extractor, job, util, exception
 
 __version__ = version.__version__
+_jobtype = None
 
 
 def progress(urls, pformat):
@@ -36,6 +39,139 @@ def progress(urls, pformat):
         yield pinfo["url"]
 
 
+def setup_unsupported_logging(mode=None):
+    """Setup the 'unsupported' logger if an output file is configured"""
+    handler = output.setup_logging_handler(
+        "unsupportedfile", fmt="{message}", mode=mode)
+    if handler:
+        ulog = logging.getLogger("unsupported")
+        ulog.addHandler(handler)
+        ulog.propagate = False
+        job.Job.ulog = ulog
+
+
+def run_processes(jobtype, urls, num, loglevel, pformat=None):
+    """Run jobs for all 'urls' in a pool of 'num' worker processes"""
+    import multiprocessing
+
+    # use 'spawn' on all platforms; a forked process would inherit
+    # open SQLite connections and other state of its parent
+    context = multiprocessing.get_context("spawn")
+    initargs = (config.get(()), loglevel, jobtype, job.UrlJob.maxdepth)
+    retval = 0
+
+    with context.Pool(num, _process_init, initargs) as pool:
+        for status in pool.imap_unordered(
+                _process_run, _process_tasks(urls, pformat)):
+            retval |= status
+    return retval
+
+
+def _process_tasks(urls, pformat):
+    """Yield (url, config, progress-info) tuples for each URL"""
+    if pformat is True:
+        pformat = "[{current}/{total}] {url}"
+    pinfo = None
+    gconf = []
+
+    for current, url in enumerate(urls, 1):
+        if pformat:
+            pinfo = pformat.format_map(
+                {"current": current, "total": len(urls), "url": url})
+        if isinstance(url, util.ExtendedUrl):
+            # '-G' options stay active for all following URLs
+            gconf = gconf + url.gconfig
+            yield url.value, gconf + url.lconfig, pinfo
+        else:
+            yield url, gconf, pinfo
+
+
+def _process_init(conf, loglevel, jobtype, maxdepth):
+    """Initialize a worker process started by run_processes()"""
+    global _jobtype
+    _jobtype = jobtype
+    job.UrlJob.maxdepth = maxdepth
+
+    for key, value in conf.items():
+        config.set((key,), value)
+
+    output.initialize_logging(loglevel)
+    output.configure_logging_handler("log", logging.getLogger().handlers[0])
+    handler = output.setup_logging_handler("logfile", lvl=loglevel, mode="a")
+    if handler:
+        logging.getLogger().addHandler(handler)
+    setup_unsupported_logging("a")
+
+
+def _terminate(signum, frame):
+    """Exit normally on SIGTERM to run all cleanup code"""
+    sys.exit(128 + signum)
+
+
+def _process_run(task):
+    """Run a single job inside a worker process"""
+    url, conf, pinfo = task
+    if pinfo:
+        print(pinfo, file=sys.stderr)
+    try:
+        with config.apply(conf):
+            return _jobtype(url).run()
+    except exception.NoExtractorError:
+        logging.getLogger("gallery-dl").error(
+            "No suitable extractor found for '%s'", url)
+        return 1
+    except KeyboardInterrupt:
+        return 1
+
+
+def manage_archive(args, log):
+    """Run download archive maintenance tasks"""
+    from . import archive
+    path = config.interpolate(("extractor", "archive"))
+    if not path:
+        log.error("No download archive specified (--download-archive)")
+        return 1
+    path = util.expand_path(path)
+
+    if args.archive_merge:
+        archive.merge(
+            path, [util.expand_path(source) for source in args.archive_merge],
+            config.interpolate(("extractor", "archive-hash"), False),
+            config.interpolate(("extractor", "archive-hash-keys"), False),
+            logging.getLogger("archive"))
+    elif not os.path.exists(path):
+        log.error("Download archive '%s' does not exist", path)
+        return 1
+
+    if args.archive_vacuum:
+        size = os.path.getsize(path)
+        log.info("Reduced size of '%s' from %d to %d bytes",
+                 path, size, archive.vacuum(path))
+
+    if args.archive_export:
+        if args.archive_export == "-":
+            archive.export(path, sys.stdout)
+        else:
+            with open(util.expand_path(args.archive_export), "w",
+                      encoding="utf-8") as file:
+                count = archive.export(path, file)
+            log.info("Exported %d entries", count)
+
+    if args.archive_stats:
+        info = archive.stats(path, sorted(set(
+            extr.category for extr in extractor.extractors())))
+        print("File    :", path)
+        print("Format  :", info["format"])
+        print("Entries :", info["entries"])
+        if info["keys"] != info["entries"]:
+            print("Keys    :", info["keys"])
+        print("Size    : {:.1f} MiB ({:.1f} MiB unused)".format(
+            info["size"] / 1048576, info["free"] / 1048576))
+        for category, count in sorted(info.get("categories", {}).items()):
+            print("  {:<20} {:>10}".format(category, count))
+    return 0
+
+
 def parse_inputfile(file, log):
     """Filter and process strings from an input file.
 
@@ -106,6 +242,7 @@ def parse_inputfile(file, log):
 
 
 def main():
+    retval = 0
     try:
         if sys.stdout.encoding.lower() != "utf-8":
             output.replace_std_streams()
@@ -185,6 +322,9 @@ def main():
                 if test:
                     print("Example :", test[0])
                 print()
+        elif (args.archive_stats or args.archive_vacuum or
+              args.archive_merge or args.archive_export):
+            return manage_archive(args, log)
         elif args.clear_cache:
             from . import cache
             log = logging.getLogger("cache")
@@ -197,6 +337,21 @@ def main():
                     "Deleted %d %s from '%s'",
                     cnt, "entry" if cnt == 1 else "entries", cache._path(),
                 )
+        elif args.cache_stats:
+            from . import cache
+            info = cache.stats()
+
+            if info is None:
+                log.error("Database file not available")
+                return 1
+            print("File    :", info["path"])
+            print("Entries : {} ({} expired)".format(
+                info["entries"], info["expired"]))
+            print("Size    : {:.1f} MiB ({:.1f} MiB unused)".format(
+                info["size"] / 1048576, info["free"] / 1048576))
+            for name, func in sorted(info["functions"].items()):
+                print("  {:<50} {:>6} {:>10}".format(
+                    name, func["entries"], func["size"]))
         else:
             if not args.urls and not args.inputfile:
                 parser.error(
@@ -222,16 +377,20 @@ def main():
                     log.warning("input file: %s", exc)
 
             # unsupported file logging handler
-            handler = output.setup_logging_handler(
-                "unsupportedfile", fmt="{message}")
-            if handler:
-                ulog = logging.getLogger("unsupported")
-                ulog.addHandler(handler)
-                ulog.propagate = False
-                job.Job.ulog = ulog
+            setup_unsupported_logging()
+
+            # write download archives etc. when getting terminated
+            signal.signal(signal.SIGTERM, _terminate)
 
             pformat = config.get(("output", "progress"), True)
-            if pformat and len(urls) > 1 and args.loglevel < logging.ERROR:
+            if not pformat or len(urls) <= 1 or args.loglevel >= logging.ERROR:
+                pformat = None
+
+            if args.processes and args.processes > 1 and len(urls) > 1:
+                return run_processes(
+                    jobtype, urls, args.processes, args.loglevel, pformat)
+
+            if pformat:
                 urls = progress(urls, pformat)
 
             for url in urls:
@@ -241,11 +400,15 @@ def main():
                         for key, value in url.gconfig:
                             config.set(key, value)
                         with config.apply(url.lconfig):
-                            jobtype(url.value).run()
+                            retval |= jobtype(url.value).run()
                     else:
-                        jobtype(url).run()
+                        retval |= jobtype(url).run()
                 except exception.NoExtractorError:
                     log.error("No suitable extractor found for '%s'", url)
+                    retval |= 1
+
+            from . import cache
+            cache.log_stats()
 
     except KeyboardInterrupt:
         print("\nKeyboardInterrupt", file=sys.stderr)
@@ -255,3 +418,4 @@ def main():
         import errno
         if exc.errno != errno.EPIPE:
             raise
+    return retval
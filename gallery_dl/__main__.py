@@ -17,4 +17,4 @@ if __package__ is None and not hasattr(sys, "frozen"):
 import gallery_dl
 
 if __name__ == "__main__":
-    gallery_dl.main()
+    sys.exit(gallery_dl.main())
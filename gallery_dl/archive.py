@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Mike Fährmann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+
+"""Download archive file formats and maintenance functions"""
+
+import os
+import sqlite3
+import hashlib
+import binascii
+
+
+def digest(entry):
+    """Return the 16-byte digest stored for 'entry' in hashed archives"""
+    return hashlib.sha1(entry.encode()).digest()[:16]
+
+
+def connect(path, synchronous="normal", hashed=False, keys=False, log=None):
+    """Open the archive file at 'path'
+
+    Returns a (connection, hashed) tuple. Archives in hashed format stay
+    hashed, and plain archives get converted if 'hashed' is True.
+    """
+    con = sqlite3.connect(path, timeout=60)
+    con.isolation_level = None
+    cursor = con.cursor()
+    try:
+        # write-ahead logging lets other processes read the archive
+        # while it is being written to and needs fewer fsync() calls
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=" + {
+            "off": "OFF", "full": "FULL"}.get(synchronous, "NORMAL"))
+    except sqlite3.OperationalError:
+        pass
+
+    tables = _tables(cursor)
+    if hashed or "archive_hash" in tables:
+        cursor.execute("CREATE TABLE IF NOT EXISTS main.archive_hash "
+                       "(digest PRIMARY KEY, entry) WITHOUT ROWID")
+        if "archive" in tables:
+            count = migrate(con, keys)
+            if log and count:
+                log.info("Converted %d entries of '%s' to hashed format",
+                         count, path)
+        return con, True
+
+    cursor.execute("CREATE TABLE IF NOT EXISTS archive "
+                   "(entry PRIMARY KEY) WITHOUT ROWID")
+    return con, False
+
+
+def migrate(con, keys=False):
+    """Move all entries of a plain archive into its hashed table
+
+    Returns the number of converted entries. 'keys' specifies whether
+    the original entries should be stored alongside their digests.
+    """
+    con.create_function("archive_digest", 1, digest)
+    cursor = con.cursor()
+    with con:
+        cursor.execute("BEGIN IMMEDIATE")
+        if "archive" not in _tables(cursor):
+            return 0  # already converted by another process
+        cursor.execute("CREATE TABLE IF NOT EXISTS main.archive_hash "
+                       "(digest PRIMARY KEY, entry) WITHOUT ROWID")
+        cursor.execute(
+            "INSERT OR IGNORE INTO main.archive_hash "
+            "SELECT archive_digest(entry), {} FROM main.archive".format(
+                "entry" if keys else "NULL"))
+        count = cursor.rowcount
+        cursor.execute("DROP TABLE main.archive")
+    return count
+
+
+def stats(path, categories=()):
+    """Return information about the archive file at 'path'
+
+    For plain archives, this includes the number of entries
+    for each element of 'categories'.
+    """
+    con, hashed = connect(path)
+    cursor = con.cursor()
+    info = {
+        "format": "hashed" if hashed else "plain",
+        "size": os.path.getsize(path),
+    }
+
+    if hashed:
+        cursor.execute("SELECT COUNT(*), COUNT(entry) FROM archive_hash")
+        info["entries"], info["keys"] = cursor.fetchone()
+    else:
+        cursor.execute("SELECT COUNT(*) FROM archive")
+        info["entries"] = info["keys"] = cursor.fetchone()[0]
+
+        # count entries in the key range of each category, then remove
+        # those belonging to categories with this one as prefix
+        counts = {}
+        for category in filter(None, categories):
+            cursor.execute(
+                "SELECT COUNT(*) FROM archive WHERE entry >= ? AND entry < ?",
+                key_range(category))
+            count = cursor.fetchone()[0]
+            if count:
+                counts[category] = count
+        categories = info["categories"] = {}
+        for category in sorted(counts, key=len, reverse=True):
+            categories[category] = counts[category] - sum(
+                categories[other] for other in categories
+                if other.startswith(category))
+
+    cursor.execute("PRAGMA freelist_count")
+    free = cursor.fetchone()[0]
+    cursor.execute("PRAGMA page_size")
+    info["free"] = free * cursor.fetchone()[0]
+    con.close()
+    return info
+
+
+def vacuum(path):
+    """Rebuild the archive file at 'path' and return its new size"""
+    con, _ = connect(path)
+    con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    con.execute("VACUUM")
+    con.close()
+    return os.path.getsize(path)
+
+
+def merge(path, sources, hashed=False, keys=False, log=None):
+    """Add all entries of the archives in 'sources' to the one at 'path'
+
+    Returns the number of new entries. A plain target archive gets
+    converted to hashed format when merging a hashed archive into it.
+    """
+    con, hashed = connect(path, hashed=hashed, keys=keys, log=log)
+    con.create_function("archive_digest", 1, digest)
+    cursor = con.cursor()
+    total = 0
+
+    for source in sources:
+        cursor.execute("ATTACH DATABASE ? AS source", (source,))
+        try:
+            tables = _tables(cursor, "source")
+            if "archive_hash" in tables and not hashed:
+                count = migrate(con, keys)
+                hashed = True
+                if log:
+                    log.info("Converted %d entries of '%s' to hashed "
+                             "format", count, path)
+
+            if not hashed:
+                select = "SELECT entry FROM source.archive"
+                insert = "INSERT OR IGNORE INTO main.archive "
+            elif "archive_hash" in tables:
+                select = "SELECT digest, entry FROM source.archive_hash"
+                insert = "INSERT OR IGNORE INTO main.archive_hash "
+            else:
+                select = "SELECT archive_digest(entry), {} " \
+                         "FROM source.archive".format(
+                             "entry" if keys else "NULL")
+                insert = "INSERT OR IGNORE INTO main.archive_hash "
+
+            if "archive" in tables or "archive_hash" in tables:
+                with con:
+                    cursor.execute("BEGIN IMMEDIATE")
+                    cursor.execute(insert + select)
+                total += cursor.rowcount
+                if log:
+                    log.info("Added %d entries from '%s'",
+                             cursor.rowcount, source)
+            elif log:
+                log.warning("'%s' is not an archive file", source)
+        finally:
+            cursor.execute("DETACH DATABASE source")
+
+    con.close()
+    return total
+
+
+def export(path, file):
+    """Write all entries of the archive at 'path' to 'file'
+
+    Hashed archives without original entries
+    export the hexadecimal digest instead.
+    """
+    con, hashed = connect(path)
+    if hashed:
+        rows = con.execute("SELECT digest, entry FROM archive_hash")
+        entries = (entry or binascii.hexlify(value).decode()
+                   for value, entry in rows)
+    else:
+        rows = con.execute("SELECT entry FROM archive")
+        entries = (row[0] for row in rows)
+
+    count = 0
+    for count, entry in enumerate(entries, 1):
+        file.write(entry)
+        file.write("\n")
+    con.close()
+    return count
+
+
+def key_range(prefix):
+    """Return the key range of all entries starting with 'prefix'"""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _tables(cursor, schema="main"):
+    cursor.execute(
+        "SELECT name FROM {}.sqlite_master WHERE type='table'".format(schema))
+    return {row[0] for row in cursor.fetchall()}
@@ -8,40 +8,127 @@
 
 """Decorators to keep function results in an in-memory and database cache"""
 
+import sys
 import sqlite3
 import pickle
 import time
 import os
+import logging
 import functools
-from . import config, util
+import threading
+import collections
+from . import config, text, util
+
+
+class MemoryStore():
+    """Bounded in-memory storage for cached values
+
+    Holds at most 'cache.memory-entries' values with an approximate total
+    size of 'cache.memory-size' bytes and removes the least recently used
+    ones first. Expired values get removed when accessing them.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.data = collections.OrderedDict()  # key: (value, expires, size)
+        self.size = 0
+        self.maxlen = self.maxsize = None
+        self.hits = self.misses = self.evictions = 0
+        self.lock = threading.Lock()
+        _stores.append(self)
+
+    def get(self, key, timestamp=0):
+        """Return the (value, expires) tuple for 'key' or None"""
+        with self.lock:
+            try:
+                value, expires, size = self.data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            if expires <= timestamp:
+                del self.data[key]
+                self.size -= size
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value, expires
+
+    def set(self, key, value, expires=float("inf")):
+        """Store 'value' and remove least recently used entries if needed"""
+        if self.maxlen is None:
+            self.maxlen = config.get(("cache", "memory-entries"), 1000)
+            size = config.get(("cache", "memory-size"), "32M")
+            self.maxsize = size if isinstance(size, int) else \
+                text.parse_bytes(size)
+        size = _sizeof(value)
+
+        with self.lock:
+            old = self.data.pop(key, None)
+            if old:
+                self.size -= old[2]
+            self.data[key] = value, expires, size
+            self.size += size
+
+            data = self.data
+            while len(data) > 1 and (
+                    (self.maxlen and len(data) > self.maxlen) or
+                    (self.maxsize and self.size > self.maxsize)):
+                self.size -= data.popitem(False)[1][2]
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            entry = self.data.pop(key, None)
+            if entry:
+                self.size -= entry[2]
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.size = 0
 
 
 class CacheDecorator():
-    """Simplified in-memory cache"""
+    """Simplified in-memory cache
+
+    Concurrent calls for the same key wait for
+    the first one instead of calling 'func' again.
+    """
     def __init__(self, func, keyarg):
         self.func = func
-        self.cache = {}
+        self.cache = MemoryStore(
+            "%s.%s" % (func.__module__, func.__qualname__))
         self.keyarg = keyarg
+        self._keylocks = {}
 
     def __get__(self, instance, cls):
         return functools.partial(self.__call__, instance)
 
     def __call__(self, *args, **kwargs):
         key = "" if self.keyarg is None else args[self.keyarg]
-        try:
-            value = self.cache[key]
-        except KeyError:
-            value = self.cache[key] = self.func(*args, **kwargs)
+        result = self.cache.get(key)
+        if result:
+            return result[0]
+        with self._keylocks.setdefault(key, threading.RLock()):
+            result = self.cache.get(key)
+            if result:
+                return result[0]
+            value = self.func(*args, **kwargs)
+            self.cache.set(key, value)
         return value
 
+    def lookup(self, key):
+        """Return the stored value for 'key' without computing it"""
+        result = self.cache.get(key)
+        return result[0] if result else None
+
     def update(self, key, value):
-        self.cache[key] = value
+        self.cache.set(key, value)
 
     def invalidate(self, key):
-        try:
-            del self.cache[key]
-        except KeyError:
-            pass
+        self.cache.delete(key)
 
 
 class MemoryCacheDecorator(CacheDecorator):
@@ -52,32 +139,61 @@ class MemoryCacheDecorator(CacheDecorator):
 
     def __call__(self, *args, **kwargs):
         key = "" if self.keyarg is None else args[self.keyarg]
-        timestamp = int(time.time())
-        try:
-            value, expires = self.cache[key]
-        except KeyError:
-            expires = 0
-        if expires < timestamp:
+        result = self.cache.get(key, time.time())
+        if result:
+            return result[0]
+        with self._keylocks.setdefault(key, threading.RLock()):
+            result = self.cache.get(key, time.time())
+            if result:
+                return result[0]
             value = self.func(*args, **kwargs)
-            expires = timestamp + self.maxage
-            self.cache[key] = value, expires
+            self.cache.set(key, value, int(time.time()) + self.maxage)
         return value
 
+    def lookup(self, key):
+        result = self.cache.get(key, time.time())
+        return result[0] if result else None
+
     def update(self, key, value):
-        self.cache[key] = value, int(time.time()) + self.maxage
+        self.cache.set(key, value, int(time.time()) + self.maxage)
 
 
 class DatabaseCacheDecorator():
-    """Database cache"""
+    """Database cache
+
+    Lookups read the last committed state of the database without
+    locking it, which the write-ahead log allows even while other
+    processes are writing. Only computing and storing a missing value
+    takes a lock, and only for its key: other threads and processes
+    wait for its value instead of computing it themselves.
+
+    With 'refresh', values get recomputed in a background thread once
+    they expire in less than 'refresh' seconds, while callers keep
+    getting the still valid old value.
+
+    Without 'evict', values only get removed once they expire and
+    never to keep the database below 'cache.max-size'.
+    """
     db = None
+    lease = 60  # seconds until a dead process's key lock gets taken over
+    gc_interval = 50  # number of writes between garbage collections
+    gc_batch = 100  # maximum number of entries removed at once
     _init = True
+    _writes = 0
+    _lock = threading.RLock()  # 'db' is shared by all threads
 
-    def __init__(self, func, keyarg, maxage):
+    def __init__(self, func, keyarg, maxage, refresh=None, evict=True):
         self.key = "%s.%s" % (func.__module__, func.__name__)
+        if not evict:
+            _pinned.add(self.key)
         self.func = func
-        self.cache = {}
+        self.cache = MemoryStore(
+            "%s.%s" % (func.__module__, func.__qualname__))
         self.keyarg = keyarg
         self.maxage = maxage
+        self.refresh = refresh
+        self._keylocks = {}
+        self._refreshing = set()
 
     def __get__(self, obj, objtype):
         return functools.partial(self.__call__, obj)
@@ -87,71 +203,179 @@ class DatabaseCacheDecorator():
         timestamp = int(time.time())
 
         # in-memory cache lookup
-        try:
-            value, expires = self.cache[key]
-            if expires > timestamp:
-                return value
-        except KeyError:
-            pass
+        fullkey = "%s-%s" % (self.key, key)
+        result = self.cache.get(key, timestamp)
+        if result:
+            value, expires = result
+            if self.refresh and expires - timestamp < self.refresh:
+                self._refresh_ahead(key, fullkey, args, kwargs)
+            return value
 
         # database lookup
-        fullkey = "%s-%s" % (self.key, key)
-        cursor = self.cursor()
-        try:
-            cursor.execute("BEGIN EXCLUSIVE")
-        except sqlite3.OperationalError:
-            pass  # Silently swallow exception - workaround for Python 3.6
-        try:
+        result = self._select(fullkey, timestamp)
+        if not result:
+            with self._keylocks.setdefault(key, threading.Lock()):
+                result = self._compute(fullkey, args, kwargs)
+
+        value, expires = result
+        self.cache.set(key, value, expires)
+        if self.refresh and expires - timestamp < self.refresh:
+            self._refresh_ahead(key, fullkey, args, kwargs)
+        return value
+
+    def lookup(self, key):
+        """Return the stored value for 'key' without computing it"""
+        timestamp = int(time.time())
+        result = self.cache.get(key, timestamp)
+        if not result:
+            result = self._select("%s-%s" % (self.key, key), timestamp)
+            if not result:
+                return None
+            self.cache.set(key, *result)
+        return result[0]
+
+    def update(self, key, value):
+        expires = int(time.time()) + self.maxage
+        self.cache.set(key, value, expires)
+        with self._lock:
+            self.cursor().execute(
+                "INSERT OR REPLACE INTO data VALUES (?,?,?)",
+                ("%s-%s" % (self.key, key), pickle.dumps(value), expires),
+            )
+            self._written()
+
+    def invalidate(self, key):
+        self.cache.delete(key)
+        with self._lock:
+            self.cursor().execute(
+                "DELETE FROM data WHERE key=?",
+                ("%s-%s" % (self.key, key),),
+            )
+
+    @classmethod
+    def cursor(cls):
+        if cls._init:
+            cls.db.execute(
+                "CREATE TABLE IF NOT EXISTS data "
+                "(key TEXT PRIMARY KEY, value TEXT, expires INTEGER)"
+            )
+            cls.db.execute(
+                "CREATE INDEX IF NOT EXISTS data_expires ON data (expires)")
+            cls.db.execute(
+                "CREATE TABLE IF NOT EXISTS pending "
+                "(key TEXT PRIMARY KEY, expires INTEGER)"
+            )
+            DatabaseCacheDecorator._init = False
+        return cls.db.cursor()
+
+    @classmethod
+    def _written(cls):
+        """Remove some expired entries every 'gc_interval' writes"""
+        if not cls._writes % cls.gc_interval:
+            collect(cls.gc_batch)
+        cls._writes += 1
+
+    def _select(self, fullkey, timestamp):
+        """Return a (value, expires) tuple or None if there is none"""
+        with self._lock:
+            cursor = self.cursor()
             cursor.execute(
                 "SELECT value, expires FROM data WHERE key=? LIMIT 1",
                 (fullkey,),
             )
             result = cursor.fetchone()
+        if result and result[1] > timestamp:
+            return pickle.loads(result[0]), result[1]
+        return None
+
+    def _compute(self, fullkey, args, kwargs):
+        """Call 'func' and store its result unless another process does"""
+        while True:
+            timestamp = int(time.time())
+            result = self._select(fullkey, timestamp)
+            if result:
+                return result
+            if self._acquire(fullkey, timestamp):
+                break
+            time.sleep(0.2)
 
-            if result and result[1] > timestamp:
-                value, expires = result
-                value = pickle.loads(value)
-            else:
+        try:
+            value = self.func(*args, **kwargs)
+        except BaseException:
+            self._release(fullkey)
+            raise
+        return self._store(fullkey, value)
+
+    def _refresh_ahead(self, key, fullkey, args, kwargs):
+        """Recompute the value for 'key' in a background thread"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        threading.Thread(
+            target=self._refresh_value, args=(key, fullkey, args, kwargs),
+            daemon=True,
+        ).start()
+
+    def _refresh_value(self, key, fullkey, args, kwargs):
+        try:
+            # another process might be refreshing it already
+            if not self._acquire(fullkey, int(time.time())):
+                return
+            try:
                 value = self.func(*args, **kwargs)
-                expires = timestamp + self.maxage
-                cursor.execute(
-                    "INSERT OR REPLACE INTO data VALUES (?,?,?)",
-                    (fullkey, pickle.dumps(value), expires),
-                )
+            except Exception as exc:
+                self._release(fullkey)
+                logging.getLogger("cache").debug(
+                    "Refreshing '%s' failed: %s: %s",
+                    fullkey, exc.__class__.__name__, exc)
+            else:
+                self.cache.set(key, *self._store(fullkey, value))
         finally:
-            self.db.commit()
-        self.cache[key] = value, expires
-        return value
+            self._refreshing.discard(key)
 
-    def update(self, key, value):
+    def _store(self, fullkey, value):
+        """Store 'value', release its key, and return (value, expires)"""
         expires = int(time.time()) + self.maxage
-        self.cache[key] = value, expires
-        self.cursor().execute(
-            "INSERT OR REPLACE INTO data VALUES (?,?,?)",
-            ("%s-%s" % (self.key, key), pickle.dumps(value), expires),
-        )
-
-    def invalidate(self, key):
-        try:
-            del self.cache[key]
-        except KeyError:
-            pass
-        self.cursor().execute(
-            "DELETE FROM data WHERE key=? LIMIT 1",
-            ("%s-%s" % (self.key, key),),
-        )
-
-    def cursor(self):
-        if self._init:
-            self.db.execute(
-                "CREATE TABLE IF NOT EXISTS data "
-                "(key TEXT PRIMARY KEY, value TEXT, expires INTEGER)"
+        with self._lock, self.db:
+            cursor = self.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(
+                "INSERT OR REPLACE INTO data VALUES (?,?,?)",
+                (fullkey, pickle.dumps(value), expires),
             )
-            DatabaseCacheDecorator._init = False
-        return self.db.cursor()
+            cursor.execute("DELETE FROM pending WHERE key=?", (fullkey,))
+        with self._lock:
+            self._written()
+        return value, expires
+
+    def _acquire(self, fullkey, timestamp):
+        """Try to take the lock for computing the value of 'fullkey'"""
+        with self._lock, self.db:
+            cursor = self.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(
+                "DELETE FROM pending WHERE key=? AND expires<=?",
+                (fullkey, timestamp),
+            )
+            cursor.execute(
+                "INSERT OR IGNORE INTO pending VALUES (?,?)",
+                (fullkey, timestamp + self.lease),
+            )
+            return cursor.rowcount == 1
+
+    def _release(self, fullkey):
+        with self._lock:
+            self.cursor().execute(
+                "DELETE FROM pending WHERE key=?", (fullkey,))
+
 
+_stores = []
+_pinned = set()
 
-def memcache(maxage=None, keyarg=None):
+
+def memcache(maxage=None, keyarg=None, refresh=None, evict=True):
+    # 'refresh' and 'evict' are only supported by database caches
     if maxage:
         def wrap(func):
             return MemoryCacheDecorator(func, keyarg, maxage)
@@ -161,9 +385,9 @@ def memcache(maxage=None, keyarg=None):
     return wrap
 
 
-def cache(maxage=3600, keyarg=None):
+def cache(maxage=3600, keyarg=None, refresh=None, evict=True):
     def wrap(func):
-        return DatabaseCacheDecorator(func, keyarg, maxage)
+        return DatabaseCacheDecorator(func, keyarg, maxage, refresh, evict)
     return wrap
 
 
@@ -180,13 +404,140 @@ def clear():
             pass  # database is not initialized,  can't be modified, etc.
         else:
             rowcount = cursor.rowcount
-            db.commit()
             cursor.execute("VACUUM")
         return rowcount
 
     return None
 
 
+def collect(limit=-1):
+    """Delete expired database entries and enforce 'cache.max-size'
+
+    Returns the number of deleted entries.
+    """
+    db = DatabaseCacheDecorator.db
+    if not db:
+        return None
+
+    with DatabaseCacheDecorator._lock:
+        cursor = DatabaseCacheDecorator.cursor()
+        timestamp = int(time.time())
+        try:
+            with db:
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute(
+                    "DELETE FROM data WHERE key IN (SELECT key FROM data "
+                    "WHERE expires <= ? LIMIT ?)", (timestamp, limit))
+                count = cursor.rowcount
+                cursor.execute(
+                    "DELETE FROM pending WHERE expires <= ?", (timestamp,))
+        except sqlite3.OperationalError:
+            return 0  # database is locked, read-only, etc.
+
+        maxsize = config.get(("cache", "max-size"))
+        if maxsize and not isinstance(maxsize, int):
+            maxsize = text.parse_bytes(maxsize)
+        if maxsize:
+            count += _shrink(cursor, maxsize)
+    return count
+
+
+def stats():
+    """Return information about the database file"""
+    db = DatabaseCacheDecorator.db
+    if not db:
+        return None
+
+    with DatabaseCacheDecorator._lock:
+        cursor = DatabaseCacheDecorator.cursor()
+        cursor.execute(
+            "SELECT substr(key, 1, instr(key, '-') - 1), COUNT(*), "
+            "SUM(length(value)), SUM(expires <= ?) FROM data GROUP BY 1",
+            (int(time.time()),))
+        functions = {
+            name: {"entries": entries, "size": size, "expired": expired}
+            for name, entries, size, expired in cursor
+        }
+        info = {
+            "path": _path(),
+            "size": _used_size(cursor),
+            "functions": functions,
+            "entries": sum(f["entries"] for f in functions.values()),
+            "expired": sum(f["expired"] for f in functions.values()),
+        }
+        cursor.execute("PRAGMA freelist_count")
+        free = cursor.fetchone()[0]
+        cursor.execute("PRAGMA page_size")
+        info["free"] = free * cursor.fetchone()[0]
+    return info
+
+
+def log_stats():
+    """Log hit, miss, and eviction counts of all in-memory caches"""
+    log = logging.getLogger("cache")
+    for store in _stores:
+        if store.hits or store.misses:
+            log.debug("%s: %d hits, %d misses, %d evictions, "
+                      "%d entries (%d bytes)", store.name, store.hits,
+                      store.misses, store.evictions, len(store.data),
+                      store.size)
+
+
+def _shrink(cursor, maxsize):
+    """Delete the least recently written entries until below 'maxsize'"""
+    pinned = tuple(_pinned)
+    where = "WHERE substr(key, 1, instr(key, '-') - 1) NOT IN ({})".format(
+        ", ".join("?" * len(pinned))) if pinned else ""
+    count = 0
+    size = _used_size(cursor)
+    while size > maxsize:
+        # estimate the number of entries taking up the excess space
+        cursor.execute("SELECT COUNT(*) FROM data " + where, pinned)
+        entries = cursor.fetchone()[0]
+        limit = (entries * (size - maxsize)) // size + 1
+
+        # 'INSERT OR REPLACE' gives each written row a new, highest rowid
+        with cursor.connection:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(
+                "DELETE FROM data WHERE rowid IN (SELECT rowid FROM data " +
+                where + " ORDER BY rowid LIMIT ?)", pinned + (limit,))
+        if not cursor.rowcount:
+            break
+        count += cursor.rowcount
+        size = _used_size(cursor)
+    return count
+
+
+def _used_size(cursor):
+    """Return the number of bytes in use by the database"""
+    cursor.execute("PRAGMA page_count")
+    pages = cursor.fetchone()[0]
+    cursor.execute("PRAGMA freelist_count")
+    pages -= cursor.fetchone()[0]
+    cursor.execute("PRAGMA page_size")
+    return pages * cursor.fetchone()[0]
+
+
+def _sizeof(obj, _getsizeof=sys.getsizeof):
+    """Return the approximate size of 'obj' and its contents in bytes"""
+    size = 0
+    seen = set()
+    objects = [obj]
+    while objects:
+        obj = objects.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += _getsizeof(obj, 64)
+        if isinstance(obj, dict):
+            objects.extend(obj.keys())
+            objects.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            objects.extend(obj)
+    return size
+
+
 def _path():
     path = config.get(("cache", "file"), -1)
     if path != -1:
@@ -202,12 +553,24 @@ def _path():
     return os.path.join(cachedir, "cache.sqlite3")
 
 
+def _connect(path):
+    db = sqlite3.connect(
+        path, timeout=30, check_same_thread=False, isolation_level=None)
+    try:
+        # the write-ahead log lets processes read
+        # while another one is writing to the database
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+    except sqlite3.OperationalError:
+        pass
+    return db
+
+
 try:
     dbfile = _path()
     if os.name != "nt":
         # restrict access permissions for new db files
         os.close(os.open(dbfile, os.O_CREAT | os.O_RDONLY, 0o600))
-    DatabaseCacheDecorator.db = sqlite3.connect(
-        dbfile, timeout=30, check_same_thread=False)
+    DatabaseCacheDecorator.db = _connect(dbfile)
 except (OSError, TypeError, sqlite3.OperationalError):
     cache = memcache  # noqa: F811
@@ -148,7 +148,7 @@ class apply():
             set(key, value)
 
     def __exit__(self, etype, value, traceback):
-        for key, value in self.original:
+        for key, value in reversed(self.original):
             if value is self._sentinel:
                 unset(key)
             else:
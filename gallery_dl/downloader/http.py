@@ -9,11 +9,17 @@
 """Downloader module for http:// and https:// URLs"""
 
 import os
+import json
 import time
+import hashlib
+import threading
 import mimetypes
-from requests.exceptions import RequestException, ConnectionError, Timeout
+import collections
+from requests.exceptions import (
+    RequestException, ConnectionError, Timeout, ChunkedEncodingError)
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
 from .common import DownloaderBase
-from .. import text
+from .. import text, scheduler
 
 try:
     from OpenSSL.SSL import Error as SSLError
@@ -32,21 +38,43 @@ class HttpDownloader(DownloaderBase):
         self.verify = self.config("verify", extractor._verify)
         self.mtime = self.config("mtime", True)
         self.rate = self.config("rate")
+        self.segments = self.config("segments", 1)
+        self.segment_size = self.config("segment-size", "8M")
+        self.chunk_size = self.config("chunk-size", "1M")
+        self.hash = self.config("hash")
+        self.hasher = None
         self.downloading = False
-        self.chunk_size = 16384
+        self.throttle = None
+        self.buffer = None
 
         if self.retries < 0:
             self.retries = float("inf")
+        if self.segments > 1:
+            self.segment_size = text.parse_bytes(self.segment_size) or 1
+        self.chunk_size = text.parse_bytes(self.chunk_size)
+        if not self.chunk_size:
+            self.log.warning("Invalid chunk size specified")
+            self.chunk_size = 1048576
         if self.rate:
             self.rate = text.parse_bytes(self.rate)
             if not self.rate:
                 self.log.warning("Invalid rate limit specified")
             elif self.rate < self.chunk_size:
                 self.chunk_size = self.rate
+        if not self.hash and extractor.config("content-index"):
+            self.hash = "sha1"
+        if self.hash:
+            try:
+                hashlib.new(self.hash)
+            except (ValueError, TypeError):
+                self.log.warning("Unsupported hash algorithm '%s'", self.hash)
+                self.hash = None
 
     def download(self, url, pathfmt):
+        self.throttle = scheduler.throttle(url)
         try:
-            return self._download_impl(url, pathfmt)
+            with scheduler.slot(url):
+                return self._download_impl(url, pathfmt)
         except Exception:
             print()
             raise
@@ -75,10 +103,12 @@ class HttpDownloader(DownloaderBase):
                     return False
                 time.sleep(min(2 ** (tries-1), 1800))
             tries += 1
+            self.hasher = None
 
             # check for .part file
             filesize = pathfmt.part_size()
-            if filesize:
+            state = self._segments_load(pathfmt) if filesize else None
+            if filesize and not state:
                 headers = {"Range": "bytes={}-".format(filesize)}
             else:
                 headers = None
@@ -120,6 +150,36 @@ class HttpDownloader(DownloaderBase):
                     pathfmt.temppath = ""
                     return True
 
+            # split download into multiple segments
+            segments = self._segments(response, size, offset, state)
+            if segments:
+                response.close()
+                resume = state is not None and state["segments"] is segments
+                if filesize and not resume:
+                    self.log.info("Unable to resume partial download")
+                self.out.start(pathfmt.path)
+                self.downloading = True
+                msg = self._download_segments(
+                    url, pathfmt, size, segments, resume)
+                if msg:
+                    print()
+                    if not self.part:
+                        # without a state file, the holes of unfinished
+                        # segments are indistinguishable from downloaded
+                        # data; start over instead of resuming
+                        with pathfmt.open("wb"):
+                            pass
+                    continue
+
+                if self.adjust_extension:
+                    with pathfmt.open("rb") as file:
+                        adj_ext = self.check_extension(file, pathfmt)
+                    if adj_ext:
+                        pathfmt.set_extension(adj_ext)
+                break
+            if filesize and not offset:
+                self._segments_remove(pathfmt)
+
             # set open mode
             if not offset:
                 mode = "w+b"
@@ -132,7 +192,9 @@ class HttpDownloader(DownloaderBase):
             # start downloading
             self.out.start(pathfmt.path)
             self.downloading = True
-            with pathfmt.open(mode) as file:
+            with pathfmt.open(mode, self.chunk_size) as file:
+                if self.hash:
+                    self.hasher = self.hash_file(file, offset)
                 if offset:
                     file.seek(offset)
 
@@ -162,6 +224,14 @@ class HttpDownloader(DownloaderBase):
         self.downloading = False
         if self.mtime:
             pathfmt.keywords["_mtime"] = response.headers.get("Last-Modified")
+        if self.hash:
+            hasher = self.hasher
+            if not hasher:
+                # segmented or already complete download
+                with pathfmt.open("rb") as file:
+                    hasher = self.hash_file(file)
+            pathfmt.keywords["_hash"] = hasher.hexdigest()
+            self.hasher = None
         return True
 
     def receive(self, response, file):
@@ -169,9 +239,22 @@ class HttpDownloader(DownloaderBase):
             total = 0            # total amount of bytes received
             start = time.time()  # start time
 
-        for data in response.iter_content(self.chunk_size):
+        if self.buffer is None:
+            self.buffer = memoryview(bytearray(self.chunk_size))
+        buffer = self.buffer
+        throttle = self.throttle
+        if throttle:
+            buffer = buffer[:throttle.chunk_size]
+
+        hasher = self.hasher
+
+        for data in self.iter_content(response, buffer):
             file.write(data)
 
+            if hasher:
+                hasher.update(data)
+            if throttle:
+                throttle(len(data))
             if self.rate:
                 total += len(data)
                 expected = total / self.rate  # expected elapsed time
@@ -180,6 +263,202 @@ class HttpDownloader(DownloaderBase):
                     # sleep if less time passed than expected
                     time.sleep(expected - delta)
 
+    def hash_file(self, file, size=None):
+        """Return a hash object for the first 'size' bytes of 'file'"""
+        hasher = hashlib.new(self.hash)
+        if size == 0:
+            return hasher
+
+        file.seek(0)
+        read = file.read
+        while True:
+            data = read(self.chunk_size if size is None else
+                        min(self.chunk_size, size))
+            if not data:
+                break
+            hasher.update(data)
+            if size is not None:
+                size -= len(data)
+                if not size:
+                    break
+        return hasher
+
+    def iter_content(self, response, buffer):
+        """Iterate over the response content in chunks of up to 'chunk_size'
+
+        Unless the content needs to be decoded, data gets read directly
+        into 'buffer', and each yielded chunk is a view of it that is only
+        valid until the next one is requested.
+        """
+        encoding = response.headers.get("Content-Encoding")
+        if encoding and encoding != "identity":
+            yield from response.iter_content(self.chunk_size)
+            return
+
+        readinto = response.raw.readinto
+        while True:
+            try:
+                size = readinto(buffer)
+            except ProtocolError as exc:
+                raise ChunkedEncodingError(exc)
+            except ReadTimeoutError as exc:
+                raise ConnectionError(exc)
+            if not size:
+                return
+            yield buffer[:size]
+
+    def _segments(self, response, size, offset, state):
+        """Return a list of [position, end] byte ranges to download"""
+        if offset or response.headers.get("Accept-Ranges") != "bytes":
+            return None
+        if state and state["size"] == size:
+            # resume an interrupted segmented download
+            return state["segments"]
+        if self.segments < 2:
+            return None
+
+        num = min(self.segments, size // self.segment_size)
+        if num < 2:
+            return None
+        step = size // num
+        ranges = [[i * step, (i + 1) * step] for i in range(num)]
+        ranges[-1][1] = size
+        return ranges
+
+    def _download_segments(self, url, pathfmt, size, segments, resume):
+        """Download all 'segments' of 'url' concurrently
+
+        Return an error message or None on success.
+        """
+        path = pathfmt.temppath
+        if not resume:
+            # preallocate file and record segment state
+            with pathfmt.open("wb") as file:
+                file.truncate(size)
+            self._segments_save(pathfmt, size, segments)
+        else:
+            self.log.info("Resuming segmented download (%d/%d bytes left)",
+                          sum(end - pos for pos, end in segments), size)
+
+        errors = []
+        todo = collections.deque(
+            segment for segment in segments if segment[0] < segment[1])
+
+        throttle = self.throttle
+        if self.rate:
+            # all running segments share the rate limit of this download
+            buckets = [scheduler.TokenBucket(self.rate)]
+            if throttle:
+                buckets.extend(throttle.buckets)
+            throttle = scheduler.Throttle(buckets)
+
+        # every connection occupies its own request slot, with the first
+        # one using the slot of this download; the remaining segments get
+        # downloaded one after another by the connections that got a slot
+        slots = [None]
+        while len(slots) < len(todo):
+            slot = scheduler.slot(url, False)
+            if not slot:
+                break
+            slots.append(slot)
+
+        threads = [
+            threading.Thread(
+                target=self._download_segment_worker,
+                args=(url, path, todo, throttle, errors, slot),
+                daemon=True,
+            )
+            for slot in slots
+        ]
+
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(1.0)
+                    self._segments_save(pathfmt, size, segments)
+        finally:
+            self._segments_save(pathfmt, size, segments)
+
+        if errors:
+            return errors[0]
+        for pos, end in segments:
+            if pos < end:
+                return "incomplete segment ({} < {})".format(pos, end)
+        self._segments_remove(pathfmt)
+        return None
+
+    def _download_segment_worker(self, url, path, todo, throttle, errors,
+                                 slot=None):
+        """Download segments from 'todo' until there are none left"""
+        if slot:
+            with slot:
+                return self._download_segment_worker(
+                    url, path, todo, throttle, errors)
+        while not errors:
+            try:
+                segment = todo.popleft()
+            except IndexError:
+                return
+            self._download_segment(url, path, segment, throttle, errors)
+
+    def _download_segment(self, url, path, segment, throttle, errors):
+        """Download the byte range given by 'segment' into 'path'"""
+        headers = {"Range": "bytes={}-{}".format(segment[0], segment[1]-1)}
+        try:
+            response = self.session.request(
+                "GET", url, stream=True, headers=headers,
+                timeout=self.timeout, verify=self.verify)
+            if response.status_code != 206:
+                errors.append("{}: {} for url: {}".format(
+                    response.status_code, response.reason, url))
+                response.close()
+                return
+
+            buffer = memoryview(bytearray(
+                min(self.chunk_size, throttle.chunk_size)
+                if throttle else self.chunk_size))
+
+            with open(path, "r+b", buffering=0) as file:
+                file.seek(segment[0])
+                for data in self.iter_content(response, buffer):
+                    data = data[:segment[1] - segment[0]]
+                    file.write(data)
+                    segment[0] += len(data)
+                    if segment[0] >= segment[1]:
+                        break
+
+                    if throttle:
+                        throttle(len(data))
+            response.close()
+        except (RequestException, SSLError, OSError) as exc:
+            errors.append(str(exc))
+
+    @staticmethod
+    def _segments_load(pathfmt):
+        """Load the state of an interrupted segmented download"""
+        try:
+            with open(pathfmt.temppath + ".segments") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _segments_save(self, pathfmt, size, segments):
+        """Store the state of a segmented download"""
+        if not self.part:
+            return
+        with open(pathfmt.temppath + ".segments", "w") as file:
+            json.dump({"size": size, "segments": segments}, file)
+
+    @staticmethod
+    def _segments_remove(pathfmt):
+        """Delete the state of a segmented download"""
+        try:
+            os.unlink(pathfmt.temppath + ".segments")
+        except OSError:
+            pass
+
     def get_extension(self, response):
         mtype = response.headers.get("Content-Type", "image/jpeg")
         mtype = mtype.partition(";")[0]
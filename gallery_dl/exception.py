@@ -24,6 +24,7 @@ Exception
       +-- FormatError
       +-- FilterError
       +-- StopExtraction
+           +-- RangeExhausted
 """
 
 
@@ -77,3 +78,7 @@ class FilterError(GalleryDLException):
 
 class StopExtraction(GalleryDLException):
     """Extraction should stop"""
+
+
+class RangeExhausted(StopExtraction):
+    """All items of a range have been processed"""
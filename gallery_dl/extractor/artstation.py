@@ -79,7 +79,7 @@ class ArtstationExtractor(Extractor):
     def get_user_info(self, username):
         """Return metadata for a specific user"""
         url = "{}/users/{}/quick.json".format(self.root, username.lower())
-        response = self.request(url, notfound="user")
+        response = self.request(url, notfound="user", cache=86400)
         return response.json()
 
     def _pagination(self, url, params=None):
@@ -47,7 +47,9 @@ class BooruExtractor(SharedConfigMixin, Extractor):
         yield Message.Directory, data
 
         self.reset_page()
+        self.params.update(self.checkpoint("page") or ())
         while True:
+            self.update_checkpoint("page", self.params.copy())
             images = self.parse_response(
                 self.request(self.api_url, params=self.params))
 
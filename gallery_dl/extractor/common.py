@@ -9,8 +9,11 @@
 """Common classes and constants used by extractor modules."""
 
 import re
+import os
 import time
+import zlib
 import netrc
+import hashlib
 import queue
 import logging
 import datetime
@@ -18,7 +21,8 @@ import requests
 import threading
 import http.cookiejar
 from .message import Message
-from .. import config, text, exception, cloudflare
+from .. import config, text, exception, cloudflare, scheduler
+from ..cache import cache
 
 
 class Extractor():
@@ -29,7 +33,11 @@ class Extractor():
     directory_fmt = ("{category}",)
     filename_fmt = "{filename}.{extension}"
     archive_fmt = ""
+    gallery_archive_fmt = None
+    gallery_signature_fmt = "{count}"
     cookiedomain = ""
+    incremental = False
+    resume = False
     root = ""
     test = None
 
@@ -37,12 +45,16 @@ class Extractor():
         self.session = requests.Session()
         self.log = logging.getLogger(self.category)
         self.url = match.string
-        self._init_headers()
-        self._init_cookies()
-        self._init_proxies()
         self._retries = self.config("retries", 4)
         self._timeout = self.config("timeout", 30)
         self._verify = self.config("verify", True)
+        self._response_cache = self.config("response-cache", False)
+        self._init_headers()
+        self._init_cookies()
+        self._init_proxies()
+        self._init_adapters()
+        self._watermark = None
+        self._checkpoints = {}
 
         if self._retries < 0:
             self._retries = float("inf")
@@ -68,16 +80,48 @@ class Extractor():
             ("extractor", self.category, self.subcategory, key), default)
 
     def request(self, url, method="GET", *, session=None, retries=None,
-                encoding=None, fatal=True, notfound=None, **kwargs):
+                encoding=None, fatal=True, notfound=None, cache=None,
+                validate=None, **kwargs):
+        """Send an HTTP request and return its response
+
+        'cache' is the number of seconds a response to this GET request
+        may be reused for when the 'response-cache' option is enabled.
+        'validate' gets called with each response before storing it and
+        has to return True for responses without API errors in them.
+        """
         tries = 1
         retries = self._retries if retries is None else retries
         session = self.session if session is None else session
         kwargs.setdefault("timeout", self._timeout)
         kwargs.setdefault("verify", self._verify)
 
+        key = entry = None
+        if cache and self._response_cache and method == "GET":
+            if self._response_cache is not True:
+                cache = self._response_cache
+            rurl = requests.Request(
+                method, url, params=kwargs.get("params")).prepare().url
+            # responses for different credentials are stored separately
+            key = rurl + _auth_identity(session, kwargs.get("headers"))
+            entry = _response.lookup(key)
+            if entry:
+                if entry[0] > time.time():
+                    self.log.debug("Using cached response for %s", rurl)
+                    response = _cached_response(rurl, entry)
+                    if encoding:
+                        response.encoding = encoding
+                    return response
+                # ask the server whether the stored response is still valid
+                headers = kwargs["headers"] = dict(kwargs.get("headers") or ())
+                if entry[1]:
+                    headers["If-None-Match"] = entry[1]
+                if entry[2]:
+                    headers["If-Modified-Since"] = entry[2]
+
         while True:
             try:
-                response = session.request(method, url, **kwargs)
+                with scheduler.slot(url):
+                    response = session.request(method, url, **kwargs)
             except (requests.exceptions.ConnectionError,
                     requests.exceptions.Timeout,
                     requests.exceptions.ChunkedEncodingError,
@@ -90,6 +134,9 @@ class Extractor():
                 if 200 <= code < 400 or fatal is None and \
                         (400 <= code < 500) or not fatal and \
                         (400 <= code < 429 or 431 <= code < 500):
+                    if key:
+                        response = self._cache_response(
+                            key, entry, response, cache, validate)
                     if encoding:
                         response.encoding = encoding
                     return response
@@ -122,6 +169,34 @@ class Extractor():
 
         raise exception.HttpError(msg)
 
+    def _cache_response(self, key, entry, response, maxage, validate):
+        """Store 'response' or return the stored one if it is unchanged"""
+        code = response.status_code
+        headers = response.headers
+        if code == 304 and entry:
+            self.log.debug("Revalidated cached response for %s", response.url)
+            entry = (time.time() + maxage,
+                     headers.get("ETag", entry[1]),
+                     headers.get("Last-Modified", entry[2]),
+                     entry[3], entry[4])
+            response = _cached_response(response.url, entry)
+        elif code == 200:
+            if validate:
+                try:
+                    if not validate(response):
+                        return response
+                except Exception:
+                    return response
+            entry = (time.time() + maxage,
+                     headers.get("ETag"),
+                     headers.get("Last-Modified"),
+                     headers.get("Content-Type"),
+                     zlib.compress(response.content))
+        else:
+            return response
+        _response.update(key, entry)
+        return response
+
     def _get_auth_info(self):
         """Return authentication information as (username, password) tuple"""
         username = self.config("username")
@@ -168,6 +243,30 @@ class Extractor():
             else:
                 self.log.warning("invalid proxy specifier: %s", proxies)
 
+    def _init_adapters(self):
+        """Mount shared connection pools onto the session object
+
+        Extractors with the same category and connection settings
+        reuse the same pool of keep-alive connections.
+        """
+        key = (
+            self.category,
+            tuple(sorted(self.session.proxies.items())),
+            str(self._verify),
+        )
+        with _adapters_lock:
+            adapter = _adapters.get(key)
+            if adapter is None:
+                maxsize = self.config("pool-maxsize") or max(
+                    10,
+                    config.interpolate(("downloader", "workers"), 1),
+                    self.config("queue-concurrency", 1),
+                )
+                adapter = _adapters[key] = requests.adapters.HTTPAdapter(
+                    pool_maxsize=maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
     def _init_cookies(self):
         """Populate the session's cookiejar"""
         cookies = self.config("cookies")
@@ -175,9 +274,8 @@ class Extractor():
             if isinstance(cookies, dict):
                 self._update_cookies_dict(cookies, self.cookiedomain)
             else:
-                cookiejar = http.cookiejar.MozillaCookieJar()
                 try:
-                    cookiejar.load(cookies)
+                    cookiejar = _load_cookiejar(cookies)
                 except OSError as exc:
                     self.log.warning("cookies: %s", exc)
                 else:
@@ -233,6 +331,85 @@ class Extractor():
         fmt = self.config("date-format", "%Y-%m-%dT%H:%M:%S")
         return get("date-min", dmin), get("date-max", dmax)
 
+    def watermark(self):
+        """Return the newest item value seen on the last successful run
+
+        Returns None for extractors without incremental support, if the
+        'incremental' option is disabled, or if there was no such run.
+        """
+        if not self.incremental or not self.config("incremental", False):
+            return None
+        return _watermark(self._source_key())
+
+    def update_watermark(self, value):
+        """Remember 'value' if it is newer than all previous ones"""
+        if self._watermark is None or value > self._watermark:
+            self._watermark = value
+
+    def commit_watermark(self):
+        """Store the newest item value seen during this run"""
+        if self._watermark is not None and self.incremental and \
+                self.config("incremental", False):
+            _watermark.update(self._source_key(), self._watermark)
+
+    def _incremental(self, items, key):
+        """Yield elements of 'items' up to the newest one of the last run
+
+        'items' has to be ordered from newest to oldest by the unique
+        values 'key' returns for them. 'key' may return None for elements
+        outside of this order, like pinned posts, which always get yielded.
+
+        An element only counts as seen once the next one gets requested,
+        i.e. after the job has handled all messages built from it.
+        """
+        watermark = self.watermark()
+        for item in items:
+            value = key(item)
+            if value is None:
+                yield item
+                continue
+            if watermark is not None and value <= watermark:
+                return
+            yield item
+            self.update_watermark(value)
+
+    def checkpoint(self, name):
+        """Return the state of pagination 'name' from an interrupted run
+
+        Returns None unless 'resume' got enabled by a download job.
+        """
+        key = "{}:{}".format(self._source_key(), name)
+        self._checkpoints[key] = None
+        if not self.resume:
+            return None
+        state = _checkpoint(key)
+        if state is not None:
+            self.log.info("Resuming %s from %s", name, state)
+        return state
+
+    def update_checkpoint(self, name, state):
+        """Save 'state' before requesting the page it describes
+
+        The state of the previous page gets stored instead, which ensures
+        all items of a resumed page were completely processed before.
+        """
+        key = "{}:{}".format(self._source_key(), name)
+        previous = self._checkpoints.get(key)
+        if previous == state:
+            return
+        if previous is not None and self.resume:
+            _checkpoint.update(key, previous)
+        self._checkpoints[key] = state
+
+    def clear_checkpoints(self):
+        """Remove all pagination states of this run"""
+        for key in self._checkpoints:
+            _checkpoint.invalidate(key)
+        self._checkpoints.clear()
+
+    def _source_key(self):
+        return "{}:{}".format(self.category, self.url)
+
     @classmethod
     def _get_tests(cls):
         """Yield an extractor's test cases as (URL, RESULTS) tuples"""
@@ -259,6 +436,7 @@ class ChapterExtractor(Extractor):
         "{manga}_c{chapter:>03}{chapter_minor:?//}_{page:>03}.{extension}")
     archive_fmt = (
         "{manga}_{chapter}{chapter_minor}_{page}")
+    gallery_archive_fmt = "{manga}_{chapter}{chapter_minor}"
 
     def __init__(self, match, url=None):
         Extractor.__init__(self, match)
@@ -339,6 +517,7 @@ class GalleryExtractor(ChapterExtractor):
     filename_fmt = "{category}_{gallery_id}_{page:>03}.{extension}"
     directory_fmt = ("{category}", "{gallery_id} {title}")
     archive_fmt = "{gallery_id}_{page}"
+    gallery_archive_fmt = "{gallery_id}"
 
 
 class AsynchronousMixin():
@@ -428,6 +607,65 @@ def generate_extractors(extractor_data, symtable, classes):
             symtable[Extr.__name__] = prev = Extr
 
 
+@cache(maxage=10*365*24*3600, keyarg=0, evict=False)
+def _watermark(key):
+    return None
+
+
+@cache(maxage=30*24*3600, keyarg=0)
+def _checkpoint(key):
+    return None
+
+
+@cache(maxage=30*24*3600, keyarg=0)
+def _response(key):
+    # (fresh until, ETag, Last-Modified, Content-Type, compressed body)
+    return None
+
+
+def _auth_identity(session, headers):
+    """Return a suffix for cache keys identifying a request's credentials"""
+    auth = headers and headers.get("Authorization") or \
+        session.headers.get("Authorization")
+    if not auth and session.auth:
+        auth = getattr(session.auth, "token", None) or repr(session.auth)
+    if not auth:
+        return ""
+    return "#" + hashlib.sha1(auth.encode()).hexdigest()
+
+
+def _cached_response(url, entry):
+    """Build a Response object from a stored response"""
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = "OK"
+    response.url = url
+    response._content = zlib.decompress(entry[4])
+    if entry[3]:
+        response.headers["Content-Type"] = entry[3]
+        response.encoding = requests.utils.get_encoding_from_headers(
+            response.headers)
+    return response
+
+
+def _load_cookiejar(path):
+    """Load a cookies.txt file, reusing results for unchanged files"""
+    key = (path, os.stat(path).st_mtime)
+    with _adapters_lock:
+        cookiejar = _cookiejars.get(key)
+    if cookiejar is None:
+        cookiejar = http.cookiejar.MozillaCookieJar()
+        cookiejar.load(path)
+        with _adapters_lock:
+            _cookiejars[key] = cookiejar
+    return cookiejar
+
+
+_adapters = {}
+_cookiejars = {}
+_adapters_lock = threading.Lock()
+
+
 # Reduce strictness of the expected magic string in cookiejar files.
 # (This allows the use of Wget-generated cookiejars without modification)
 http.cookiejar.MozillaCookieJar.magic_re = re.compile(
@@ -245,6 +245,7 @@ class DeviantartGalleryExtractor(DeviantartExtractor):
     """Extractor for all deviations from an artist's gallery"""
     subcategory = "gallery"
     archive_fmt = "g_{username}_{index}.{extension}"
+    incremental = True
     pattern = BASE_PATTERN + r"(?:/(?:gallery/?(?:\?catpath=/)?)?)?$"
     test = (
         ("https://www.deviantart.com/shimoda7/gallery/", {
@@ -324,10 +325,17 @@ class DeviantartGalleryExtractor(DeviantartExtractor):
 
     def deviations(self):
         if self.flat and not self.group:
-            return self.api.gallery_all(self.user, self.offset)
+            return self._incremental(
+                self.api.gallery_all(self.user, self.offset),
+                self._position)
         folders = self.api.gallery_folders(self.user)
         return self._folder_urls(folders, "gallery")
 
+    @staticmethod
+    def _position(deviation):
+        return (text.parse_int(deviation["published_time"]),
+                deviation["deviationid"])
+
 
 class DeviantartFolderExtractor(DeviantartExtractor):
     """Extractor for deviations inside an artist's gallery folder"""
@@ -784,7 +792,7 @@ class DeviantartAPI():
         """Authenticate the application by requesting an access token"""
         self.headers["Authorization"] = self._authenticate_impl(refresh_token)
 
-    @cache(maxage=3600, keyarg=1)
+    @cache(maxage=3600, keyarg=1, refresh=300)
     def _authenticate_impl(self, refresh_token):
         """Actual authenticate implementation"""
         url = "https://www.deviantart.com/oauth2/token"
@@ -808,7 +816,8 @@ class DeviantartAPI():
             _refresh_token_cache.update(refresh_token, data["refresh_token"])
         return "Bearer " + data["access_token"]
 
-    def _call(self, endpoint, params=None, fatal=True, public=True):
+    def _call(self, endpoint, params=None, fatal=True, public=True,
+              cache=None):
         """Call an API endpoint"""
         url = "https://www.deviantart.com/api/v1/oauth2/" + endpoint
         while True:
@@ -817,7 +826,8 @@ class DeviantartAPI():
 
             self.authenticate(None if public else self.refresh_token)
             response = self.extractor.request(
-                url, headers=self.headers, params=params, fatal=None)
+                url, headers=self.headers, params=params, fatal=None,
+                cache=cache)
             data = response.json()
             status = response.status_code
 
@@ -840,10 +850,22 @@ class DeviantartAPI():
                 self.log.error(msg)
                 return data
 
-    def _pagination(self, endpoint, params, extend=True):
+    def _pagination(self, endpoint, params, extend=True, cache=None):
         public = True
+        # folder lists get collected as a whole and are not resumable
+        checkpoint = self.extractor.update_checkpoint if extend else None
+        if checkpoint:
+            offset = self.extractor.checkpoint(endpoint)
+            if offset is not None:
+                params["offset"] = offset
+
         while True:
-            data = self._call(endpoint, params, public=public)
+            if checkpoint:
+                checkpoint(endpoint, params["offset"])
+            # public results might be incomplete and get requested again
+            data = self._call(
+                endpoint, params, public=public,
+                cache=None if public and self.refresh_token else cache)
             if "results" not in data:
                 self.log.error("Unexpected API response: %s", data)
                 return
@@ -866,7 +888,7 @@ class DeviantartAPI():
 
     def _pagination_folders(self, endpoint, params):
         result = []
-        result.extend(self._pagination(endpoint, params, False))
+        result.extend(self._pagination(endpoint, params, False, 86400))
         return result
 
     def _metadata(self, deviations):
@@ -116,6 +116,7 @@ class ExhentaiExtractor(Extractor):
 class ExhentaiGalleryExtractor(ExhentaiExtractor):
     """Extractor for image galleries from exhentai.org"""
     subcategory = "gallery"
+    gallery_archive_fmt = "{gallery_id}"
     pattern = (BASE_PATTERN +
                r"(?:/g/(\d+)/([\da-f]{10})"
                r"|/s/([\da-f]{10})/(\d+)-(\d+))")
@@ -161,8 +162,7 @@ class ExhentaiGalleryExtractor(ExhentaiExtractor):
                 self.log.error("Failed to extract initial image token")
                 self.log.debug("Page content:\n%s", gpage)
                 return
-            self.wait()
-            ipage = self._image_page()
+            ipage = None
         else:
             ipage = self._image_page()
             part = text.extract(ipage, 'hentai.org/g/', '"')[0]
@@ -180,6 +180,12 @@ class ExhentaiGalleryExtractor(ExhentaiExtractor):
         yield Message.Version, 1
         yield Message.Directory, data
 
+        # request the first image page only after the job had
+        # a chance to skip this gallery based on its metadata
+        if ipage is None:
+            self.wait()
+            ipage = self._image_page()
+
         images = itertools.chain(
             (self.image_from_page(ipage),), self.images_from_api())
         for url, image in images:
@@ -398,7 +404,11 @@ class ExhentaiSearchExtractor(ExhentaiExtractor):
                 if url == last:
                     continue
                 last = url
-                yield Message.Queue, url, {}
+                data = {"_extractor": ExhentaiGalleryExtractor}
+                if gallery.group(2):
+                    data["gallery_id"] = text.parse_int(gallery.group(2))
+                    data["gallery_token"] = gallery.group(3)
+                yield Message.Queue, url, data
 
             if 'class="ptdd">&gt;<' in page or ">No hits found</p>" in page:
                 return
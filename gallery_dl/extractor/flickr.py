@@ -32,6 +32,10 @@ class FlickrExtractor(Extractor):
             url = photo["url"]
             yield Message.Url, url, text.nameext_from_url(url, photo)
 
+    def skip(self, num):
+        self.api.offset += num
+        return num
+
     def metadata(self):
         """Return general metadata"""
         self.user = self.api.urls_lookupUser(self.item_id)
@@ -88,6 +92,9 @@ class FlickrImageExtractor(FlickrExtractor):
                         "vwxyzABCDEFGHJKLMNPQRSTUVWXYZ")
             self.item_id = util.bdecode(match.group(2), alphabet)
 
+    def skip(self, _):
+        return 0
+
     def items(self):
         photo = self.api.photos_getInfo(self.item_id)
 
@@ -301,6 +308,7 @@ class FlickrAPI(oauth.OAuth1API):
     def __init__(self, extractor):
         oauth.OAuth1API.__init__(self, extractor)
 
+        self.offset = 0
         self.videos = extractor.config("videos", True)
         self.maxsize = extractor.config("size-max")
         if isinstance(self.maxsize, str):
@@ -369,7 +377,8 @@ class FlickrAPI(oauth.OAuth1API):
     def photosets_getInfo(self, photoset_id, user_id):
         """Gets information about a photoset."""
         params = {"photoset_id": photoset_id, "user_id": user_id}
-        photoset = self._call("photosets.getInfo", params)["photoset"]
+        photoset = self._call(
+            "photosets.getInfo", params, cache=86400)["photoset"]
         return self._clean_info(photoset)
 
     def photosets_getList(self, user_id):
@@ -407,13 +416,15 @@ class FlickrAPI(oauth.OAuth1API):
         stream = self._call("video.getStreamInfo", params)["streams"]["stream"]
         return max(stream, key=lambda s: self.VIDEO_FORMATS.get(s["type"], 0))
 
-    def _call(self, method, params):
+    def _call(self, method, params, cache=None):
         params["method"] = "flickr." + method
         params["format"] = "json"
         params["nojsoncallback"] = "1"
         if self.api_key:
             params["api_key"] = self.api_key
-        data = self.request(self.API_URL, params=params).json()
+        data = self.request(
+            self.API_URL, params=params, cache=cache,
+            validate=self._validate).json()
         if "code" in data:
             if data["code"] == 1:
                 raise exception.NotFoundError(self.extractor.subcategory)
@@ -425,14 +436,27 @@ class FlickrAPI(oauth.OAuth1API):
             raise exception.StopExtraction()
         return data
 
+    @staticmethod
+    def _validate(response):
+        """Return True if 'response' is no error message"""
+        return "code" not in response.json()
+
     def _pagination(self, method, params, key="photos"):
         params["extras"] = "description,date_upload,tags,views,media,"
         params["extras"] += ",".join("url_" + fmt[0] for fmt in self.formats)
-        params["page"] = 1
+        params["per_page"] = 500
+
+        # start on the page containing the first non-skipped photo
+        page, skip = divmod(self.offset, params["per_page"])
+        params["page"] = page + 1
 
         while True:
             data = self._call(method, params)[key]
-            yield from map(self._extract_format, data["photo"])
+            photos = data["photo"]
+            if skip:
+                photos = photos[skip:]
+                skip = 0
+            yield from map(self._extract_format, photos)
             if params["page"] >= data["pages"]:
                 return
             params["page"] += 1
@@ -48,6 +48,7 @@ class HbrowseChapterExtractor(HbrowseBase, ChapterExtractor):
     filename_fmt = ("{category}_{manga_id}_{chapter:>05}_"
                     "{page:>03}.{extension}")
     archive_fmt = "{manga_id}_{chapter}_{page}"
+    gallery_archive_fmt = "{manga_id}_{chapter}"
     pattern = r"(?:https?://)?(?:www\.)?hbrowse\.com(/(\d+)/c(\d+))"
     test = ("https://www.hbrowse.com/10363/c00000", {
         "url": "6feefbc9f4b98e20d8425ddffa9dd111791dc3e6",
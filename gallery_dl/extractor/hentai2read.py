@@ -23,6 +23,7 @@ class Hentai2readBase():
 class Hentai2readChapterExtractor(Hentai2readBase, ChapterExtractor):
     """Extractor for a single manga chapter from hentai2read.com"""
     archive_fmt = "{chapter_id}_{page}"
+    gallery_archive_fmt = "{chapter_id}"
     pattern = r"(?:https?://)?(?:www\.)?hentai2read\.com(/[^/?&#]+/(\d+))"
     test = ("https://hentai2read.com/amazon_elixir/1/", {
         "url": "964b942cf492b3a129d2fe2608abfc475bc99e71",
@@ -23,6 +23,7 @@ class HentaihereBase():
 class HentaihereChapterExtractor(HentaihereBase, ChapterExtractor):
     """Extractor for a single manga chapter from hentaihere.com"""
     archive_fmt = "{chapter_id}_{page}"
+    gallery_archive_fmt = "{chapter_id}"
     pattern = r"(?:https?://)?(?:www\.)?hentaihere\.com/m/S(\d+)/(\d+)"
     test = ("https://hentaihere.com/m/S13812/1/1/", {
         "url": "964b942cf492b3a129d2fe2608abfc475bc99e71",
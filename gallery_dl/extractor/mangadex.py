@@ -35,7 +35,7 @@ class MangadexExtractor(Extractor):
     def manga_data(self, manga_id):
         """Request API results for 'manga_id'"""
         url = "{}/api/manga/{}".format(self.root, manga_id)
-        return self.request(url).json()
+        return self.request(url, cache=3600).json()
 
 
 class MangadexChapterExtractor(MangadexExtractor):
@@ -47,6 +47,7 @@ class MangadexChapterExtractor(MangadexExtractor):
     filename_fmt = (
         "{manga}_c{chapter:>03}{chapter_minor}_{page:>03}.{extension}")
     archive_fmt = "{chapter_id}_{page}"
+    gallery_archive_fmt = "{chapter_id}"
     pattern = r"(?:https?://)?(?:www\.)?mangadex\.(?:org|com)/chapter/(\d+)"
     test = (
         ("https://mangadex.org/chapter/122094", {
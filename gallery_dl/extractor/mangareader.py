@@ -35,6 +35,7 @@ class MangareaderBase():
 class MangareaderChapterExtractor(MangareaderBase, ChapterExtractor):
     """Extractor for manga-chapters from mangareader.net"""
     archive_fmt = "{manga}_{chapter}_{page}"
+    gallery_archive_fmt = "{manga}_{chapter}"
     pattern = r"(?:https?://)?(?:www\.)?mangareader\.net((/[^/?&#]+)/(\d+))"
     test = (("https://www.mangareader.net"
              "/karate-shoukoushi-kohinata-minoru/11"), {
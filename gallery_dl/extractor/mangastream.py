@@ -16,6 +16,7 @@ class MangastreamChapterExtractor(ChapterExtractor):
     """Extractor for manga-chapters from mangastream.com"""
     category = "mangastream"
     archive_fmt = "{chapter_id}_{page}"
+    gallery_archive_fmt = "{chapter_id}"
     pattern = (r"(?:https?://)?(?:www\.)?(?:readms\.net|mangastream\.com)"
                r"/r(?:ead)?/([^/]*/([^/]+)/(\d+))")
     test = (
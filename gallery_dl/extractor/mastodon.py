@@ -61,6 +61,7 @@ class MastodonExtractor(Extractor):
 class MastodonUserExtractor(MastodonExtractor):
     """Extractor for all images of an account/user"""
     subcategory = "user"
+    incremental = True
 
     def __init__(self, match):
         MastodonExtractor.__init__(self, match)
@@ -73,7 +74,9 @@ class MastodonUserExtractor(MastodonExtractor):
                 break
         else:
             raise exception.NotFoundError("account")
-        return self.api.account_statuses(account["id"])
+        return self._incremental(
+            self.api.account_statuses(account["id"]),
+            lambda status: text.parse_int(status["id"]))
 
 
 class MastodonStatusExtractor(MastodonExtractor):
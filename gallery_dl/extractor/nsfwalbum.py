@@ -20,6 +20,7 @@ class NsfwalbumAlbumExtractor(GalleryExtractor):
     filename_fmt = "{album_id}_{page:>03}_{id}.{extension}"
     directory_fmt = ("{category}", "{album_id} {title}")
     archive_fmt = "{id}"
+    gallery_archive_fmt = "{album_id}"
     pattern = r"(?:https?://)?(?:www\.)?nsfwalbum\.com(/album/(\d+))"
     test = ("https://nsfwalbum.com/album/295201", {
         "range": "1-5",
@@ -246,7 +246,13 @@ class PinterestAPI():
         raise exception.StopExtraction()
 
     def _pagination(self, resource, options):
+        bookmarks = self.extractor.checkpoint(resource)
+        if bookmarks:
+            options["bookmarks"] = bookmarks
+
         while True:
+            self.extractor.update_checkpoint(
+                resource, options.get("bookmarks"))
             data = self._call(resource, options)
             yield from data["resource_response"]["data"]
 
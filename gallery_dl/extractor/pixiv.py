@@ -81,6 +81,7 @@ class PixivExtractor(Extractor):
 class PixivUserExtractor(PixivExtractor):
     """Extractor for works of a pixiv-user"""
     subcategory = "user"
+    incremental = True
     pattern = (r"(?:https?://)?(?:www\.|touch\.)?pixiv\.net/"
                r"(?:member(?:_illust)?\.php\?id=(\d+)(?:&([^#]+))?"
                r"|(?:u(?:ser)?/|(?:mypage\.php)?#id=)(\d+))")
@@ -109,7 +110,8 @@ class PixivUserExtractor(PixivExtractor):
         self.query = text.parse_query(match.group(2))
 
     def works(self):
-        works = self.api.user_illusts(self.user_id)
+        works = self._incremental(
+            self.api.user_illusts(self.user_id), lambda work: work["id"])
 
         if "tag" in self.query:
             tag = text.unquote(self.query["tag"]).lower()
@@ -420,7 +422,7 @@ class PixivAppAPI():
         self.user, auth = self._login_impl(self.username, self.password)
         self.extractor.session.headers["Authorization"] = auth
 
-    @cache(maxage=3600, keyarg=1)
+    @cache(maxage=3600, keyarg=1, refresh=300)
     def _login_impl(self, username, password):
         url = "https://oauth.secure.pixiv.net/auth/token"
         data = {
@@ -497,7 +499,10 @@ class PixivAppAPI():
         raise exception.StopExtraction()
 
     def _pagination(self, endpoint, params):
+        params = self.extractor.checkpoint(endpoint) or params
+
         while True:
+            self.extractor.update_checkpoint(endpoint, params)
             data = self._call(endpoint, params)
             yield from data["illusts"]
 
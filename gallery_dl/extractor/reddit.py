@@ -77,6 +77,7 @@ class RedditExtractor(Extractor):
 class RedditSubredditExtractor(RedditExtractor):
     """Extractor for images from subreddits on reddit.com"""
     subcategory = "subreddit"
+    incremental = True
     pattern = (r"(?:https?://)?(?:\w+\.)?reddit\.com/r/([^/?&#]+)"
                r"(/[a-z]+)?/?"
                r"(?:\?.*?(?:\bt=([a-z]+))?)?$")
@@ -210,7 +211,7 @@ class RedditAPI():
         access_token = self._authenticate_impl(self.refresh_token)
         self.extractor.session.headers["Authorization"] = access_token
 
-    @cache(maxage=3600, keyarg=1)
+    @cache(maxage=3600, keyarg=1, refresh=300)
     def _authenticate_impl(self, refresh_token=None):
         """Actual authenticate implementation"""
         url = "https://www.reddit.com/api/v1/access_token"
@@ -254,13 +255,30 @@ class RedditAPI():
         id_max = self._parse_id("id-max", 2147483647)
         date_min, date_max = self.extractor._get_date_min_max(0, 253402210800)
 
+        # stop at the newest submission of the last run,
+        # but only if they are sorted from newest to oldest
+        chronological = endpoint.endswith("/new/.json")
+        if chronological:
+            watermark = self.extractor.watermark()
+            if watermark is not None:
+                id_min = max(id_min, watermark + 1)
+
+        after = self.extractor.checkpoint(endpoint)
+        if after:
+            params["after"] = after
+
         while True:
+            self.extractor.update_checkpoint(endpoint, params.get("after"))
             data = self._call(endpoint, params)["data"]
 
             for submission in data["children"]:
                 submission = submission["data"]
+                sid = self._decode(submission["id"])
+                if chronological and sid < id_min and \
+                        not submission.get("stickied"):
+                    return
                 if (date_min <= submission["created_utc"] <= date_max and
-                        id_min <= self._decode(submission["id"]) <= id_max):
+                        id_min <= sid <= id_max):
                     if submission["num_comments"] and self.comments:
                         try:
                             yield self.submission(submission["id"])
@@ -268,6 +286,9 @@ class RedditAPI():
                             pass
                     else:
                         yield submission, _empty
+                    # the job is done with a submission once it resumes
+                    if chronological:
+                        self.extractor.update_watermark(sid)
 
             if not data["after"]:
                 return
@@ -85,6 +85,11 @@ class SmugmugAlbumExtractor(SmugmugExtractor):
     def __init__(self, match):
         SmugmugExtractor.__init__(self, match)
         self.album_id = match.group(1)
+        self.start = 1
+
+    def skip(self, num):
+        self.start += num
+        return num
 
     def items(self):
         album = self.api.album(self.album_id, "User")
@@ -97,7 +102,8 @@ class SmugmugAlbumExtractor(SmugmugExtractor):
         yield Message.Version, 1
         yield Message.Directory, data
 
-        for image in self.api.album_images(self.album_id, "ImageSizeDetails"):
+        for image in self.api.album_images(
+                self.album_id, "ImageSizeDetails", self.start):
             url = self._select_format(image)
             data["Image"] = image
             yield Message.Url, url, text.nameext_from_url(url, data)
@@ -222,13 +228,14 @@ class SmugmugAPI(oauth.OAuth1API):
         return self._expansion("image/" + image_id, expands)
 
     def node(self, node_id, expands=None):
-        return self._expansion("node/" + node_id, expands)
+        return self._expansion("node/" + node_id, expands, cache=86400)
 
     def user(self, username, expands=None):
         return self._expansion("user/" + username, expands)
 
-    def album_images(self, album_id, expands=None):
-        return self._pagination("album/" + album_id + "!images", expands)
+    def album_images(self, album_id, expands=None, start=1):
+        return self._pagination(
+            "album/" + album_id + "!images", expands, start)
 
     def node_children(self, node_id, expands=None):
         return self._pagination("node/" + node_id + "!children", expands)
@@ -244,14 +251,16 @@ class SmugmugAPI(oauth.OAuth1API):
         params = {"urlpath": path}
         return self._expansion(endpoint, "Node", params)
 
-    def _call(self, endpoint, params=None, domain=API_DOMAIN):
+    def _call(self, endpoint, params=None, domain=API_DOMAIN, cache=None):
         url = "https://{}/api/v2/{}".format(domain, endpoint)
         params = params or {}
         if self.api_key:
             params["APIKey"] = self.api_key
         params["_verbosity"] = "1"
 
-        response = self.request(url, params=params, headers=self.HEADERS)
+        response = self.request(
+            url, params=params, headers=self.HEADERS, cache=cache,
+            validate=self._validate)
         data = response.json()
 
         if 200 <= data["Code"] < 400:
@@ -265,16 +274,22 @@ class SmugmugAPI(oauth.OAuth1API):
             self.log.debug(data)
         raise exception.StopExtraction()
 
-    def _expansion(self, endpoint, expands, params=None):
+    @staticmethod
+    def _validate(response):
+        """Return True if 'response' is no error message"""
+        return 200 <= response.json()["Code"] < 400
+
+    def _expansion(self, endpoint, expands, params=None, cache=None):
         endpoint = self._extend(endpoint, expands)
-        result = self._apply_expansions(self._call(endpoint, params), expands)
+        result = self._apply_expansions(
+            self._call(endpoint, params, cache=cache), expands)
         if not result:
             raise exception.NotFoundError()
         return result[0]
 
-    def _pagination(self, endpoint, expands=None):
+    def _pagination(self, endpoint, expands=None, start=1):
         endpoint = self._extend(endpoint, expands)
-        params = {"start": 1, "count": 100}
+        params = {"start": start, "count": 100}
 
         while True:
             data = self._call(endpoint, params)
@@ -71,7 +71,7 @@ class TumblrExtractor(Extractor):
         blog = None
         yield Message.Version, 1
 
-        for post in self.posts():
+        for post in self._incremental(self.posts(), self._position):
             if self.date_min > post["timestamp"]:
                 return
             if post["type"] not in self.types:
@@ -139,6 +139,10 @@ class TumblrExtractor(Extractor):
     def posts(self):
         """Return an iterable containing all relevant posts"""
 
+    @staticmethod
+    def _position(post):
+        return None if post.get("is_pinned") else post["id"]
+
     def _setup_posttypes(self):
         types = self.config("posts", "all")
 
@@ -200,6 +204,7 @@ class TumblrExtractor(Extractor):
 class TumblrUserExtractor(TumblrExtractor):
     """Extractor for all images from a tumblr-user"""
     subcategory = "user"
+    incremental = True
     pattern = BASE_PATTERN + r"(?:/page/\d+|/archive)?/?$"
     test = (
         ("http://demo.tumblr.com/", {
@@ -302,6 +307,7 @@ class TumblrPostExtractor(TumblrExtractor):
 class TumblrTagExtractor(TumblrExtractor):
     """Extractor for images from a tumblr-user by tag"""
     subcategory = "tag"
+    incremental = True
     pattern = BASE_PATTERN + r"/tagged/([^/?&#]+)"
     test = ("http://demo.tumblr.com/tagged/Times%20Square", {
         "pattern": (r"https://\d+\.media\.tumblr\.com/tumblr_[^/_]+_1280.jpg"),
@@ -343,7 +349,8 @@ class TumblrAPI(oauth.OAuth1API):
     def info(self, blog):
         """Return general information about a blog"""
         if blog not in self.BLOG_CACHE:
-            self.BLOG_CACHE[blog] = self._call(blog, "info", {})["blog"]
+            self.BLOG_CACHE[blog] = self._call(
+                blog, "info", {}, cache=86400)["blog"]
         return self.BLOG_CACHE[blog]
 
     def avatar(self, blog, size="512"):
@@ -39,7 +39,7 @@ class TwitterExtractor(Extractor):
         yield Message.Version, 1
         yield Message.Directory, self.metadata()
 
-        for tweet in self.tweets():
+        for tweet in self._incremental(self.tweets(), self._position):
             data = self._data_from_tweet(tweet)
 
             if not self.retweets and data["retweet_id"]:
@@ -114,6 +114,15 @@ class TwitterExtractor(Extractor):
             data["content"] = cl if cl and len(cr) < 16 else content
         return data
 
+    @staticmethod
+    def _position(tweet):
+        """Return a tweet's position in its timeline, or None if pinned"""
+        if "user-pinned" in tweet.partition('"')[0]:
+            return None
+        return text.parse_int(
+            text.extract(tweet, 'data-retweet-id="', '"')[0] or
+            text.extract(tweet, 'data-tweet-id="', '"')[0])
+
     def _tweets_from_api(self, url):
         params = {
             "include_available_features": "1",
@@ -149,6 +158,7 @@ class TwitterExtractor(Extractor):
 class TwitterTimelineExtractor(TwitterExtractor):
     """Extractor for all images from a user's timeline"""
     subcategory = "timeline"
+    incremental = True
     pattern = (r"(?:https?://)?(?:www\.|mobile\.)?twitter\.com"
                r"/([^/?&#]+)/?$")
     test = ("https://twitter.com/supernaturepics", {
@@ -166,6 +176,7 @@ class TwitterTimelineExtractor(TwitterExtractor):
 class TwitterMediaExtractor(TwitterExtractor):
     """Extractor for all images from a user's Media Tweets"""
     subcategory = "media"
+    incremental = True
     pattern = (r"(?:https?://)?(?:www\.|mobile\.)?twitter\.com"
                r"/([^/?&#]+)/media(?!\w)")
     test = ("https://twitter.com/supernaturepics/media", {
@@ -6,9 +6,15 @@
 # it under the terms of the GNU General Public License version 2 as
 # published by the Free Software Foundation.
 
+import os
 import sys
+import copy
 import time
 import logging
+import queue
+import threading
+import collections
+from concurrent.futures import Future
 from . import extractor, downloader, postprocessor
 from . import config, text, util, output, exception
 from .extractor.message import Message
@@ -25,12 +31,18 @@ class Job():
             raise exception.NoExtractorError()
 
         self.extractor = extr
-        extr.log.extractor = extr
-        extr.log.job = self
-        extr.log.debug("Using %s for '%s'", extr.__class__.__name__, extr.url)
-
-        self.pred_url = self._prepare_predicates("image", True)
-        self.pred_queue = self._prepare_predicates("chapter", False)
+        self.status = 0
+        self.finished = False
+        self.dropped = False
+        context = output.set_context(extr, self)
+        try:
+            extr.log.debug(
+                "Using %s for '%s'", extr.__class__.__name__, extr.url)
+            self.range_url = self.range_queue = None
+            self.pred_url = self._prepare_predicates("image", True)
+            self.pred_queue = self._prepare_predicates("chapter", False)
+        finally:
+            output.set_context(*context)
 
         if parent and parent.extractor.config(
                 "category-transfer", parent.extractor.categorytransfer):
@@ -41,40 +53,53 @@ class Job():
         self.userkwds = self.extractor.config("keywords")
 
     def run(self):
-        """Execute or run the job"""
+        """Execute or run the job and return its exit status"""
+        context = output.set_context(self.extractor, self)
         try:
             log = self.extractor.log
             for msg in self.extractor:
                 self.dispatch(msg)
+            self.finished = True
         except exception.AuthenticationError as exc:
+            self.status |= 1
             msg = str(exc) or "Please provide a valid username/password pair."
             log.error("Authentication failed: %s", msg)
         except exception.AuthorizationError:
+            self.status |= 1
             log.error("You do not have permission to access the resource "
                       "at '%s'", self.extractor.url)
         except exception.NotFoundError as exc:
+            self.status |= 1
             res = str(exc) or "resource (gallery/image/user)"
             log.error("The %s at '%s' does not exist", res, self.extractor.url)
         except exception.HttpError as exc:
+            self.status |= 1
             err = exc.args[0]
             if isinstance(err, Exception):
                 err = "{}: {}".format(err.__class__.__name__, err)
             log.error("HTTP request failed:  %s", err)
         except exception.FormatError as exc:
+            self.status |= 1
             err, obj = exc.args
             log.error("Applying %s format string failed:  %s: %s",
                       obj, err.__class__.__name__, err)
         except exception.FilterError as exc:
+            self.status |= 1
             err = exc.args[0]
             log.error("Evaluating filter expression failed:  %s: %s",
                       err.__class__.__name__, err)
+        except exception.RangeExhausted:
+            # every item in range got handled, which counts as a full run
+            self.finished = True
         except exception.StopExtraction:
             pass
         except OSError as exc:
+            self.status |= 1
             log.error("Unable to download data:  %s: %s",
                       exc.__class__.__name__, exc)
             log.debug("", exc_info=True)
         except Exception as exc:
+            self.status |= 1
             log.error(("An unexpected error occurred: %s - %s. "
                        "Please run gallery-dl again with the --verbose flag, "
                        "copy its output and report this issue on "
@@ -83,6 +108,8 @@ class Job():
             log.debug("", exc_info=True)
         finally:
             self.handle_finalize()
+            output.set_context(*context)
+        return self.status
 
     def dispatch(self, msg):
         """Call the appropriate message handler"""
@@ -91,6 +118,11 @@ class Job():
             if self.pred_url(url, kwds):
                 self.update_kwdict(kwds)
                 self.handle_url(url, kwds)
+                if self.range_url and self.range_url.exhausted:
+                    self.dropped = True
+                    raise exception.RangeExhausted()
+            else:
+                self.dropped = True
 
         elif msg[0] == Message.Directory:
             self.update_kwdict(msg[1])
@@ -100,12 +132,22 @@ class Job():
             _, url, kwds = msg
             if self.pred_queue(url, kwds):
                 self.handle_queue(url, kwds)
+                if self.range_queue and self.range_queue.exhausted:
+                    self.dropped = True
+                    raise exception.RangeExhausted()
+            else:
+                self.dropped = True
 
         elif msg[0] == Message.Urllist:
             _, urls, kwds = msg
             if self.pred_url(urls[0], kwds):
                 self.update_kwdict(kwds)
                 self.handle_urllist(urls, kwds)
+                if self.range_url and self.range_url.exhausted:
+                    self.dropped = True
+                    raise exception.RangeExhausted()
+            else:
+                self.dropped = True
 
         elif msg[0] == Message.Version:
             if msg[1] != 1:
@@ -160,10 +202,19 @@ class Job():
                 self.extractor.log.warning(
                     "invalid %s range: %s", target, exc)
             else:
-                if skip and pred.lower > 1 and not pfilter:
-                    pred.index += self.extractor.skip(pred.lower - 1)
+                if pred.lower > 1:
+                    self.dropped = True
+                    if skip and not pfilter:
+                        pred.index += self.extractor.skip(pred.lower - 1)
                 predicates.append(pred)
 
+                # stop right after the last item in range
+                # instead of requesting the next one first
+                if target == "image":
+                    self.range_url = pred
+                else:
+                    self.range_queue = pred
+
         return util.build_predicate(predicates)
 
     def _write_unsupported(self, url):
@@ -178,66 +229,179 @@ class Job():
 
 class DownloadJob(Job):
     """Download images into appropriate directory/filename locations"""
+    resumable = True
 
     def __init__(self, url, parent=None):
         Job.__init__(self, url, parent)
+        # only runs that actually download files may continue later on
+        self.extractor.resume = self.resumable and \
+            self.extractor.config("resume", False)
         self.log = logging.getLogger("download")
         self.pathfmt = None
         self.archive = None
+        self.galleries = None
+        self.index = None
         self.sleep = None
+        self.workers = None
+        self.ppworkers = None
+        self.children = None
+        self.inflight = None
         self.downloaders = {}
         self.postprocessors = None
         self.out = output.select()
 
+        # progress output of concurrently running downloads would get garbled
+        self.progress = True
+        if isinstance(parent, DownloadJob):
+            self.progress = parent.progress and not parent.children
+
+        concurrency = self.extractor.config("queue-concurrency", 1)
+        if concurrency and concurrency > 1:
+            self.children = WorkerPool(
+                concurrency, self._update_status, self.log, self.handle_error)
+
     def handle_url(self, url, keywords, fallback=None):
         """Download the resource specified in 'url'"""
         postprocessors = self.postprocessors
         pathfmt = self.pathfmt
         archive = self.archive
 
+        if self.workers or self.ppworkers:
+            # use separate per-file objects, since the extractor keeps
+            # modifying 'keywords' while this file is being processed
+            keywords = keywords.copy()
+            pathfmt = pathfmt.copy()
+            if postprocessors:
+                postprocessors = [copy.copy(pp) for pp in postprocessors]
+        keywords.pop("_hash", None)
+
         # prepare download
         pathfmt.set_keywords(keywords)
 
+        if self.inflight is not None:
+            keys = (pathfmt.realpath,
+                    archive.keygen(keywords) if archive else None)
+            if keys[0] in self.inflight or keys[1] in self.inflight:
+                # the same file is still being downloaded or processed;
+                # wait for it before checking whether it exists
+                if self.workers:
+                    self.workers.wait()
+                if self.ppworkers:
+                    self.ppworkers.wait()
+
         if postprocessors:
             for pp in postprocessors:
                 pp.prepare(pathfmt)
 
         if pathfmt.exists(archive):
-            self.handle_skip()
+            self.handle_skip(pathfmt)
             return
 
         if self.sleep:
             time.sleep(self.sleep)
 
+        if self.inflight is not None:
+            for key in keys:
+                if key:
+                    self.inflight[key] = pathfmt
+
+        if self.workers:
+            # downloads finish out of order; count skips between submissions
+            self._skipcnt = 0
+            self.workers.submit(
+                self.process_url, (url, pathfmt, fallback),
+                pathfmt, postprocessors)
+        else:
+            self.handle_download(
+                pathfmt, postprocessors,
+                self.process_url(url, pathfmt, fallback))
+
+    def process_url(self, url, pathfmt, fallback=None):
+        """Download 'url' or one of its fallback URLs into 'pathfmt'
+
+        Returns True if a file was downloaded, False if it got skipped,
+        and None if the download failed.
+        """
         # download from URL
-        if not self.download(url):
+        if not self.download(url, pathfmt):
 
             # use fallback URLs if available
             for num, url in enumerate(fallback or (), 1):
                 self.log.info("Trying fallback URL #%d", num)
-                if self.download(url):
+                if self.download(url, pathfmt):
                     break
             else:
                 # download failed
                 self.log.error("Failed to download %s",
                                pathfmt.filename or url)
-                return
+                return None
+
+        return bool(pathfmt.temppath)
 
-        if not pathfmt.temppath:
-            self.handle_skip()
+    def handle_download(self, pathfmt, postprocessors, result):
+        """Run all per-file steps after a download has finished"""
+        if not result:
+            self._release(pathfmt)
+            if result is None:
+                self.status |= 1
+            else:
+                self.handle_skip(pathfmt)
             return
+        if not self.workers:
+            self._skipcnt = 0
 
         # run post processors
         if postprocessors:
-            for pp in postprocessors:
-                pp.run(pathfmt)
+            if self.ppworkers:
+                self.ppworkers.submit(
+                    self.run_postprocessors, (pathfmt, postprocessors),
+                    pathfmt)
+                return
+            self.run_postprocessors(pathfmt, postprocessors)
 
-        # download succeeded
+        self.handle_success(pathfmt)
+
+    @staticmethod
+    def run_postprocessors(pathfmt, postprocessors):
+        """Apply all 'postprocessors' to a downloaded file"""
+        for pp in postprocessors:
+            pp.run(pathfmt)
+
+    def handle_success(self, pathfmt, _=None):
+        """Move a processed file to its target location and record it"""
         pathfmt.finalize()
+        if self.index and "_hash" in pathfmt.keywords:
+            self.handle_duplicate(pathfmt)
         self.out.success(pathfmt.path, 0)
-        if archive:
-            archive.add(keywords)
-        self._skipcnt = 0
+        if self.archive:
+            self.archive.add(pathfmt.keywords)
+        self._release(pathfmt)
+
+    def handle_error(self, pathfmt=None, *_):
+        """Handle an exception raised by a worker thread"""
+        self.status |= 1
+        if pathfmt:
+            self._release(pathfmt)
+
+    def _release(self, pathfmt):
+        """Remove 'pathfmt' from the files currently being processed"""
+        if self.inflight:
+            for key in [key for key, value in self.inflight.items()
+                        if value is pathfmt]:
+                del self.inflight[key]
+
+    def handle_duplicate(self, pathfmt):
+        """Replace a file with a link if its content is already known"""
+        digest = pathfmt.keywords["_hash"]
+        path = self.index.get(digest)
+        if path == pathfmt.realpath or not os.path.exists(pathfmt.realpath):
+            return
+        if path and os.path.exists(path):
+            if pathfmt.deduplicate(path, self.dedup):
+                self.log.debug("%s: duplicate of %s", pathfmt.realpath, path)
+                return
+            self.log.warning("Failed to deduplicate %s", pathfmt.realpath)
+        self.index.add(digest, pathfmt.realpath)
 
     def handle_urllist(self, urls, keywords):
         """Download the resource specified in 'url'"""
@@ -252,55 +416,142 @@ class DownloadJob(Job):
         else:
             self.pathfmt.set_directory(keywords)
 
+        if self.galleries is not None:
+            key = self._gallery_key(self.extractor, keywords)
+            if key:
+                signature = util.Formatter(
+                    self.extractor.gallery_signature_fmt).format_map(keywords)
+                if self.archive.check_gallery(key, signature):
+                    self.out.skip(self.pathfmt.directory)
+                    raise exception.StopExtraction()
+                self.galleries.append((key, signature))
+
     def handle_queue(self, url, keywords):
         if "_extractor" in keywords:
             extr = keywords["_extractor"].from_url(url)
         else:
             extr = extractor.find(url)
-        if extr:
-            self.__class__(extr, self).run()
-        else:
+        if not extr:
             self._write_unsupported(url)
+        elif self._gallery_archived(extr, keywords):
+            self.out.skip(url)
+        elif self.children:
+            self.children.submit(self._run_child, (extr,))
+        else:
+            self.status |= self.__class__(extr, self).run()
 
     def handle_finalize(self):
+        if self.children:
+            self.children.join()
+        if self.workers:
+            # do not abort or exit while finishing already started downloads
+            self._skipexc = None
+            self.workers.join()
+        if self.ppworkers:
+            self.ppworkers.join()
         if self.postprocessors:
             for pp in self.postprocessors:
                 pp.finalize()
+        if self.archive:
+            if (self.galleries and self.finished and
+                    not self.status and not self.dropped):
+                for key, signature in self.galleries:
+                    self.archive.add_gallery(key, signature)
+            self.archive.close()
+        if self.finished:
+            # failed files get retried from the start on the next run
+            self.extractor.clear_checkpoints()
+            # items left out by a range or filter are still to be handled
+            if not self.status and not self.dropped:
+                self.extractor.commit_watermark()
+
+    def _gallery_archived(self, extr, keywords):
+        """Return True if the gallery of 'extr' got downloaded before"""
+        if not extr.gallery_archive_fmt or not self.extractor.config(
+                "archive-galleries", False):
+            return False
+        if self.archive is None:
+            if self.pathfmt:
+                return False
+            self.archive = self._open_archive()
+            if not self.archive:
+                return False
+
+        if self.extractor.config(
+                "category-transfer", self.extractor.categorytransfer):
+            extr.category = self.extractor.category
+        key = self._gallery_key(extr, keywords)
+        if not key:
+            return False
+
+        # queue metadata rarely includes the file count of a gallery,
+        # so only compare signatures if it can actually be built
+        signature = self._gallery_format(
+            extr.gallery_signature_fmt, keywords)
+        return self.archive.check_gallery(key, signature)
+
+    def _gallery_key(self, extr, keywords):
+        key = self._gallery_format(extr.gallery_archive_fmt, keywords)
+        return extr.category + key if key is not None else None
 
-    def handle_skip(self):
-        self.out.skip(self.pathfmt.path)
+    @staticmethod
+    def _gallery_format(fmt, keywords):
+        """Apply 'keywords' to 'fmt' or return None if fields are missing"""
+        try:
+            return util.Formatter(fmt, _MISSING).format_map(keywords)
+        except Exception:
+            return None
+
+    def _run_child(self, extr):
+        return self.__class__(extr, self).run()
+
+    def _update_status(self, status):
+        self.status |= status
+
+    def handle_skip(self, pathfmt=None):
+        self.out.skip((pathfmt or self.pathfmt).path)
         if self._skipexc:
             self._skipcnt += 1
             if self._skipcnt >= self._skipmax:
                 raise self._skipexc()
 
-    def download(self, url):
+    def download(self, url, pathfmt=None):
         """Download 'url'"""
         scheme = url.partition(":")[0]
         downloader = self.get_downloader(scheme)
         if downloader:
-            return downloader.download(url, self.pathfmt)
+            return downloader.download(url, pathfmt or self.pathfmt)
         self._write_unsupported(url)
         return False
 
     def get_downloader(self, scheme):
         """Return a downloader suitable for 'scheme'"""
+        downloaders = self.downloaders
+        if self.workers:
+            # downloader objects are not thread-safe;
+            # give each worker thread its own set of them
+            try:
+                downloaders = self.workers.local.downloaders
+            except AttributeError:
+                downloaders = self.workers.local.downloaders = {}
+
         try:
-            return self.downloaders[scheme]
+            return downloaders[scheme]
         except KeyError:
             pass
 
         klass = downloader.find(scheme)
         if klass and config.get(("downloader", klass.scheme, "enabled"), True):
-            instance = klass(self.extractor, self.out)
+            out = self.out if self.progress else output.NullOutput()
+            instance = klass(self.extractor, out)
         else:
             instance = None
             self.log.error("'%s:' URLs are not supported/enabled", scheme)
 
         if klass.scheme == "http":
-            self.downloaders["http"] = self.downloaders["https"] = instance
+            downloaders["http"] = downloaders["https"] = instance
         else:
-            self.downloaders[scheme] = instance
+            downloaders[scheme] = instance
         return instance
 
     def initialize(self, keywords=None):
@@ -311,7 +562,15 @@ class DownloadJob(Job):
 
         self.sleep = self.extractor.config("sleep")
         if not self.extractor.config("download", True):
-            self.download = self.pathfmt.fix_extension
+            self.download = lambda url, pathfmt=None: (
+                pathfmt or self.pathfmt).fix_extension()
+        else:
+            workers = config.interpolate(("downloader", "workers"), 1)
+            if workers and workers > 1:
+                self.workers = WorkerPool(
+                    workers, self.handle_download, self.log,
+                    self.handle_error)
+                self.progress = False
 
         skip = self.extractor.config("skip", True)
         if skip:
@@ -329,10 +588,17 @@ class DownloadJob(Job):
         else:
             self.pathfmt.exists = lambda x=None: False
 
-        archive = self.extractor.config("archive")
-        if archive:
-            path = util.expand_path(archive)
-            self.archive = util.DownloadArchive(path, self.extractor)
+        if self.archive is None:
+            self.archive = self._open_archive()
+        if (self.archive and self.extractor.gallery_archive_fmt and
+                self.extractor.config("archive-galleries", False) and
+                self.extractor.config("download", True)):
+            self.galleries = []
+
+        index = self.extractor.config("content-index")
+        if index:
+            self.index = util.ContentIndex(util.expand_path(index))
+            self.dedup = self.extractor.config("deduplicate", "hardlink")
 
         postprocessors = self.extractor.config("postprocessors")
         if postprocessors:
@@ -359,9 +625,133 @@ class DownloadJob(Job):
             self.extractor.log.debug(
                 "Active postprocessor modules: %s", self.postprocessors)
 
+            workers = self.extractor.config("postprocessor-workers")
+            if workers and self.postprocessors:
+                self.ppworkers = WorkerPool(
+                    workers, self.handle_success, postprocessor.log,
+                    self.handle_error)
+
+        if self.workers or self.ppworkers:
+            # target paths and archive keys of files whose download
+            # or postprocessing has not been completed yet
+            self.inflight = {}
+
+    def _open_archive(self):
+        archive = self.extractor.config("archive")
+        if archive:
+            path = util.expand_path(archive)
+            return util.DownloadArchive(path, self.extractor)
+        return None
+
+
+class MissingField():
+    """Default value that makes formatting a missing field fail"""
+    __slots__ = ()
+
+    def __format__(self, _):
+        raise KeyError()
+
+    def __str__(self):
+        raise KeyError()
+
+    __repr__ = __str__
+
+
+_MISSING = MissingField()
+
+
+class WorkerPool():
+    """Run tasks in a pool of worker threads
+
+    Results get passed to 'complete' in the thread calling submit(),
+    wait(), and join(), and in the same order their tasks were submitted.
+    Exceptions raised by a task get logged and passed to 'error' instead.
+    """
+
+    def __init__(self, num, complete, log, error=None):
+        self.num = num
+        self.complete = complete
+        self.error = error
+        self.log = log
+        self.local = threading.local()
+        self.pending = collections.deque()
+        self.queue = None
+        self.threads = []
+
+    def submit(self, func, args, *data):
+        """Schedule 'func(*args)' and complete it together with 'data'"""
+        if not self.threads:
+            self._start()
+
+        # complete finished tasks and limit the number of pending ones
+        pending = self.pending
+        while pending and (
+                pending[0][0].done() or len(pending) >= self.num * 2):
+            self._complete(*pending.popleft())
+
+        # run the task with the log context of the submitting thread
+        future = Future()
+        self.queue.put((future, func, args, output.get_context()))
+        pending.append((future, data))
+
+    def wait(self):
+        """Wait for all pending tasks and complete them"""
+        while self.pending:
+            self._complete(*self.pending.popleft())
+
+    def join(self):
+        """Wait for all pending tasks, complete them, and stop all threads"""
+        while self.pending:
+            future, data = self.pending.popleft()
+            try:
+                self._complete(future, data)
+            except Exception as exc:
+                self._error(data, exc)
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads.clear()
+
+    def _start(self):
+        self.queue = queue.Queue()
+        for _ in range(self.num):
+            # daemon threads, to not block the interpreter from exiting
+            # on KeyboardInterrupt or sys.exit()
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def _work(self):
+        while True:
+            task = self.queue.get()
+            if task is None:
+                return
+            future, func, args, context = task
+            output.set_context(*context)
+            try:
+                future.set_result(func(*args))
+            except BaseException as exc:
+                future.set_exception(exc)
+
+    def _complete(self, future, data):
+        try:
+            result = future.result()
+        except Exception as exc:
+            self._error(data, exc)
+        else:
+            self.complete(*data, result)
+
+    def _error(self, data, exc):
+        self.log.error("%s: %s", exc.__class__.__name__, exc)
+        self.log.debug("", exc_info=True)
+        if self.error:
+            self.error(*data)
+
 
 class SimulationJob(DownloadJob):
     """Simulate the extraction process without downloading anything"""
+    resumable = False
 
     def handle_url(self, url, keywords, fallback=None):
         self.pathfmt.set_keywords(keywords)
@@ -453,7 +843,7 @@ class UrlJob(Job):
 
     def handle_queue(self, url, _):
         try:
-            UrlJob(url, self, self.depth + 1).run()
+            self.status |= UrlJob(url, self, self.depth + 1).run()
         except exception.NoExtractorError:
             self._write_unsupported(url)
 
@@ -469,6 +859,7 @@ class DataJob(Job):
 
     def run(self):
         # collect data
+        context = output.set_context(self.extractor, self)
         try:
             for msg in self.extractor:
                 self.dispatch(msg)
@@ -476,8 +867,11 @@ class DataJob(Job):
             pass
         except Exception as exc:
             self.data.append((exc.__class__.__name__, str(exc)))
+            self.status |= 1
         except BaseException:
             pass
+        finally:
+            output.set_context(*context)
 
         # convert numbers to string
         if config.get(("output", "num-to-str"), False):
@@ -486,6 +880,7 @@ class DataJob(Job):
 
         # dump to 'file'
         util.dump_json(self.data, self.file, self.ascii, 2)
+        return self.status
 
     def handle_url(self, url, kwdict):
         self.data.append((Message.Url, url, self._filter(kwdict)))
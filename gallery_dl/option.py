@@ -92,6 +92,12 @@ def build_parser():
         dest="inputfile", metavar="FILE",
         help="Download URLs found in FILE ('-' for stdin)",
     )
+    general.add_argument(
+        "--processes",
+        dest="processes", metavar="N", type=int,
+        help=("Process URLs from the command line and from input files "
+              "with N parallel processes"),
+    )
     general.add_argument(
         "--cookies",
         dest="cookies", metavar="FILE", action=ConfigAction,
@@ -107,6 +113,11 @@ def build_parser():
         dest="clear_cache", action="store_true",
         help="Delete all cached login sessions, cookies, etc.",
     )
+    general.add_argument(
+        "--cache-stats",
+        dest="cache_stats", action="store_true",
+        help="Print statistics about the cache database and exit",
+    )
 
     output = parser.add_argument_group("Output Options")
     output.add_argument(
@@ -171,6 +182,11 @@ def build_parser():
         dest="rate", metavar="RATE", action=ConfigAction,
         help="Maximum download rate (e.g. 500k or 2.5M)",
     )
+    downloader.add_argument(
+        "--workers",
+        dest="workers", metavar="N", type=int, action=ConfigAction,
+        help="Number of files to download in parallel (default: 1)",
+    )
     downloader.add_argument(
         "-R", "--retries",
         dest="retries", metavar="N", type=int, action=ConfigAction,
@@ -268,6 +284,33 @@ def build_parser():
         help=("Record all downloaded files in the archive file and "
               "skip downloading any file already in it."),
     )
+    selection.add_argument(
+        "--archive-stats",
+        dest="archive_stats", action="store_true",
+        help="Print statistics about the download archive and exit",
+    )
+    selection.add_argument(
+        "--archive-vacuum",
+        dest="archive_vacuum", action="store_true",
+        help="Rebuild the download archive to reclaim unused space",
+    )
+    selection.add_argument(
+        "--archive-merge",
+        dest="archive_merge", metavar="FILE", action="append",
+        help="Add all entries of archive FILE to the download archive",
+    )
+    selection.add_argument(
+        "--archive-export",
+        dest="archive_export", metavar="FILE",
+        help=("Write all entries of the download archive "
+              "to FILE ('-' for stdout)"),
+    )
+    selection.add_argument(
+        "--resume",
+        dest="resume", nargs=0, action=ConfigConstAction, const=True,
+        help=("Continue interrupted extractor runs from "
+              "the last page they reached"),
+    )
     selection.add_argument(
         "--range",
         dest="image-range", metavar="RANGE", action=ConfigAction,
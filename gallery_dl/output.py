@@ -10,6 +10,7 @@ import os
 import sys
 import shutil
 import logging
+import threading
 from . import config, util
 
 
@@ -23,18 +24,38 @@ LOG_LEVEL = logging.INFO
 
 class Logger(logging.Logger):
     """Custom logger that includes extractor and job info in log records"""
-    extractor = util.NONE
-    job = util.NONE
 
     def makeRecord(self, name, level, fn, lno, msg, args, exc_info,
                    func=None, extra=None, sinfo=None,
                    factory=logging._logRecordFactory):
         rv = factory(name, level, fn, lno, msg, args, exc_info, func, sinfo)
-        rv.extractor = self.extractor
-        rv.job = self.job
+        rv.extractor = getattr(_context, "extractor", util.NONE)
+        rv.job = getattr(_context, "job", util.NONE)
         return rv
 
 
+def get_context():
+    """Return the (extractor, job) pair of the current thread"""
+    return (getattr(_context, "extractor", util.NONE),
+            getattr(_context, "job", util.NONE))
+
+
+def set_context(extractor, job):
+    """Set the extractor and job for log records of the current thread
+
+    Returns the previous (extractor, job) pair.
+    """
+    previous = get_context()
+    _context.extractor = extractor
+    _context.job = job
+    return previous
+
+
+# jobs and their downloads can run in parallel threads;
+# keep track of the extractor and job each thread is working for
+_context = threading.local()
+
+
 class Formatter(logging.Formatter):
     """Custom formatter that supports different formats per loglevel"""
 
@@ -81,7 +102,7 @@ def initialize_logging(loglevel):
     return logging.getLogger("gallery-dl")
 
 
-def setup_logging_handler(key, fmt=LOG_FORMAT, lvl=LOG_LEVEL):
+def setup_logging_handler(key, fmt=LOG_FORMAT, lvl=LOG_LEVEL, mode=None):
     """Setup a new logging handler"""
     opts = config.interpolate(("output", key))
     if not opts:
@@ -90,7 +111,7 @@ def setup_logging_handler(key, fmt=LOG_FORMAT, lvl=LOG_LEVEL):
         opts = {"path": opts}
 
     path = opts.get("path")
-    mode = opts.get("mode", "w")
+    mode = mode or opts.get("mode", "w")
     encoding = opts.get("encoding", "utf-8")
     try:
         path = util.expand_path(path)
@@ -9,6 +9,7 @@
 """Store files in ZIP archives"""
 
 from .common import PostProcessor
+import threading
 import zipfile
 import os
 
@@ -34,6 +35,7 @@ class ZipPP(PostProcessor):
             algorithm = "store"
 
         self.path = pathfmt.realdirectory
+        self.lock = threading.RLock()
         args = (self.path + ext, "a",
                 self.COMPRESSION_ALGORITHMS[algorithm], True)
 
@@ -51,12 +53,13 @@ class ZipPP(PostProcessor):
         # faster than calling getinfo()
         if zfile is None:
             zfile = self.zfile
-        if pathfmt.filename not in zfile.NameToInfo:
-            zfile.write(pathfmt.temppath, pathfmt.filename)
-            pathfmt.delete = self.delete
+        with self.lock:
+            if pathfmt.filename not in zfile.NameToInfo:
+                zfile.write(pathfmt.temppath, pathfmt.filename)
+                pathfmt.delete = self.delete
 
     def _write_safe(self, pathfmt):
-        with zipfile.ZipFile(*self.args) as zfile:
+        with self.lock, zipfile.ZipFile(*self.args) as zfile:
             self._write(pathfmt, zfile)
 
     def finalize(self):
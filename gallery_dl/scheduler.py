@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Mike Fährmann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+
+"""Coordinate HTTP requests and bandwidth usage across all threads"""
+
+import os
+import json
+import time
+import threading
+import contextlib
+import collections
+import urllib.parse
+from . import config, text, util
+
+try:
+    import fcntl
+except ImportError:
+    import msvcrt
+    fcntl = None
+
+
+class Scheduler():
+    """Limit the number of concurrent requests and their rate per host
+
+    If there is a limit for the total number of concurrent requests,
+    free slots are handed to the least busy host first and to waiting hosts
+    in turn, so that hosts with lots of queued requests cannot starve
+    hosts with only a few of them.
+    """
+
+    def __init__(self, total=0, concurrency=0, interval=0.0, hosts=None,
+                 rate=None, rate_file=None):
+        self.total = total
+        self.default = (concurrency or 0, interval or 0.0)
+        self.hosts = hosts or {}
+        self.rate = text.parse_bytes(rate)
+        self.rate_file = rate_file
+        self.cond = threading.Condition()
+        self.active = collections.Counter()
+        self.waiting = collections.OrderedDict()
+        self.count = 0
+        self.next = {}
+        self._limits = {}
+        self._domains = {}
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+
+    def slot(self, url, blocking=True):
+        """Return a context manager occupying a request slot for 'url'
+
+        If 'blocking' is False, return None instead of waiting
+        when no slot is available right now.
+        """
+        host = urllib.parse.urlsplit(url).hostname or ""
+        if not self.total and self.limits(host) == (0, 0.0):
+            return _NULLSLOT
+        if blocking:
+            return self._slot(host)
+        if self.acquire(host, False):
+            return self._acquired(host)
+        return None
+
+    @contextlib.contextmanager
+    def _slot(self, host):
+        self.acquire(host)
+        try:
+            yield
+        finally:
+            self.release(host)
+
+    @contextlib.contextmanager
+    def _acquired(self, host):
+        try:
+            yield
+        finally:
+            self.release(host)
+
+    def acquire(self, host, blocking=True):
+        """Wait until a request to 'host' is allowed to start
+
+        Returns False without waiting if 'blocking' is False
+        and the request cannot start right away.
+        """
+        interval = self.limits(host)[1]
+        ticket = object()
+
+        with self.cond:
+            waiting = self.waiting.get(host)
+            if waiting is None:
+                waiting = self.waiting[host] = collections.deque()
+            waiting.append(ticket)
+
+            while not self._ready(host, ticket):
+                if not blocking:
+                    waiting.pop()
+                    if not waiting:
+                        del self.waiting[host]
+                    return False
+                self.cond.wait()
+
+            waiting.popleft()
+            if waiting:
+                self.waiting.move_to_end(host)
+            else:
+                del self.waiting[host]
+            self.active[host] += 1
+            self.count += 1
+
+            now = time.time()
+            start = max(now, self.next.get(host, 0.0))
+            self.next[host] = start + interval
+            self.cond.notify_all()
+
+        if start > now:
+            time.sleep(start - now)
+        return True
+
+    def release(self, host):
+        """Mark a request to 'host' as finished"""
+        with self.cond:
+            self.count -= 1
+            self.active[host] -= 1
+            if not self.active[host]:
+                del self.active[host]
+            self.cond.notify_all()
+
+    def throttle(self, url):
+        """Return a Throttle object for a transfer from 'url' or None"""
+        host = urllib.parse.urlsplit(url).hostname or ""
+        domain = self.domain(host)
+        rate = text.parse_bytes(self.hosts[domain].get("rate")) \
+            if domain else 0
+
+        buckets = []
+        if self.rate:
+            buckets.append(self._bucket("", self.rate))
+        if rate:
+            buckets.append(self._bucket(domain, rate))
+        return Throttle(buckets) if buckets else None
+
+    def limits(self, host):
+        """Return (concurrency, interval) limits for 'host'"""
+        try:
+            return self._limits[host]
+        except KeyError:
+            pass
+
+        limits = self.default
+        domain = self.domain(host)
+        if domain:
+            opts = self.hosts[domain]
+            limits = (
+                opts.get("concurrency", self.default[0]) or 0,
+                opts.get("interval", self.default[1]) or 0.0,
+            )
+
+        self._limits[host] = limits
+        return limits
+
+    def domain(self, host):
+        """Return the entry in 'hosts' that applies to 'host'"""
+        try:
+            return self._domains[host]
+        except KeyError:
+            pass
+
+        # check 'host' and all its parent domains
+        # ("i.example.org", "example.org", "org")
+        domain = host
+        while domain and domain not in self.hosts:
+            domain = domain.partition(".")[2]
+
+        self._domains[host] = domain
+        return domain
+
+    def _bucket(self, key, rate):
+        with self._buckets_lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if self.rate_file:
+                    bucket = SharedTokenBucket(rate, self.rate_file, key)
+                else:
+                    bucket = TokenBucket(rate)
+                self._buckets[key] = bucket
+            return bucket
+
+    def _ready(self, host, ticket):
+        if self.waiting[host][0] is not ticket:
+            return False
+        if self.total and self.count >= self.total:
+            return False
+
+        limit = self.limits(host)[0]
+        if limit and self.active[host] >= limit:
+            return False
+        if not self.total:
+            return True
+
+        # select the least busy host that is able to start a request;
+        # 'self.waiting' is in round-robin order
+        best = None
+        best_active = 0
+        for other in self.waiting:
+            active = self.active[other]
+            limit = self.limits(other)[0]
+            if limit and active >= limit:
+                continue
+            if best is None or active < best_active:
+                best, best_active = other, active
+        return best == host
+
+
+class TokenBucket():
+    """Token bucket shared by all threads of this process
+
+    Tokens are bytes and get refilled at 'rate' per second, up to a
+    maximum of one second worth of data. Transfers take tokens after
+    receiving data and wait for any deficit, which makes them share the
+    available bandwidth in the order they asked for it.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.last = time.time()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount):
+        """Take 'amount' tokens and return the time to wait for them"""
+        with self.lock:
+            now = time.time()
+            self.tokens = self._take(self.tokens, self.last, now, amount)
+            self.last = now
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def _take(self, tokens, last, now, amount):
+        tokens += (now - last) * self.rate
+        if tokens > self.rate:
+            tokens = self.rate
+        return tokens - amount
+
+
+class SharedTokenBucket(TokenBucket):
+    """Token bucket stored in a file and shared with other processes"""
+
+    def __init__(self, rate, path, key):
+        TokenBucket.__init__(self, rate)
+        self.path = path
+        self.key = key
+
+    def reserve(self, amount):
+        """Take 'amount' tokens and return the time to wait for them"""
+        with self.lock, _open_locked(self.path) as file:
+            try:
+                state = json.loads(file.read() or "{}")
+                tokens, last = state.get(self.key) or (self.rate, 0.0)
+            except (ValueError, TypeError):
+                state = {}
+                tokens, last = self.rate, 0.0
+
+            now = time.time()
+            tokens = self._take(tokens, min(last, now), now, amount)
+            state[self.key] = (tokens, now)
+
+            file.seek(0)
+            file.truncate()
+            json.dump(state, file)
+            return -tokens / self.rate if tokens < 0 else 0.0
+
+
+class Throttle():
+    """Limit the bandwidth of a single transfer"""
+    __slots__ = ("buckets", "chunk_size")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # read at most 1/10 second worth of data at once
+        self.chunk_size = max(
+            16384, min(bucket.rate for bucket in buckets) // 10)
+
+    def __call__(self, amount):
+        """Wait until 'amount' bytes may be received"""
+        wait = max(bucket.reserve(amount) for bucket in self.buckets)
+        if wait:
+            time.sleep(wait)
+
+
+@contextlib.contextmanager
+def _open_locked(path):
+    """Open 'path' for reading and writing with an exclusive lock"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    with os.fdopen(fd, "r+") as file:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        try:
+            yield file
+        finally:
+            file.flush()
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def slot(url, blocking=True):
+    """Return a context manager occupying a request slot for 'url'"""
+    return (_scheduler or _init()).slot(url, blocking)
+
+
+def throttle(url):
+    """Return a Throttle object for a transfer from 'url' or None"""
+    return (_scheduler or _init()).throttle(url)
+
+
+def _init():
+    global _scheduler
+    opts = config.get(("scheduler",)) or {}
+    rate_file = opts.get("rate-file")
+    _scheduler = Scheduler(
+        opts.get("total", 0),
+        opts.get("concurrency", 0),
+        opts.get("interval", 0.0),
+        opts.get("hosts"),
+        opts.get("rate"),
+        util.expand_path(rate_file) if rate_file else None,
+    )
+    return _scheduler
+
+
+class _NullSlot():
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_NULLSLOT = _NullSlot()
+_scheduler = None
@@ -11,18 +11,23 @@
 import re
 import os
 import sys
+import copy
 import json
+import math
+import bisect
 import time
 import shutil
 import string
 import _string
 import sqlite3
+import hashlib
 import datetime
 import operator
 import itertools
+import threading
 import urllib.parse
 from email.utils import mktime_tz, parsedate_tz
-from . import text, exception
+from . import text, exception, archive
 
 
 def bencode(num, alphabet="0123456789"):
@@ -210,6 +215,7 @@ class RangePredicate():
             self.lower, self.upper = self.ranges[0][0], self.ranges[-1][1]
         else:
             self.lower, self.upper = 0, 0
+        self.lowers = [lower for lower, _ in self.ranges]
 
     def __call__(self, url, kwds):
         self.index += 1
@@ -217,10 +223,14 @@ class RangePredicate():
         if self.index > self.upper:
             raise exception.StopExtraction()
 
-        for lower, upper in self.ranges:
-            if lower <= self.index <= upper:
-                return True
-        return False
+        # 'ranges' is sorted and free of overlaps
+        pos = bisect.bisect_right(self.lowers, self.index) - 1
+        return pos >= 0 and self.index <= self.ranges[pos][1]
+
+    @property
+    def exhausted(self):
+        """True if no further index can be in range"""
+        return self.index >= self.upper
 
     @staticmethod
     def parse_range(rangespec):
@@ -397,9 +407,10 @@ class Formatter():
 
     def format_map(self, kwargs):
         """Apply 'kwargs' to the initial format_string and return its result"""
+        result = self.result.copy()
         for index, func in self.fields:
-            self.result[index] = func(kwargs)
-        return "".join(self.result)
+            result[index] = func(kwargs)
+        return "".join(result)
 
     def _field_access(self, field_name, format_spec, conversion):
         first, rest = _string.formatter_field_name_split(field_name)
@@ -509,6 +520,126 @@ class Formatter():
         return wrap
 
 
+class CompiledFormatter(Formatter):
+    """Formatter that turns a format string into a generated function
+
+    Supports the same conversions and format specifiers as Formatter
+    and produces identical results, but applies all replacement fields
+    with a single function call instead of one closure per field.
+    Generated code is cached per format string.
+    """
+    cache = {}
+
+    def __init__(self, format_string, default=None):
+        self.default = default
+        try:
+            code, namespace = self.cache[format_string]
+        except KeyError:
+            code, namespace = self.cache[format_string] = \
+                self._compile(format_string)
+
+        namespace = namespace.copy()
+        namespace["default"] = default
+        exec(code, namespace)
+        self.format_map = namespace["format_map"]
+
+    def _compile(self, format_string):
+        """Return a code object and namespace for 'format_string'"""
+        namespace = {}
+        lines = ["def format_map(kwdict):"]
+        parts = []
+
+        for literal_text, field_name, format_spec, conversion in \
+                _string.formatter_parser(format_string):
+            if literal_text:
+                parts.append(repr(literal_text))
+            if field_name:
+                var = "v" + str(len(parts))
+                lines.extend(self._compile_field(
+                    var, field_name, conversion, namespace))
+                parts.append(self._compile_format(
+                    var, format_spec, lines))
+
+        if not parts:
+            lines.append("    return ''")
+        elif len(parts) == 1:
+            lines.append("    return " + parts[0])
+        else:
+            lines.append("    return ''.join((" + ", ".join(parts) + "))")
+
+        source = "\n".join(lines)
+        return compile(source, "<format {!r}>".format(format_string),
+                       "exec"), namespace
+
+    def _compile_field(self, var, field_name, conversion, namespace):
+        """Generate code that assigns a field's value to 'var'"""
+        first, rest = _string.formatter_field_name_split(field_name)
+        key = repr(first)
+
+        expr = "kwdict[" + key + "]"
+        for is_attr, name in rest:
+            if is_attr:
+                expr = "getattr({}, {!r})".format(expr, name)
+            elif ":" in name:
+                start, _, stop = name.partition(":")
+                stop, _, step = stop.partition(":")
+                expr = "{}[{}:{}:{}]".format(
+                    expr,
+                    int(start) if start else "",
+                    int(stop) if stop else "",
+                    int(step) if step else "",
+                )
+            else:
+                expr = "{}[{!r}]".format(expr, name)
+
+        if conversion:
+            func = self.CONVERSIONS[conversion]
+            fname = "conv_" + str(ord(conversion))
+            namespace[fname] = func
+            expr = "{}({})".format(fname, expr)
+
+        if not rest and not conversion:
+            return ("    {} = kwdict[{}] if {} in kwdict else default".format(
+                var, key, key),)
+        return (
+            "    try:",
+            "        {} = {}".format(var, expr),
+            "    except Exception:",
+            "        {} = default".format(var),
+        )
+
+    def _compile_format(self, var, format_spec, lines):
+        """Return an expression that formats 'var' according to its spec"""
+        if not format_spec:
+            return "str({})".format(var)
+
+        spec = format_spec[0]
+        if spec == "?":
+            before, after, format_spec = format_spec.split("/", 2)
+            return "({!r} + format({}, {!r}) + {!r}) if {} else ''".format(
+                before[1:], var, format_spec, after, var)
+
+        if spec == "L":
+            maxlen, replacement, format_spec = format_spec.split("/", 2)
+            maxlen = text.parse_int(maxlen[1:])
+            lines.append("    {0} = format({0}, {1!r})".format(
+                var, format_spec))
+            return "{0} if len({0}) <= {1!r} else {2!r}".format(
+                var, maxlen, replacement)
+
+        if spec == "J":
+            separator, _, format_spec = format_spec.partition("/")
+            return "format({!r}.join({}), {!r})".format(
+                separator[1:], var, format_spec)
+
+        if spec == "R":
+            old, new, format_spec = format_spec.split("/", 2)
+            return "format({}.replace({!r}, {!r}), {!r})".format(
+                var, old[1:], new, format_spec)
+
+        return "format({}, {!r})".format(var, format_spec)
+
+
 class PathFormat():
 
     def __init__(self, extractor):
@@ -517,12 +648,25 @@ class PathFormat():
         self.directory_fmt = extractor.config(
             "directory", extractor.directory_fmt)
         self.kwdefault = extractor.config("keywords-default")
+        formatter = CompiledFormatter if extractor.config(
+            "compile-formats", False) else Formatter
 
         try:
-            self.formatter = Formatter(self.filename_fmt, self.kwdefault)
+            self.formatter = formatter(self.filename_fmt, self.kwdefault)
         except Exception as exc:
             raise exception.FormatError(exc, "filename")
 
+        try:
+            self.directory_formatters = [
+                formatter(dirfmt, self.kwdefault).format_map
+                for dirfmt in self.directory_fmt
+            ]
+        except Exception as exc:
+            raise exception.FormatError(exc, "directory")
+
+        self.directories = set()
+        self.listing = {}
+        self.enum = {}
         self.delete = False
         self.has_extension = False
         self.keywords = {}
@@ -557,30 +701,78 @@ class PathFormat():
                 return sub("_", x)
         return func
 
-    def open(self, mode="wb"):
+    def copy(self):
+        """Return a copy of this object to process a single file with"""
+        pathfmt = copy.copy(self)
+        # rebind methods that have been assigned as instance attributes
+        for name, value in self.__dict__.items():
+            if getattr(value, "__self__", None) is self:
+                setattr(pathfmt, name, getattr(pathfmt, value.__name__))
+        return pathfmt
+
+    def open(self, mode="wb", buffering=-1):
         """Open file and return a corresponding file object"""
-        return open(self.temppath, mode)
+        return open(self.temppath, mode, buffering)
 
     def exists(self, archive=None):
         """Return True if the file exists on disk or in 'archive'"""
         if archive and archive.check(self.keywords):
             return self.fix_extension()
-        if self.has_extension and os.path.exists(self.realpath):
+        if self.has_extension and self._exists(self.realpath):
             return self.check_file()
         return False
 
+    def _exists(self, path):
+        """Check for existing files with an index of their directory
+
+        Positive results come from the index alone; negative results are
+        confirmed with os.path.exists() to account for files created by
+        other processes and for case-insensitive file systems.
+        """
+        directory, _, name = path.rpartition(os.sep)
+        names = self._listdir(directory)
+        if name in names:
+            return True
+        if os.path.exists(path):
+            names.add(name)
+            return True
+        return False
+
+    def _listdir(self, directory):
+        """Return the set of filenames in 'directory'"""
+        try:
+            return self.listing[directory]
+        except KeyError:
+            pass
+        try:
+            with os.scandir(directory) as entries:
+                names = {entry.name for entry in entries}
+        except OSError:
+            names = set()
+        self.listing[directory] = names
+        return names
+
+    def _forget(self, path):
+        """Remove a deleted file from the index of its directory"""
+        directory, _, name = path.rpartition(os.sep)
+        names = self.listing.get(directory)
+        if names is not None:
+            names.discard(name)
+
     @staticmethod
     def check_file():
         return True
 
     def _enum_file(self):
-        num = 1
+        realpath = self.realpath
+        num = self.enum.get(realpath, 1)
         while True:
             suffix = "." + str(num)
-            rpath = self.realpath + suffix
-            if not os.path.exists(rpath):
+            rpath = realpath + suffix
+            if not self._exists(rpath):
+                self.enum[realpath] = num
                 self.path += suffix
-                self.realpath = rpath
+                self.realpath = self.temppath = rpath
                 self.suffix = suffix
                 return False
             num += 1
@@ -589,10 +781,8 @@ class PathFormat():
         """Build directory path and create it if necessary"""
         try:
             segments = [
-                self.clean_path(
-                    Formatter(segment, self.kwdefault)
-                    .format_map(keywords).strip())
-                for segment in self.directory_fmt
+                self.clean_path(format_map(keywords).strip())
+                for format_map in self.directory_formatters
             ]
         except Exception as exc:
             raise exception.FormatError(exc, "directory")
@@ -607,8 +797,15 @@ class PathFormat():
         if self.directory[-1] == os.sep:
             self.directory = self.directory[:-1]
 
-        self.realdirectory = self.adjust_path(self.directory)
-        os.makedirs(self.realdirectory, exist_ok=True)
+        realdirectory = self.adjust_path(self.directory)
+        if realdirectory != self.realdirectory:
+            # only index the files of the current directory
+            self.listing.clear()
+            self.enum.clear()
+            self.realdirectory = realdirectory
+        if self.realdirectory not in self.directories:
+            os.makedirs(self.realdirectory, exist_ok=True)
+            self.directories.add(self.realdirectory)
 
     def set_keywords(self, keywords):
         """Set filename keywords"""
@@ -671,6 +868,7 @@ class PathFormat():
         if self.delete:
             self.delete = False
             os.unlink(self.temppath)
+            self._forget(self.temppath)
             return
 
         if self.temppath != self.realpath:
@@ -681,6 +879,12 @@ class PathFormat():
                 shutil.copyfile(self.temppath, self.realpath)
                 os.unlink(self.temppath)
 
+        # update directory index
+        directory, _, name = self.realpath.rpartition(os.sep)
+        names = self.listing.get(directory)
+        if names is not None:
+            names.add(name)
+
         if "_mtime" in self.keywords:
             # set file modification time
             mtime = self.keywords["_mtime"]
@@ -692,33 +896,317 @@ class PathFormat():
                 except Exception:
                     pass
 
+    def deduplicate(self, path, mode="hardlink"):
+        """Replace the downloaded file with a link to its duplicate 'path'
+
+        Returns True on success, False if the file got kept as is.
+        """
+        if mode == "skip":
+            os.unlink(self.realpath)
+            self._forget(self.realpath)
+            return True
+
+        temppath = self.realpath + ".dedup"
+        try:
+            if mode == "reflink":
+                reflink(path, temppath)
+            else:
+                os.link(path, temppath)
+            os.replace(temppath, self.realpath)
+        except OSError:
+            try:
+                os.unlink(temppath)
+            except OSError:
+                pass
+            return False
+        return True
+
     @staticmethod
     def adjust_path(path):
         """Enable longer-than-260-character paths on windows"""
         return "\\\\?\\" + os.path.abspath(path) if os.name == "nt" else path
 
 
+def reflink(src, dst):
+    """Create 'dst' as a copy-on-write clone of 'src'"""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("reflinks are not supported on this platform")
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), 0x40049409, fsrc.fileno())  # FICLONE
+        except OSError:
+            fdst.close()
+            os.unlink(dst)
+            raise
+
+
 class DownloadArchive():
+    """Store IDs of downloaded files in an SQLite3 database
+
+    New entries are collected in memory and get written in a single
+    transaction once 'archive-batch' of them are pending, after
+    'archive-batch-interval' seconds, or when the archive gets closed.
+    A process killed before that loses its pending entries, which only
+    means the corresponding files are not skipped by their ID next time.
+
+    With 'archive-preload', all entries of the current category get loaded
+    into a set, or a BloomFilter if a set would exceed the given memory
+    limit, which then answers most checks without accessing the database.
+
+    Archives in hashed format ('archive-hash') store 16-byte digests
+    instead of full entries, optionally together with the entry itself.
+
+    With 'archive-galleries', the archive also records completely
+    downloaded galleries and chapters together with a signature
+    of their content, usually their number of files.
+    """
+    _preloaded = {}
+    _preloaded_lock = threading.Lock()
 
     def __init__(self, path, extractor):
-        con = sqlite3.connect(path)
-        con.isolation_level = None
+        con, self.hashed = archive.connect(
+            path,
+            extractor.config("archive-synchronous", "normal"),
+            extractor.config("archive-hash", False),
+            extractor.config("archive-hash-keys", False),
+            extractor.log,
+        )
+        self.connection = con
         self.cursor = con.cursor()
-        self.cursor.execute("CREATE TABLE IF NOT EXISTS archive "
-                            "(entry PRIMARY KEY) WITHOUT ROWID")
         self.keygen = (extractor.category + extractor.config(
             "archive-format", extractor.archive_fmt)
         ).format_map
 
+        if self.hashed:
+            self.hash_keys = extractor.config("archive-hash-keys", False)
+            self._select = "SELECT 1 FROM archive_hash WHERE digest=? LIMIT 1"
+            self._insert = "INSERT OR IGNORE INTO archive_hash VALUES (?, ?)"
+        else:
+            self._select = "SELECT 1 FROM archive WHERE entry=? LIMIT 1"
+            self._insert = "INSERT OR IGNORE INTO archive VALUES (?)"
+
+        self.batch = extractor.config("archive-batch", 100) or 1
+        self.interval = extractor.config("archive-batch-interval", 5.0)
+        self.pending = {}
+        self.deadline = 0.0
+
+        if extractor.config("archive-galleries", False):
+            self.cursor.execute("CREATE TABLE IF NOT EXISTS gallery "
+                                "(entry PRIMARY KEY, signature) WITHOUT ROWID")
+
+        self.keys = self.bloom = None
+        preload = extractor.config("archive-preload", False)
+        if preload:
+            limit = text.parse_bytes(
+                "64M" if preload is True else str(preload), 1)
+            self.keys, self.bloom = self._preload(
+                path, extractor.category, limit, extractor.log)
+
     def check(self, kwdict):
         """Return True if item described by 'kwdict' exists in archive"""
         key = self.keygen(kwdict)
-        self.cursor.execute(
-            "SELECT 1 FROM archive WHERE entry=? LIMIT 1", (key,))
+        if self.hashed:
+            key = archive.digest(key)
+        if key in self.pending:
+            return True
+        if self.keys is not None:
+            return key in self.keys
+        if self.bloom is not None and key not in self.bloom:
+            return False
+        self.cursor.execute(self._select, (key,))
         return self.cursor.fetchone()
 
     def add(self, kwdict):
         """Add item described by 'kwdict' to archive"""
         key = self.keygen(kwdict)
+        if self.hashed:
+            row = (archive.digest(key), key if self.hash_keys else None)
+            key = row[0]
+        else:
+            row = (key,)
+
+        if self.keys is not None:
+            self.keys.add(key)
+        elif self.bloom is not None:
+            self.bloom.add(key)
+
+        if self.batch <= 1:
+            self.cursor.execute(self._insert, row)
+            return
+
+        if not self.pending:
+            self.deadline = time.time() + self.interval
+        self.pending[key] = row
+        if len(self.pending) >= self.batch or time.time() >= self.deadline:
+            self.commit()
+
+    def check_gallery(self, key, signature=None):
+        """Return True if gallery 'key' has been completely downloaded
+
+        If 'signature' is given, it has to match the stored signature.
+        """
+        self.cursor.execute(
+            "SELECT signature FROM gallery WHERE entry=? LIMIT 1", (key,))
+        row = self.cursor.fetchone()
+        return row is not None and (signature is None or row[0] == signature)
+
+    def add_gallery(self, key, signature):
+        """Record gallery 'key' as completely downloaded"""
+        self.cursor.execute(
+            "INSERT OR REPLACE INTO gallery VALUES (?, ?)", (key, signature))
+
+    def commit(self):
+        """Write all pending entries to the archive file"""
+        if not self.pending:
+            return
+        with self.connection:
+            # acquire the write lock right away instead of when
+            # upgrading from a read lock, which would fail immediately
+            # if another process is writing at the same time
+            self.cursor.execute("BEGIN IMMEDIATE")
+            self.cursor.executemany(self._insert, list(self.pending.values()))
+        self.pending.clear()
+
+    def close(self):
+        """Write all pending entries and close the archive file"""
+        try:
+            self.commit()
+        finally:
+            self.connection.close()
+
+    def _preload(self, path, prefix, limit, log):
+        """Load all entries starting with 'prefix' into memory"""
+        if self.hashed:
+            # digests do not reveal their category
+            prefix = None
+            query = "SELECT {} FROM archive_hash"
+            column, bounds = "digest", ()
+            empty = sys.getsizeof(b"")
+        else:
+            query = "SELECT {} FROM archive WHERE entry >= ? AND entry < ?"
+            column, bounds = "entry", archive.key_range(prefix)
+            empty = sys.getsizeof("")
+
+        key = (os.path.abspath(path), prefix)
+        with self._preloaded_lock:
+            # share preloaded entries with all other jobs
+            # using the same archive file and category
+            try:
+                return self._preloaded[key]
+            except KeyError:
+                pass
+
+            self.cursor.execute(query.format(
+                "COUNT(*), TOTAL(LENGTH(CAST({} AS BLOB)))".format(column)),
+                bounds)
+            count, length = self.cursor.fetchone()
+
+            # an object per entry and about 40 bytes in the set
+            # for its reference, hash value, and unused table slots
+            if count * (empty + 40) + length <= limit:
+                keys = set(row[0] for row in self.cursor.execute(
+                    query.format(column), bounds))
+                size = sys.getsizeof(keys) + sum(map(sys.getsizeof, keys))
+                result = (keys, None)
+                kind = "set"
+
+            elif BloomFilter.memory(count) <= limit:
+                bloom = BloomFilter(count)
+                bloom.update(row[0] for row in self.cursor.execute(
+                    query.format(column), bounds))
+                size = len(bloom.bits)
+                result = (None, bloom)
+                kind = "Bloom filter"
+
+            else:
+                log.debug("Not preloading %d archive entries: "
+                          "exceeds memory limit of %d bytes", count, limit)
+                result = (None, None)
+                self._preloaded[key] = result
+                return result
+
+            log.debug("Preloaded %d archive entries into a %s "
+                      "(%.1f MiB)", count, kind, size / 1048576)
+            self._preloaded[key] = result
+            return result
+
+
+class BloomFilter():
+    """Set of strings with false positives but without false negatives"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.size = self._bits(capacity, error_rate)
+        self.hashes = max(round(self.size / max(capacity, 1) * 0.693), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.lock = threading.Lock()
+
+    def __contains__(self, key):
+        h1, h2 = self._hash(key)
+        bits = self.bits
+        size = self.size
+        for _ in range(self.hashes):
+            pos = h1 % size
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+            h1 += h2
+        return True
+
+    def add(self, key):
+        """Add 'key' to this filter"""
+        self.update((key,))
+
+    def update(self, keys):
+        """Add all elements of 'keys' to this filter"""
+        bits = self.bits
+        size = self.size
+        hashes = range(self.hashes)
+        with self.lock:
+            for key in keys:
+                h1, h2 = self._hash(key)
+                for _ in hashes:
+                    pos = h1 % size
+                    bits[pos >> 3] |= 1 << (pos & 7)
+                    h1 += h2
+
+    @classmethod
+    def memory(cls, capacity, error_rate=0.01):
+        """Return the number of bytes needed for 'capacity' entries"""
+        return (cls._bits(capacity, error_rate) + 7) // 8
+
+    @staticmethod
+    def _bits(capacity, error_rate):
+        # m = -n * ln(p) / ln(2)**2
+        return max(int(-capacity * math.log(error_rate) / 0.4805), 64)
+
+    @staticmethod
+    def _hash(key):
+        if isinstance(key, str):
+            key = key.encode()
+        digest = hashlib.sha1(key).digest()
+        return (int.from_bytes(digest[:8], "little"),
+                int.from_bytes(digest[8:16], "little") | 1)
+
+
+class ContentIndex():
+    """Map content hashes to the location of already downloaded files"""
+
+    def __init__(self, path):
+        con = sqlite3.connect(path, timeout=60)
+        con.isolation_level = None
+        self.cursor = con.cursor()
+        self.cursor.execute("CREATE TABLE IF NOT EXISTS content "
+                            "(hash PRIMARY KEY, path) WITHOUT ROWID")
+
+    def get(self, digest):
+        """Return the path of a file with hash 'digest' or None"""
+        self.cursor.execute(
+            "SELECT path FROM content WHERE hash=? LIMIT 1", (digest,))
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def add(self, digest, path):
+        """Add file at 'path' with hash 'digest' to the index"""
         self.cursor.execute(
-            "INSERT OR IGNORE INTO archive VALUES (?)", (key,))
+            "INSERT OR REPLACE INTO content VALUES (?, ?)", (digest, path))
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Mike Fährmann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+
+"""Measure throughput and CPU usage of the HTTP downloader"""
+
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+import util  # noqa
+from gallery_dl import config, extractor, text
+from gallery_dl.downloader.http import HttpDownloader
+from gallery_dl.output import NullOutput
+from gallery_dl.util import PathFormat
+
+
+SERVER = """
+import sys
+import http.server
+
+DATA = bytes(range(256)) * 4096 * int(sys.argv[1])
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(DATA)))
+        self.send_header("Content-Type", "application/octet-stream")
+        self.end_headers()
+        self.wfile.write(DATA)
+
+    def log_message(self, *args):
+        pass
+
+
+server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+print(server.server_port, flush=True)
+server.serve_forever()
+"""
+
+
+class LegacyDownloader(HttpDownloader):
+    """HttpDownloader with the previous 'iter_content()' receive loop"""
+
+    def receive(self, response, file):
+        for data in response.iter_content(16384):
+            file.write(data)
+
+
+def benchmark(cls, url, chunk_size):
+    config.set(("downloader", "http", "chunk-size"), chunk_size)
+    extr = extractor.find("test:")
+    downloader = cls(extr, NullOutput())
+
+    pathfmt = PathFormat(extr)
+    pathfmt.set_directory({"category": "benchmark"})
+    pathfmt.set_keywords({"filename": "file", "extension": "bin"})
+
+    wall = time.time()
+    cpu = time.process_time()
+    if not downloader.download(url, pathfmt):
+        sys.exit("download failed")
+    return time.time() - wall, time.process_time() - cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-s", "--size", type=int, default=256, metavar="MB",
+        help="size of the downloaded file in MiB (default: 256)")
+    parser.add_argument(
+        "-r", "--runs", type=int, default=3, metavar="N",
+        help="number of runs per configuration (default: 3)")
+    parser.add_argument(
+        "chunk_sizes", nargs="*", metavar="CHUNK-SIZE",
+        default=["16k", "256k", "1M", "4M"],
+        help="chunk sizes to test (default: 16k 256k 1M 4M)")
+    args = parser.parse_args()
+
+    server = subprocess.Popen(
+        (sys.executable, "-c", SERVER, str(args.size)),
+        stdout=subprocess.PIPE, universal_newlines=True)
+    try:
+        url = "http://127.0.0.1:{}/file.bin".format(
+            server.stdout.readline().strip())
+
+        with tempfile.TemporaryDirectory() as directory:
+            config.set(("base-directory",), directory)
+            config.set(("downloader", "part"), False)
+            gib = args.size / 1024
+
+            print("{:<10} {:>10} {:>12} {:>12}".format(
+                "loop", "chunk-size", "MiB/s", "CPU-s/GiB"))
+            tests = [(LegacyDownloader, "16k")]
+            tests.extend((HttpDownloader, cs) for cs in args.chunk_sizes)
+
+            for cls, chunk_size in tests:
+                if not text.parse_bytes(chunk_size):
+                    sys.exit("invalid chunk size: " + chunk_size)
+                results = [
+                    benchmark(cls, url, chunk_size)
+                    for _ in range(args.runs)
+                ]
+                wall, cpu = min(results)
+                print("{:<10} {:>10} {:>12.1f} {:>12.2f}".format(
+                    "legacy" if cls is LegacyDownloader else "readinto",
+                    chunk_size, args.size / wall, cpu / gib))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Mike Fährmann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+
+import io
+import os.path
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from gallery_dl import archive, config, extractor, util
+
+
+class TestArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        config.clear()
+        self.dir.cleanup()
+
+    def _archive(self, name, entries):
+        path = os.path.join(self.dir.name, name)
+        con = sqlite3.connect(path)
+        con.execute("CREATE TABLE archive (entry PRIMARY KEY) WITHOUT ROWID")
+        con.executemany("INSERT INTO archive VALUES (?)",
+                        [(entry,) for entry in entries])
+        con.commit()
+        con.close()
+        return path
+
+    def _entries(self, path):
+        file = io.StringIO()
+        archive.export(path, file)
+        return sorted(file.getvalue().split())
+
+    def test_digest(self):
+        self.assertEqual(len(archive.digest("test123")), 16)
+        self.assertEqual(archive.digest("test123"), archive.digest("test123"))
+        self.assertNotEqual(archive.digest("test123"), archive.digest("test"))
+
+    def test_key_range(self):
+        self.assertEqual(archive.key_range("test"), ("test", "tesu"))
+
+    def test_migrate(self):
+        path = self._archive("plain.db", ("test1", "test2"))
+        con, hashed = archive.connect(path)
+        self.assertFalse(hashed)
+        con.close()
+
+        con, hashed = archive.connect(path, hashed=True, keys=True)
+        self.assertTrue(hashed)
+        self.assertEqual(
+            sorted(con.execute("SELECT digest, entry FROM archive_hash")),
+            sorted((archive.digest(e), e) for e in ("test1", "test2")))
+        con.close()
+
+        # hashed archives stay hashed
+        con, hashed = archive.connect(path)
+        self.assertTrue(hashed)
+        con.close()
+
+        # without original entries
+        path = self._archive("nokeys.db", ("test1",))
+        archive.connect(path, hashed=True)[0].close()
+        self.assertEqual(self._entries(path), [
+            archive.digest("test1").hex()])
+
+    def test_migrate_concurrent(self):
+        path = self._archive("plain.db", ("test1", "test2"))
+        con = sqlite3.connect(path, isolation_level=None)
+        archive.connect(path, hashed=True)[0].close()
+
+        # the archive got converted by another process in the meantime
+        self.assertEqual(archive.migrate(con), 0)
+        con.close()
+
+        tables = archive._tables
+        with patch.object(archive, "_tables") as mock:
+            mock.side_effect = lambda cursor: (
+                {"archive"} if mock.call_count == 1 else tables(cursor))
+            con, hashed = archive.connect(path, hashed=True)
+        self.assertTrue(hashed)
+        self.assertEqual(mock.call_count, 2)
+        con.close()
+        self.assertEqual(self._entries(path), sorted(
+            archive.digest(e).hex() for e in ("test1", "test2")))
+
+    def test_download_archive(self):
+        path = self._archive("archive.db", ("test1", "test2"))
+        extr = extractor.find("test:")
+        extr.archive_fmt = "{id}"
+        config.set(("extractor", "archive-hash"), True)
+        config.set(("extractor", "archive-batch"), 1)
+
+        darchive = util.DownloadArchive(path, extr)
+        self.assertTrue(darchive.hashed)
+        self.assertTrue(darchive.check({"id": 1}))
+        self.assertFalse(darchive.check({"id": 3}))
+        darchive.add({"id": 3})
+        self.assertTrue(darchive.check({"id": 3}))
+        darchive.close()
+
+        # preload digests
+        config.set(("extractor", "archive-preload"), True)
+        util.DownloadArchive._preloaded.clear()
+        darchive = util.DownloadArchive(path, extr)
+        self.assertEqual(len(darchive.keys), 3)
+        self.assertTrue(darchive.check({"id": 3}))
+        self.assertFalse(darchive.check({"id": 4}))
+        darchive.close()
+        util.DownloadArchive._preloaded.clear()
+
+    def test_stats(self):
+        path = self._archive("archive.db", (
+            "test1", "test2", "testfoo1", "other1"))
+        info = archive.stats(path, ("test", "testfoo", "missing"))
+        self.assertEqual(info["format"], "plain")
+        self.assertEqual(info["entries"], 4)
+        self.assertEqual(info["categories"], {"test": 2, "testfoo": 1})
+
+        archive.connect(path, hashed=True)[0].close()
+        info = archive.stats(path, ("test",))
+        self.assertEqual(info["format"], "hashed")
+        self.assertEqual(info["entries"], 4)
+        self.assertEqual(info["keys"], 0)
+        self.assertNotIn("categories", info)
+
+    def test_vacuum(self):
+        path = self._archive("archive.db", [
+            "test{:>100}".format(i) for i in range(1000)])
+        size = os.path.getsize(path)
+        archive.connect(path, hashed=True)[0].close()
+        self.assertLess(archive.vacuum(path), size)
+
+    def test_merge(self):
+        path = os.path.join(self.dir.name, "merged.db")
+        plain1 = self._archive("plain1.db", ("test1", "test2"))
+        plain2 = self._archive("plain2.db", ("test2", "test3"))
+
+        self.assertEqual(archive.merge(path, (plain1, plain2)), 3)
+        self.assertEqual(self._entries(path), ["test1", "test2", "test3"])
+        self.assertEqual(self._entries(plain2), ["test2", "test3"])
+
+        # merging a hashed archive converts the target
+        hashed = self._archive("hashed.db", ("test3", "test4"))
+        archive.connect(hashed, hashed=True, keys=True)[0].close()
+        self.assertEqual(archive.merge(path, (hashed,), keys=True), 1)
+        self.assertEqual(archive.stats(path)["format"], "hashed")
+        self.assertEqual(
+            self._entries(path), ["test1", "test2", "test3", "test4"])
+        self.assertEqual(self._entries(hashed), ["test3", "test4"])
+
+
+if __name__ == "__main__":
+    unittest.main()
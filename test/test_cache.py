@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Mike Fährmann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+
+import os.path
+import pickle
+import tempfile
+import threading
+import time
+import unittest
+
+from gallery_dl import cache, config
+
+
+class TestDatabaseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "cache.sqlite3")
+        self._db = cache.DatabaseCacheDecorator.db
+        cache.DatabaseCacheDecorator.db = cache._connect(self.path)
+        cache.DatabaseCacheDecorator._init = True
+        self.calls = []
+
+    def tearDown(self):
+        cache.DatabaseCacheDecorator.db.close()
+        cache.DatabaseCacheDecorator.db = self._db
+        cache.DatabaseCacheDecorator._init = True
+        self.dir.cleanup()
+
+    def _decorator(self, delay=0.0):
+        def func(key):
+            self.calls.append(key)
+            time.sleep(delay)
+            return key * 2
+        func.__module__ = __name__
+        return cache.DatabaseCacheDecorator(func, 0, 3600)
+
+    def test_lookup(self):
+        func = self._decorator()
+        self.assertEqual(func("a"), "aa")
+        self.assertEqual(func("a"), "aa")
+        self.assertEqual(self.calls, ["a"])
+
+        # a fresh decorator, like in another process, reads the database
+        func = self._decorator()
+        self.assertEqual(func("a"), "aa")
+        self.assertEqual(func("b"), "bb")
+        self.assertEqual(self.calls, ["a", "b"])
+
+        func.invalidate("a")
+        func = self._decorator()
+        self.assertEqual(func("a"), "aa")
+        self.assertEqual(self.calls, ["a", "b", "a"])
+
+    def test_lookup_only(self):
+        func = self._decorator()
+        self.assertIsNone(func.lookup("a"))
+        self.assertEqual(self.calls, [])
+        self.assertEqual(cache.stats()["entries"], 0)
+
+        func.update("a", "value")
+        self.assertEqual(self._decorator().lookup("a"), "value")
+        self.assertEqual(self.calls, [])
+
+    def test_wal(self):
+        self._decorator()("a")
+        mode = cache.DatabaseCacheDecorator.db.execute(
+            "PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_single_computation(self):
+        func = self._decorator(0.2)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(func("a")))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["aa"] * 4)
+        self.assertEqual(self.calls, ["a"])
+
+    def test_pending(self):
+        func = self._decorator()
+        func("x")
+        fullkey = func.key + "-a"
+        db = cache.DatabaseCacheDecorator.db
+
+        # another process is computing the value for 'a'
+        db.execute("INSERT INTO pending VALUES (?,?)",
+                   (fullkey, int(time.time()) + 60))
+
+        def store():
+            time.sleep(0.3)
+            con = cache._connect(self.path)
+            con.execute("INSERT INTO data VALUES (?,?,?)", (
+                fullkey, pickle.dumps("other"), int(time.time()) + 60))
+            con.execute("DELETE FROM pending")
+            con.close()
+
+        thread = threading.Thread(target=store)
+        thread.start()
+        self.assertEqual(func("a"), "other")
+        thread.join()
+        self.assertEqual(self.calls, ["x"])
+
+        # take over locks of processes that did not finish in time
+        db.execute("INSERT INTO pending VALUES (?,?)",
+                   (func.key + "-b", int(time.time())))
+        self.assertEqual(func("b"), "bb")
+        self.assertEqual(self.calls, ["x", "b"])
+
+    def test_refresh_ahead(self):
+        def func(key):
+            self.calls.append(key)
+            return len(self.calls)
+        func = cache.DatabaseCacheDecorator(func, 0, 5, refresh=10)
+
+        self.assertEqual(func("a"), 1)
+        for _ in range(50):
+            if func._refreshing:
+                time.sleep(0.01)
+        self.assertEqual(self.calls, ["a", "a"])
+        self.assertEqual(func.cache.get("a")[0], 2)
+
+        # refreshed values are stored in the database
+        func.cache.clear()
+        func.refresh = None
+        self.assertEqual(func("a"), 2)
+
+    def test_collect(self):
+        func = self._decorator()
+        func("a")
+        db = cache.DatabaseCacheDecorator.db
+        db.executemany("INSERT INTO data VALUES (?,?,?)", [
+            ("test.expired-" + str(i), b"", 0) for i in range(10)])
+
+        info = cache.stats()
+        self.assertEqual(info["entries"], 11)
+        self.assertEqual(info["expired"], 10)
+        self.assertEqual(info["functions"]["test.expired"]["entries"], 10)
+
+        self.assertEqual(cache.collect(4), 4)
+        self.assertEqual(cache.collect(), 6)
+        self.assertEqual(cache.stats()["entries"], 1)
+        self.assertEqual(func("a"), "aa")
+
+    def test_max_size(self):
+        func = self._decorator()
+        for i in range(200):
+            func("{:>1000}".format(i))
+        size = cache.stats()["size"]
+        self.assertGreater(size, 200000)
+
+        config.set(("cache", "max-size"), "100k")
+        try:
+            self.assertGreater(cache.collect(), 0)
+        finally:
+            config.clear()
+        info = cache.stats()
+        self.assertLessEqual(info["size"], 102400)
+
+        # the most recently written entries are kept
+        func = self._decorator()
+        func("{:>1000}".format(199))
+        self.assertEqual(len(self.calls), 200)
+        func("{:>1000}".format(0))
+        self.assertEqual(len(self.calls), 201)
+
+    def test_max_size_evict(self):
+        def pinned(key):
+            return key
+        pinned.__module__ = __name__
+        pinned = cache.DatabaseCacheDecorator(pinned, 0, 3600, evict=False)
+        try:
+            pinned.update("a", "a" * 1000)
+            func = self._decorator()
+            for i in range(200):
+                func("{:>1000}".format(i))
+
+            config.set(("cache", "max-size"), "100k")
+            try:
+                self.assertGreater(cache.collect(), 0)
+            finally:
+                config.clear()
+            self.assertLessEqual(cache.stats()["size"], 102400)
+            self.assertEqual(
+                cache.stats()["functions"][__name__ + ".pinned"]["entries"], 1)
+        finally:
+            cache._pinned.discard(pinned.key)
+
+    def test_index(self):
+        self._decorator()("a")
+        plan = cache.DatabaseCacheDecorator.db.execute(
+            "EXPLAIN QUERY PLAN DELETE FROM data WHERE key IN "
+            "(SELECT key FROM data WHERE expires <= 0)").fetchall()
+        self.assertIn("data_expires", str(plan))
+
+    def test_exception(self):
+        def func(key):
+            raise ValueError()
+        func = cache.DatabaseCacheDecorator(func, 0, 3600)
+        with self.assertRaises(ValueError):
+            func("a")
+        self.assertEqual(cache.DatabaseCacheDecorator.db.execute(
+            "SELECT COUNT(*) FROM pending").fetchone()[0], 0)
+
+
+class TestMemoryCache(unittest.TestCase):
+
+    def tearDown(self):
+        config.clear()
+
+    def test_lru(self):
+        config.set(("cache", "memory-entries"), 3)
+        store = cache.MemoryStore("test")
+        for key in "abc":
+            store.set(key, key)
+        self.assertEqual(store.get("a"), ("a", float("inf")))
+        store.set("d", "d")
+        self.assertEqual(list(store.data), ["c", "a", "d"])
+        self.assertIsNone(store.get("b"))
+        self.assertEqual((store.hits, store.misses, store.evictions),
+                         (1, 1, 1))
+
+    def test_size(self):
+        config.set(("cache", "memory-size"), "10k")
+        store = cache.MemoryStore("test")
+        store.set("a", ["x" * 1000, "y" * 1000])
+        self.assertGreater(store.size, 2000)
+        for key in range(10):
+            store.set(key, "x" * 2000)
+        self.assertLessEqual(store.size, 10240)
+        self.assertEqual(len(store.data), 4)
+        self.assertEqual(store.evictions, 7)
+
+        # entries larger than the limit are still kept
+        store.set("b", "x" * 20000)
+        self.assertEqual(list(store.data), ["b"])
+
+    def test_ttl(self):
+        store = cache.MemoryStore("test")
+        store.set("a", 1, 100)
+        self.assertEqual(store.get("a", 99), (1, 100))
+        self.assertIsNone(store.get("a", 100))
+        self.assertEqual(len(store.data), 0)
+        self.assertEqual(store.size, 0)
+
+    def test_single_computation(self):
+        calls = []
+
+        def func(key):
+            calls.append(key)
+            time.sleep(0.2)
+            return key * 2
+
+        for decorator in (cache.memcache(keyarg=0),
+                          cache.memcache(maxage=3600, keyarg=0)):
+            del calls[:]
+            func_cached = decorator(func)
+            threads = [
+                threading.Thread(target=func_cached, args=(key,))
+                for key in ("a", "a", "b", "a")
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(sorted(calls), ["a", "b"])
+            self.assertEqual(func_cached("a"), "aa")
+
+
+if __name__ == "__main__":
+    unittest.main()
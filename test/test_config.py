@@ -76,6 +76,20 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(config.get(["b", "c"]), "text")
         self.assertEqual(config.get(["e", "f", "g"]), None)
 
+    def test_apply_duplicate_keys(self):
+        options = (
+            (["b", "c"], 1),
+            (["e", "f"], 2),
+            (["b", "c"], 3),
+        )
+
+        with config.apply(options):
+            self.assertEqual(config.get(["b", "c"]), 3)
+            self.assertEqual(config.get(["e", "f"]), 2)
+
+        self.assertEqual(config.get(["b", "c"]), "text")
+        self.assertEqual(config.get(["e", "f"]), None)
+
 
 if __name__ == '__main__':
     unittest.main()
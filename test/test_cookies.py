@@ -56,6 +56,20 @@ class TestCookiejar(unittest.TestCase):
         self.assertEqual(cookie.name  , "NAME")
         self.assertEqual(cookie.value , "VALUE")
 
+    def test_cookiefile_shared(self):
+        config.set(CKEY, self.cookiefile)
+
+        cookies1 = extractor.find("test:").session.cookies
+        cookies2 = extractor.find("test:").session.cookies
+        self.assertIsNot(cookies1, cookies2)
+        self.assertEqual(len(cookies2), 1)
+
+        # modifying one cookiejar does not affect any others
+        cookies1.set("NAME", "CHANGED", domain=".example.org")
+        cookies3 = extractor.find("test:").session.cookies
+        self.assertEqual(cookies2.get("NAME"), "VALUE")
+        self.assertEqual(cookies3.get("NAME"), "VALUE")
+
     def test_invalid_cookiefile(self):
         self._test_warning(self.invalid_cookiefile, http.cookiejar.LoadError)
 
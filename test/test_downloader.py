@@ -9,7 +9,10 @@
 
 import re
 import sys
+import gzip
+import json
 import base64
+import hashlib
 import os.path
 import tempfile
 import threading
@@ -21,6 +24,7 @@ from unittest.mock import Mock, MagicMock, patch
 import gallery_dl.downloader as downloader
 import gallery_dl.extractor as extractor
 import gallery_dl.config as config
+import gallery_dl.scheduler as scheduler
 from gallery_dl.downloader.common import DownloaderBase
 from gallery_dl.output import NullOutput
 from gallery_dl.util import PathFormat
@@ -166,6 +170,9 @@ class TestHTTPDownloader(TestDownloaderBase):
         cls._jpg = cls.address + "/image.jpg"
         cls._png = cls.address + "/image.png"
         cls._gif = cls.address + "/image.gif"
+        cls._bin = cls.address + "/large.bin"
+        cls._flaky = cls.address + "/flaky.bin"
+        cls._gzip = cls.address + "/gzip.jpg"
 
         server = http.server.HTTPServer(("", port), HttpRequestHandler)
         threading.Thread(target=server.serve_forever, daemon=True).start()
@@ -190,6 +197,130 @@ class TestHTTPDownloader(TestDownloaderBase):
         self._run_test(self._png, None, DATA_PNG, "gif", "png")
         self._run_test(self._gif, None, DATA_GIF, "jpg", "gif")
 
+    def test_http_content_encoding(self):
+        self._run_test(self._gzip, None, DATA_JPG, "jpg", "jpg")
+
+    def test_http_chunk_size(self):
+        config.set(("downloader", "http", "chunk-size"), "100")
+        try:
+            self.downloader = downloader.find("http")(
+                self.extractor, NullOutput())
+        finally:
+            config.unset(("downloader", "http", "chunk-size"))
+        self.assertEqual(self.downloader.chunk_size, 100)
+        self._run_test(self._jpg, None, DATA_JPG, "jpg", "jpg")
+        self._run_test(self._png, DATA_PNG[:12], DATA_PNG, "png", "png")
+
+    def test_http_hash(self):
+        config.set(("downloader", "http", "hash"), "sha256")
+        try:
+            self.downloader = downloader.find("http")(
+                self.extractor, NullOutput())
+        finally:
+            config.unset(("downloader", "http", "hash"))
+
+        for url, data, partial in (
+            (self._jpg, DATA_JPG, None),
+            (self._png, DATA_PNG, DATA_PNG[:12]),
+            (self._gzip, DATA_JPG, None),
+        ):
+            pathfmt = self._prepare_destination(partial, extension="jpg")
+            self.assertTrue(self.downloader.download(url, pathfmt))
+            self.assertEqual(
+                pathfmt.keywords["_hash"], hashlib.sha256(data).hexdigest())
+
+    def test_http_segments(self):
+        downloader = self._segmented_downloader()
+        self.assertEqual(downloader.segment_size, 1024)
+
+        pathfmt = self._prepare_destination(extension="bin")
+        self.assertTrue(downloader.download(self._bin, pathfmt))
+        with pathfmt.open("rb") as file:
+            self.assertEqual(file.read(), DATA_BIN)
+        self.assertFalse(os.path.exists(pathfmt.temppath + ".segments"))
+
+    def test_http_segments_resume(self):
+        downloader = self._segmented_downloader()
+        pathfmt = self._prepare_destination(extension="bin")
+        path = pathfmt.realpath + ".part"
+
+        # first and last segment partially downloaded, second one complete
+        size = len(DATA_BIN)
+        content = bytearray(size)
+        content[0:100] = DATA_BIN[0:100]
+        content[2048:3072] = DATA_BIN[2048:3072]
+        content[3072:3500] = DATA_BIN[3072:3500]
+        segments = [[100, 2048], [3072, 3072], [3500, size]]
+        with open(path, "wb") as file:
+            file.write(content)
+        with open(path + ".segments", "w") as file:
+            json.dump({"size": size, "segments": segments}, file)
+
+        with patch.object(downloader.log, "info") as mock_info:
+            self.assertTrue(downloader.download(self._bin, pathfmt))
+        self.assertEqual(pathfmt.temppath, path)
+        self.assertEqual(
+            mock_info.call_args[0][0],
+            "Resuming segmented download (%d/%d bytes left)")
+        with pathfmt.open("rb") as file:
+            self.assertEqual(file.read(), DATA_BIN)
+        self.assertFalse(os.path.exists(path + ".segments"))
+
+    def test_http_segments_hash(self):
+        downloader = self._segmented_downloader()
+        downloader.hash = "md5"
+        pathfmt = self._prepare_destination(extension="bin")
+        self.assertTrue(downloader.download(self._bin, pathfmt))
+        self.assertEqual(
+            pathfmt.keywords["_hash"], hashlib.md5(DATA_BIN).hexdigest())
+
+    def test_http_segments_failure(self):
+        # a failed segment must not leave holes in the downloaded file,
+        # even without a .part file and its segment state
+        for part in (True, False):
+            config.set(("downloader", "part"), part)
+            try:
+                downloader = self._segmented_downloader()
+            finally:
+                config.unset(("downloader", "part"))
+            HttpRequestHandler.failures = 1
+
+            pathfmt = self._prepare_destination(extension="bin")
+            self.assertTrue(downloader.download(self._flaky, pathfmt))
+            self.assertEqual(HttpRequestHandler.failures, 0)
+            with pathfmt.open("rb") as file:
+                self.assertEqual(file.read(), DATA_BIN)
+
+    def test_http_segments_slots(self):
+        sched = scheduler.Scheduler(hosts={"127.0.0.1": {"concurrency": 2}})
+        active = []
+
+        def acquire(host, blocking=True):
+            result = scheduler.Scheduler.acquire(sched, host, blocking)
+            active.append((result, sched.active[host]))
+            return result
+
+        downloader = self._segmented_downloader()
+        pathfmt = self._prepare_destination(extension="bin")
+        with patch.object(scheduler, "_scheduler", sched), \
+                patch.object(sched, "acquire", acquire):
+            self.assertTrue(downloader.download(self._bin, pathfmt))
+        with pathfmt.open("rb") as file:
+            self.assertEqual(file.read(), DATA_BIN)
+
+        # one slot for the download and one for an additional connection
+        self.assertEqual(active, [(True, 1), (True, 2), (False, 2)])
+        self.assertEqual(sched.count, 0)
+
+    def _segmented_downloader(self):
+        config.set(("downloader", "http", "segments"), 4)
+        config.set(("downloader", "http", "segment-size"), "1k")
+        try:
+            return downloader.find("http")(self.extractor, NullOutput())
+        finally:
+            config.unset(("downloader", "http", "segments"))
+            config.unset(("downloader", "http", "segment-size"))
+
 
 class TestTextDownloader(TestDownloaderBase):
 
@@ -232,6 +363,7 @@ class FakeDownloader(DownloaderBase):
 
 
 class HttpRequestHandler(http.server.BaseHTTPRequestHandler):
+    failures = 0
 
     def do_GET(self):
         if self.path == "/image.jpg":
@@ -243,6 +375,22 @@ class HttpRequestHandler(http.server.BaseHTTPRequestHandler):
         elif self.path == "/image.gif":
             content_type = "image/gif"
             output = DATA_GIF
+        elif self.path == "/large.bin":
+            content_type = "application/octet-stream"
+            output = DATA_BIN
+        elif self.path == "/flaky.bin":
+            # fail requests for the second segment 'failures' times
+            if self.failures and self.headers.get(
+                    "Range", "").startswith("bytes=1024-"):
+                HttpRequestHandler.failures -= 1
+                self.send_response(404)
+                self.end_headers()
+                return
+            content_type = "application/octet-stream"
+            output = DATA_BIN
+        elif self.path == "/gzip.jpg":
+            content_type = "image/jpeg"
+            output = gzip.compress(DATA_JPG)
         else:
             self.send_response(404)
             self.wfile.write(self.path.encode())
@@ -252,16 +400,22 @@ class HttpRequestHandler(http.server.BaseHTTPRequestHandler):
             "Content-Type": content_type,
             "Content-Length": len(output),
         }
+        if output is DATA_BIN:
+            headers["Accept-Ranges"] = "bytes"
+        elif self.path == "/gzip.jpg":
+            headers["Content-Encoding"] = "gzip"
 
         if "Range" in self.headers:
             status = 206
 
-            match = re.match(r"bytes=(\d+)-", self.headers["Range"])
+            match = re.match(r"bytes=(\d+)-(\d*)", self.headers["Range"])
             start = int(match.group(1))
+            end = int(match.group(2) or len(output)-1)
 
             headers["Content-Range"] = "bytes {}-{}/{}".format(
-                start, len(output)-1, len(output))
-            output = output[start:]
+                start, end, len(output))
+            output = output[start:end+1]
+            headers["Content-Length"] = len(output)
         else:
             status = 200
 
@@ -298,5 +452,8 @@ R0lGODdhAQABAIAAAP///////ywAAAAA
 AQABAAACAkQBADs=""")
 
 
+DATA_BIN = bytes(range(256)) * 16
+
+
 if __name__ == "__main__":
     unittest.main()
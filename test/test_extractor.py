@@ -8,10 +8,13 @@
 # published by the Free Software Foundation.
 
 import sys
+import time
 import unittest
 import string
+import requests
 
-from gallery_dl import extractor
+from gallery_dl import extractor, config
+from gallery_dl.extractor import common
 from gallery_dl.extractor.common import Extractor, Message
 from gallery_dl.extractor.directlink import DirectlinkExtractor as DLExtractor
 
@@ -26,6 +29,22 @@ class FakeExtractor(Extractor):
         yield Message.Url, "text:foobar", {}
 
 
+class FakeSession():
+
+    def __init__(self, request, auth=None):
+        self.request = request
+        self.headers = {}
+        self.auth = auth
+
+
+def _response(code, content, **headers):
+    response = requests.Response()
+    response.status_code = code
+    response._content = content
+    response.headers.update(headers)
+    return response
+
+
 class TestExtractor(unittest.TestCase):
     VALID_URIS = (
         "https://example.org/file.jpg",
@@ -106,6 +125,220 @@ class TestExtractor(unittest.TestCase):
             with self.assertRaises(TypeError):
                 FakeExtractor.from_url(invalid)
 
+    def test_shared_adapters(self):
+        extr1 = FakeExtractor.from_url("fake:1")
+        extr2 = FakeExtractor.from_url("fake:2")
+        self.assertIsNot(extr1.session, extr2.session)
+        adapter = extr1.session.get_adapter("https://example.org/")
+        self.assertIs(adapter, extr2.session.get_adapter("https://a.b/"))
+        self.assertIs(adapter, extr2.session.get_adapter("http://a.b/"))
+
+        config.set(("extractor", "fake", "proxy"), "127.0.0.1:8080")
+        try:
+            extr3 = FakeExtractor.from_url("fake:3")
+        finally:
+            config.clear()
+        self.assertIsNot(
+            adapter, extr3.session.get_adapter("https://example.org/"))
+
+    def test_incremental(self):
+        extr = FakeExtractor.from_url("fake:incremental")
+        items = (5, 4, None, 3, 2, 1)
+        key = extr._source_key()
+        position = (lambda x: x)
+
+        # no incremental support
+        self.assertEqual(list(extr._incremental(items, position)), [
+            5, 4, None, 3, 2, 1])
+        self.assertIsNone(extr.watermark())
+
+        FakeExtractor.incremental = True
+        config.set(("extractor", "incremental"), True)
+        try:
+            extr = FakeExtractor.from_url("fake:incremental")
+            self.assertIsNone(extr.watermark())
+            self.assertEqual(list(extr._incremental(items[3:], position)), [
+                3, 2, 1])
+            extr.commit_watermark()
+
+            extr = FakeExtractor.from_url("fake:incremental")
+            self.assertEqual(extr.watermark(), 3)
+            self.assertEqual(list(extr._incremental(items, position)), [
+                5, 4, None])
+            extr.commit_watermark()
+            self.assertEqual(
+                FakeExtractor.from_url("fake:incremental").watermark(), 5)
+
+            # items only count once the next one gets requested
+            extr = FakeExtractor.from_url("fake:incremental")
+            common._watermark.invalidate(key)
+            items = extr._incremental((7, 6), position)
+            self.assertEqual(next(items), 7)
+            self.assertIsNone(extr._watermark)
+            self.assertEqual(list(items), [6])
+            self.assertEqual(extr._watermark, 7)
+        finally:
+            FakeExtractor.incremental = False
+            config.clear()
+            common._watermark.invalidate(key)
+
+    def test_checkpoint(self):
+        def paginate(resume):
+            extr = FakeExtractor.from_url("fake:checkpoint")
+            extr.resume = resume
+            self.assertIsNone(extr.checkpoint("page"))
+            for page in range(1, 4):
+                extr.update_checkpoint("page", page)
+            extr.update_checkpoint("page", 3)
+
+        key = FakeExtractor.from_url("fake:checkpoint")._source_key()
+        try:
+            # nothing gets stored without 'resume'
+            paginate(False)
+            extr = FakeExtractor.from_url("fake:checkpoint")
+            extr.resume = True
+            self.assertIsNone(extr.checkpoint("page"))
+
+            # resume from the page before the last one requested
+            paginate(True)
+            extr = FakeExtractor.from_url("fake:checkpoint")
+            extr.resume = True
+            self.assertEqual(extr.checkpoint("page"), 2)
+            self.assertIsNone(extr.checkpoint("other"))
+            extr.clear_checkpoints()
+
+            extr = FakeExtractor.from_url("fake:checkpoint")
+            extr.resume = True
+            self.assertIsNone(extr.checkpoint("page"))
+        finally:
+            common._checkpoint.invalidate(key + ":page")
+
+    def test_response_cache(self):
+        url = "https://example.org/api"
+        key = url + "?id=1"
+        sent = []
+
+        def request(method, url, **kwargs):
+            sent.append(kwargs.get("headers"))
+            return responses.pop(0)
+        session = FakeSession(request)
+
+        extr = FakeExtractor.from_url("fake:")
+        responses = [_response(200, b'{"a": 1}', ETag="abc")]
+        self.assertEqual(extr.request(
+            url, params={"id": 1}, cache=60, session=session).json(), {"a": 1})
+        self.assertIsNone(common._response.lookup(key))
+
+        config.set(("extractor", "response-cache"), True)
+        try:
+            # fresh responses are used without a request
+            extr = FakeExtractor.from_url("fake:")
+            responses = [_response(200, b'{"a": 2}', ETag="abc")]
+            for _ in range(2):
+                self.assertEqual(extr.request(
+                    url, params={"id": 1}, cache=60, session=session).json(),
+                    {"a": 2})
+            self.assertEqual(len(sent), 2)
+
+            # lookups of missing responses store nothing
+            self.assertIsNone(common._response.lookup(key + "#"))
+            self.assertIsNone(common._response._select(
+                common._response.key + "-" + key + "#", 0))
+
+            # stale responses get revalidated
+            entry = common._response.lookup(key)
+            common._response.update(key, (time.time() - 1,) + entry[1:])
+            responses = [_response(304, b"")]
+            response = extr.request(
+                url, params={"id": 1}, cache=60, session=session)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), {"a": 2})
+            self.assertEqual(sent[-1]["If-None-Match"], "abc")
+            self.assertGreater(common._response.lookup(key)[0], time.time())
+            self.assertLess(len(common._response.lookup(key)[4]), 100)
+
+            # a number overrides the maximum age of each endpoint
+            config.set(("extractor", "response-cache"), 3600)
+            extr = FakeExtractor.from_url("fake:")
+            common._response.update(key, (time.time() - 1,) + entry[1:])
+            responses = [_response(200, b'{"a": 3}')]
+            self.assertEqual(extr.request(
+                url, params={"id": 1}, cache=60, session=session).json(),
+                {"a": 3})
+            self.assertEqual(len(sent), 4)
+            entry = common._response.lookup(key)
+            self.assertGreater(entry[0], time.time() + 600)
+            self.assertIsNone(entry[1])
+        finally:
+            config.clear()
+            common._response.invalidate(key)
+
+    def test_response_cache_validate(self):
+        url = "https://example.org/api/validate"
+
+        def request(method, url, **kwargs):
+            return responses.pop(0)
+        session = FakeSession(request)
+
+        def validate(response):
+            return response.json()["stat"] == "ok"
+
+        config.set(("extractor", "response-cache"), True)
+        try:
+            # responses with API errors do not get stored
+            extr = FakeExtractor.from_url("fake:")
+            responses = [_response(200, b'{"stat": "fail"}'),
+                         _response(200, b'{"stat": "ok"}'),
+                         _response(200, b'invalid')]
+            self.assertEqual(extr.request(
+                url, cache=60, session=session, validate=validate).json(),
+                {"stat": "fail"})
+            self.assertIsNone(common._response.lookup(url))
+            for _ in range(2):
+                self.assertEqual(extr.request(
+                    url, cache=60, session=session, validate=validate).json(),
+                    {"stat": "ok"})
+            common._response.invalidate(url)
+
+            # neither do responses that cannot be validated
+            self.assertEqual(extr.request(
+                url, cache=60, session=session, validate=validate).text,
+                "invalid")
+            self.assertIsNone(common._response.lookup(url))
+        finally:
+            config.clear()
+            common._response.invalidate(url)
+
+    def test_response_cache_auth(self):
+        url = "https://example.org/api/auth"
+        keys = []
+
+        def request(method, url, **kwargs):
+            return _response(200, url.encode())
+
+        config.set(("extractor", "response-cache"), True)
+        try:
+            extr = FakeExtractor.from_url("fake:")
+            for headers, auth in (
+                    (None, None),
+                    ({"Authorization": "Bearer abc"}, None),
+                    ({"Authorization": "Bearer def"}, None),
+                    (None, ("user", "pass")),
+            ):
+                session = FakeSession(request, auth)
+                extr.request(url, cache=60, session=session, headers=headers)
+                keys.append(common._auth_identity(session, headers))
+                self.assertIsNotNone(common._response.lookup(url + keys[-1]))
+
+            # responses for different credentials are kept apart
+            self.assertEqual(keys[0], "")
+            self.assertEqual(len(set(keys)), 4)
+            self.assertNotIn("abc", keys[1])
+        finally:
+            config.clear()
+            for key in keys:
+                common._response.invalidate(url + key)
+
     def test_unique_pattern_matches(self):
         test_urls = []
 
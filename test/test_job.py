@@ -0,0 +1,655 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Mike Fährmann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+
+import re
+import os.path
+import time
+import logging
+import zipfile
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from gallery_dl import config, job, output, postprocessor, util
+from gallery_dl.extractor import common
+from gallery_dl.extractor.common import Extractor, Message
+from gallery_dl.postprocessor.common import PostProcessor
+from gallery_dl.output import NullOutput
+
+
+class FakeExtractor(Extractor):
+    category = "fakejob"
+    subcategory = "test"
+    pattern = "fakejob:"
+    filename_fmt = "{name}.{extension}"
+    archive_fmt = "{id}"
+
+    def __init__(self, files=()):
+        Extractor.__init__(self, re.match(self.pattern, "fakejob:"))
+        self.files = files
+
+    def items(self):
+        yield Message.Version, 1
+        yield Message.Directory, {}
+        for num, kwdict in enumerate(self.files):
+            kwdict.setdefault("id", num)
+            kwdict.setdefault("extension", "txt")
+            yield Message.Url, "fake:" + kwdict["name"], kwdict
+
+
+class FakeGalleryExtractor(FakeExtractor):
+    gallery_archive_fmt = "{gallery_id}"
+
+    def items(self):
+        yield Message.Version, 1
+        yield Message.Directory, {"gallery_id": 1, "count": len(self.files)}
+        for num, kwdict in enumerate(self.files):
+            kwdict.setdefault("id", num)
+            kwdict.setdefault("extension", "txt")
+            yield Message.Url, "fake:" + kwdict["name"], kwdict
+
+
+class FakeIncrementalExtractor(FakeExtractor):
+    incremental = True
+
+    def items(self):
+        yield Message.Version, 1
+        yield Message.Directory, {}
+        for kwdict in self._incremental(self.files, lambda x: x["id"]):
+            kwdict.setdefault("extension", "txt")
+            yield Message.Url, "fake:" + kwdict["name"], kwdict
+
+
+class FakePagedExtractor(FakeExtractor):
+    """Yields two files per page and records its position"""
+
+    def items(self):
+        yield Message.Version, 1
+        yield Message.Directory, {}
+        page = self.checkpoint("page") or 1
+        while page * 2 <= len(self.files):
+            self.update_checkpoint("page", page)
+            for num in range(page * 2 - 2, page * 2):
+                kwdict = self.files[num]
+                kwdict.setdefault("id", num)
+                kwdict.setdefault("extension", "txt")
+                yield Message.Url, "fake:" + kwdict["name"], kwdict
+            page += 1
+
+
+class FakeChildExtractor(Extractor):
+    category = "fakechild"
+    subcategory = "test"
+    pattern = r"fakechild:(\d+)"
+    filename_fmt = "{num}_{name}.{extension}"
+    active = []
+    maximum = 0
+    lock = threading.Lock()
+
+    def __init__(self, match):
+        Extractor.__init__(self, match)
+        self.num = int(match.group(1))
+
+    def items(self):
+        cls = self.__class__
+        with cls.lock:
+            cls.active.append(self)
+            cls.maximum = max(cls.maximum, len(cls.active))
+        try:
+            self.log.info("extracting %s", self.url)
+            time.sleep(0.05)
+            yield Message.Version, 1
+            yield Message.Directory, {}
+            for name in "abc":
+                yield Message.Url, self.url + name, {
+                    "num": self.num, "name": name, "extension": "txt",
+                    "error": self.num == 3 and name == "b"}
+        finally:
+            with cls.lock:
+                cls.active.remove(self)
+
+
+class FakeQueueExtractor(FakeExtractor):
+
+    def items(self):
+        yield Message.Version, 1
+        for num in range(self.files):
+            yield Message.Queue, "fakechild:" + str(num), {
+                "_extractor": FakeChildExtractor}
+
+
+class FakePP(PostProcessor):
+    events = []
+
+    def __init__(self, pathfmt, options):
+        PostProcessor.__init__(self)
+
+    def run(self, pathfmt):
+        time.sleep(0.05 if pathfmt.keywords["name"] == "a" else 0.01)
+        if pathfmt.keywords.get("pperror"):
+            raise ValueError("postprocessing failed")
+        self.events.append(("run", pathfmt.keywords["name"]))
+
+    def finalize(self):
+        self.events.append(("finalize",))
+
+
+class RecordingHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class RecordingOutput(NullOutput):
+
+    def __init__(self):
+        self.succeeded = []
+        self.skipped = []
+
+    def skip(self, path):
+        self.skipped.append(os.path.basename(path))
+
+    def success(self, path, tries):
+        self.succeeded.append(os.path.basename(path))
+        FakePP.events.append(("success", os.path.basename(path)[:-4]))
+
+
+class FakeJob(job.DownloadJob):
+    """DownloadJob with a fake downloader controlled by file metadata"""
+
+    def __init__(self, extr, parent=None):
+        job.DownloadJob.__init__(self, extr, parent)
+        self.out = RecordingOutput()
+        self.downloaded = []
+
+    def download(self, url, pathfmt=None):
+        kwdict = pathfmt.keywords
+        time.sleep(kwdict.get("delay", 0.0))
+        if kwdict.get("error"):
+            raise OSError(kwdict["error"])
+        if kwdict.get("fail"):
+            return False
+        with pathfmt.open("w") as file:
+            file.write(url)
+        self.extractor.log.info("downloaded %s", url)
+        self.downloaded.append(url)
+        return True
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        config.set(("base-directory",), self.dir.name)
+        config.set(("extractor", "fakejob", "directory"), ())
+        config.set(("downloader", "workers"), 3)
+
+    def tearDown(self):
+        config.clear()
+        self.dir.cleanup()
+
+    def _run(self, files):
+        self.job = FakeJob(FakeExtractor(files))
+        return self.job.run()
+
+    def _path(self, name):
+        return os.path.join(self.dir.name, name)
+
+    def _read(self, name):
+        with open(self._path(name)) as file:
+            return file.read()
+
+    def test_order(self):
+        files = [{"name": str(i), "delay": 0.05 - i * 0.01} for i in range(5)]
+        self.assertEqual(self._run(files), 0)
+        self.assertEqual(self.job.out.succeeded,
+                         ["0.txt", "1.txt", "2.txt", "3.txt", "4.txt"])
+        self.assertEqual(sorted(self.job.downloaded),
+                         ["fake:0", "fake:1", "fake:2", "fake:3", "fake:4"])
+
+    def test_collision(self):
+        # the second file has the same path as the first one,
+        # which has not been downloaded yet when it gets extracted
+        files = [
+            {"name": "same", "delay": 0.1},
+            {"name": "other"},
+            {"name": "same"},
+        ]
+        self.assertEqual(self._run(files), 0)
+        self.assertEqual(self.job.downloaded.count("fake:same"), 1)
+        self.assertEqual(self.job.out.succeeded, ["same.txt", "other.txt"])
+        self.assertEqual(self.job.out.skipped, ["same.txt"])
+        self.assertEqual(self._read("same.txt"), "fake:same")
+        self.assertFalse(self.job.inflight)
+
+    def test_collision_enumerate(self):
+        config.set(("extractor", "skip"), "enumerate")
+        files = [{"name": "same", "delay": 0.1}, {"name": "same"}]
+        self.assertEqual(self._run(files), 0)
+        self.assertEqual(self.job.out.succeeded, ["same.txt", "same.txt.1"])
+        self.assertEqual(self._read("same.txt"), "fake:same")
+        self.assertEqual(self._read("same.txt.1"), "fake:same")
+
+    def test_archive(self):
+        path = self._path("archive.sqlite3")
+        config.set(("extractor", "archive"), path)
+        files = [
+            {"name": "a", "id": 1, "delay": 0.1},
+            {"name": "b", "id": 1},
+            {"name": "c", "id": 2},
+        ]
+        self.assertEqual(self._run(files), 0)
+        self.assertEqual(sorted(self.job.downloaded), ["fake:a", "fake:c"])
+        self.assertEqual(self.job.out.skipped, ["b.txt"])
+        self.assertFalse(os.path.exists(self._path("b.txt")))
+
+        # everything got recorded
+        self.assertEqual(self._run(files), 0)
+        self.assertEqual(self.job.downloaded, [])
+        self.assertEqual(self.job.out.skipped, ["a.txt", "b.txt", "c.txt"])
+
+    def test_error(self):
+        files = [
+            {"name": "a", "delay": 0.05},
+            {"name": "b", "error": "failed"},
+            {"name": "c"},
+        ]
+        self.assertEqual(self._run(files), 1)
+        self.assertEqual(sorted(self.job.downloaded), ["fake:a", "fake:c"])
+        self.assertEqual(self.job.out.succeeded, ["a.txt", "c.txt"])
+        self.assertFalse(self.job.inflight)
+
+        # errors of the last files get noticed as well
+        self.assertEqual(self._run([{"name": "d", "error": "failed"}]), 1)
+
+    def test_skip_abort(self):
+        config.set(("extractor", "skip"), "abort:2")
+        for name in ("b.txt", "c.txt"):
+            open(self._path(name), "w").close()
+        files = [{"name": name, "delay": 0.05} for name in "abcd"]
+        self.assertEqual(self._run(files), 0)
+        self.assertEqual(self.job.downloaded, ["fake:a"])
+        self.assertEqual(self.job.out.skipped, ["b.txt", "c.txt"])
+        self.assertFalse(os.path.exists(self._path("d.txt")))
+
+        # downloads in between reset the skip counter
+        files = [{"name": name} for name in "bdce"]
+        self.assertEqual(self._run(files), 0)
+        self.assertEqual(sorted(self.job.downloaded), ["fake:d", "fake:e"])
+
+    def test_skip_abort_failed(self):
+        config.set(("extractor", "skip"), "abort:2")
+        for name in ("b.txt", "d.txt"):
+            open(self._path(name), "w").close()
+        files = [{"name": name} for name in "abcde"]
+        files[2]["fail"] = True
+
+        # without workers, failed downloads do not reset the skip counter
+        config.set(("downloader", "workers"), 1)
+        self.assertEqual(self._run(files), 1)
+        self.assertEqual(self.job.downloaded, ["fake:a"])
+        self.assertEqual(self.job.out.skipped, ["b.txt", "d.txt"])
+        self.assertFalse(os.path.exists(self._path("e.txt")))
+
+
+class TestGalleryArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        config.set(("base-directory",), self.dir.name)
+        config.set(("extractor", "fakejob", "directory"), ())
+        config.set(("extractor", "archive-galleries"), True)
+        config.set(("extractor", "archive"),
+                   os.path.join(self.dir.name, "archive.sqlite3"))
+
+    def tearDown(self):
+        config.clear()
+        self.dir.cleanup()
+
+    def _run(self):
+        files = [{"name": name, "num": num}
+                 for num, name in enumerate("abc", 1)]
+        self.job = FakeJob(FakeGalleryExtractor(files))
+        return self.job.run()
+
+    def _assert_recorded(self, recorded):
+        config.unset(("extractor", "fakejob", "image-filter"))
+        config.unset(("extractor", "fakejob", "image-range"))
+        config.unset(("extractor", "fakejob", "download"))
+        self.assertEqual(self._run(), 0)
+        if recorded:
+            self.assertEqual(self.job.out.skipped, [os.path.basename(
+                self.job.pathfmt.directory)])
+            self.assertEqual(self.job.out.succeeded, [])
+        else:
+            out = self.job.out
+            self.assertEqual(sorted(out.skipped + out.succeeded),
+                             ["a.txt", "b.txt", "c.txt"])
+
+    def test_complete(self):
+        self.assertEqual(self._run(), 0)
+        self.assertEqual(len(self.job.downloaded), 3)
+        self._assert_recorded(True)
+
+    def test_filter(self):
+        config.set(("extractor", "fakejob", "image-filter"), "name != 'b'")
+        self.assertEqual(self._run(), 0)
+        self.assertEqual(self.job.downloaded, ["fake:a", "fake:c"])
+        self._assert_recorded(False)
+
+    def test_range(self):
+        config.set(("extractor", "fakejob", "image-range"), "1-2")
+        self.assertEqual(self._run(), 0)
+        self.assertEqual(self.job.downloaded, ["fake:a", "fake:b"])
+        self._assert_recorded(False)
+
+    def test_range_start(self):
+        config.set(("extractor", "fakejob", "image-range"), "2-")
+        self.assertEqual(self._run(), 0)
+        self.assertEqual(self.job.downloaded, ["fake:b", "fake:c"])
+        self._assert_recorded(False)
+
+    def test_no_download(self):
+        config.set(("extractor", "fakejob", "download"), False)
+        self.assertEqual(self._run(), 0)
+        self.assertEqual(self.job.downloaded, [])
+        self._assert_recorded(False)
+
+    def test_key(self):
+        extr = FakeGalleryExtractor()
+        djob = FakeJob(extr)
+        self.assertEqual(djob._gallery_key(extr, {"gallery_id": 5}),
+                         "fakejob5")
+        self.assertIsNone(djob._gallery_key(extr, {}))
+
+        extr.gallery_archive_fmt = "{gallery_id:>03}_{chapter!l}"
+        self.assertEqual(djob._gallery_key(
+            extr, {"gallery_id": 5, "chapter": "A"}), "fakejob005_a")
+        self.assertIsNone(djob._gallery_key(extr, {"gallery_id": 5}))
+
+
+class TestRange(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        config.set(("base-directory",), self.dir.name)
+        config.set(("extractor", "fakejob", "directory"), ())
+
+    def tearDown(self):
+        config.clear()
+        self.dir.cleanup()
+
+    def _run(self):
+        files = [{"name": name} for name in "abcd"]
+        self.job = FakeJob(FakeExtractor(files))
+        with patch.object(FakeExtractor, "commit_watermark") as commit, \
+                patch.object(FakeExtractor, "clear_checkpoints") as clear:
+            self.assertEqual(self.job.run(), 0)
+        return commit.call_count, clear.call_count
+
+    def test_exhausted(self):
+        config.set(("extractor", "fakejob", "image-range"), "2-3")
+        self.assertEqual(self._run(), (0, 1))
+        self.assertTrue(self.job.finished)
+        self.assertEqual(self.job.downloaded, ["fake:b", "fake:c"])
+
+    def test_abort(self):
+        config.set(("extractor", "skip"), "abort:1")
+        open(os.path.join(self.dir.name, "b.txt"), "w").close()
+        self.assertEqual(self._run(), (0, 0))
+        self.assertFalse(self.job.finished)
+        self.assertEqual(self.job.downloaded, ["fake:a"])
+
+    def test_incremental(self):
+        config.set(("extractor", "incremental"), True)
+        key = FakeIncrementalExtractor()._source_key()
+
+        def run():
+            files = [{"name": str(num), "id": num}
+                     for num in range(10, 0, -1)]
+            self.job = FakeJob(FakeIncrementalExtractor(files))
+            self.assertEqual(self.job.run(), 0)
+            return sorted(int(url[5:]) for url in self.job.downloaded)
+
+        try:
+            # a range keeps the newest item from being remembered
+            config.set(("extractor", "fakejob", "image-range"), "1-2")
+            self.assertEqual(run(), [9, 10])
+            self.assertIsNone(common._watermark.lookup(key))
+
+            config.unset(("extractor", "fakejob", "image-range"))
+            self.assertEqual(run(), list(range(1, 9)))
+            self.assertEqual(common._watermark.lookup(key), 10)
+            self.assertEqual(run(), [])
+        finally:
+            common._watermark.invalidate(key)
+
+    def test_incremental_filter(self):
+        config.set(("extractor", "incremental"), True)
+        key = FakeIncrementalExtractor()._source_key()
+
+        def run():
+            files = [{"name": str(num), "id": num}
+                     for num in range(5, 0, -1)]
+            self.job = FakeJob(FakeIncrementalExtractor(files))
+            self.assertEqual(self.job.run(), 0)
+            return sorted(int(url[5:]) for url in self.job.downloaded)
+
+        try:
+            # items rejected by a filter are not remembered as seen
+            config.set(("extractor", "fakejob", "image-filter"), "id > 3")
+            self.assertEqual(run(), [4, 5])
+            self.assertIsNone(common._watermark.lookup(key))
+
+            config.unset(("extractor", "fakejob", "image-filter"))
+            self.assertEqual(run(), [1, 2, 3])
+            self.assertEqual(common._watermark.lookup(key), 5)
+        finally:
+            common._watermark.invalidate(key)
+
+
+class TestResume(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        config.set(("base-directory",), self.dir.name)
+        config.set(("extractor", "fakejob", "directory"), ())
+        self.key = FakePagedExtractor()._source_key() + ":page"
+
+    def tearDown(self):
+        config.clear()
+        self.dir.cleanup()
+        common._checkpoint.invalidate(self.key)
+
+    def _files(self, **extra):
+        files = [{"name": name} for name in "abcdef"]
+        files[0].update(extra)
+        return files
+
+    def _run(self, files, status=0):
+        self.job = FakeJob(FakePagedExtractor(files))
+        self.assertEqual(self.job.run(), status)
+        return self.job.downloaded
+
+    def test_other_jobs(self):
+        config.set(("extractor", "resume"), True)
+        with patch("builtins.print") as print:
+            self.assertEqual(
+                job.UrlJob(FakePagedExtractor(self._files())).run(), 0)
+        self.assertEqual(print.call_count, 6)
+        self.assertIsNone(common._checkpoint.lookup(self.key))
+
+        # a simulation does not store its position either
+        files = self._files()
+        job.SimulationJob(FakePagedExtractor(files)).run()
+        self.assertIsNone(common._checkpoint.lookup(self.key))
+
+        # a following download starts on the first page
+        self.assertEqual(len(self._run(self._files())), 6)
+
+    def test_failed_file(self):
+        # a run that reaches its end does not leave a position behind,
+        # even with a failed file
+        config.set(("extractor", "resume"), True)
+        self.assertEqual(len(self._run(self._files(fail=True), 1)), 5)
+        self.assertIsNone(common._checkpoint.lookup(self.key))
+
+        # which gets retried from the start on the next run
+        self.assertEqual(self._run(self._files()), ["fake:a"])
+
+    def test_interrupted(self):
+        config.set(("extractor", "resume"), True)
+        config.set(("extractor", "skip"), "abort:1")
+        for name in "ef":
+            open(os.path.join(self.dir.name, name + ".txt"), "w").close()
+        self.assertEqual(len(self._run(self._files())), 4)
+        self.assertEqual(common._checkpoint.lookup(self.key), 2)
+
+        # resume on the page before the last one requested
+        config.unset(("extractor", "skip"))
+        os.unlink(os.path.join(self.dir.name, "c.txt"))
+        self.assertEqual(self._run(self._files()), ["fake:c"])
+        self.assertIsNone(common._checkpoint.lookup(self.key))
+
+    def test_disabled(self):
+        config.set(("extractor", "skip"), "abort:1")
+        for name in "ef":
+            open(os.path.join(self.dir.name, name + ".txt"), "w").close()
+        self.assertEqual(len(self._run(self._files())), 4)
+        self.assertIsNone(common._checkpoint.lookup(self.key))
+
+
+class TestPostprocessorWorkers(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        config.set(("base-directory",), self.dir.name)
+        config.set(("extractor", "fakejob", "directory"), ["sub"])
+        config.set(("extractor", "fakejob", "postprocessor-workers"), 3)
+        postprocessor._cache["fakepp"] = FakePP
+        del FakePP.events[:]
+
+    def tearDown(self):
+        del postprocessor._cache["fakepp"]
+        config.clear()
+        self.dir.cleanup()
+
+    def _run(self, files):
+        self.job = FakeJob(FakeExtractor(files))
+        return self.job.run()
+
+    def test_finalize(self):
+        config.set(("postprocessors",), [{"name": "fakepp"}])
+        config.set(("extractor", "archive"),
+                   os.path.join(self.dir.name, "archive.sqlite3"))
+        events = FakePP.events
+        added = []
+
+        def add(archive, kwdict):
+            events.append(("archive", kwdict["name"]))
+            added.append(kwdict["name"])
+            return util.DownloadArchive.add.__wrapped__(archive, kwdict)
+        add.__wrapped__ = util.DownloadArchive.add
+
+        files = [{"name": name} for name in "abcde"]
+        with patch.object(util.DownloadArchive, "add", add):
+            self.assertEqual(self._run(files), 0)
+
+        # each file gets moved and recorded after its postprocessing,
+        # in their original order, and 'finalize' comes last
+        for name in "abcde":
+            index = events.index(("run", name))
+            self.assertLess(index, events.index(("success", name)))
+            self.assertLess(index, events.index(("archive", name)))
+        self.assertEqual(added, list("abcde"))
+        self.assertEqual(self.job.out.succeeded,
+                         ["a.txt", "b.txt", "c.txt", "d.txt", "e.txt"])
+        self.assertEqual(events[-1], ("finalize",))
+        self.assertEqual(events.count(("finalize",)), 1)
+
+    def test_zip(self):
+        config.set(("postprocessors",), [{"name": "zip"}])
+        files = [{"name": str(num)} for num in range(20)]
+        self.assertEqual(self._run(files), 0)
+
+        with zipfile.ZipFile(os.path.join(self.dir.name, "sub.zip")) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(
+                sorted(zf.namelist()),
+                sorted(kwdict["name"] + ".txt" for kwdict in files))
+            self.assertEqual(zf.read("7.txt"), b"fake:7")
+        self.assertFalse(os.path.exists(os.path.join(self.dir.name, "sub")))
+
+    def test_error(self):
+        config.set(("postprocessors",), [{"name": "fakepp"}])
+        files = [{"name": "a"}, {"name": "b", "pperror": True}, {"name": "c"}]
+        self.assertEqual(self._run(files), 1)
+        self.assertEqual(self.job.out.succeeded, ["a.txt", "c.txt"])
+        self.assertEqual(FakePP.events[-1], ("finalize",))
+
+        # errors of the last files get noticed as well
+        self.assertEqual(self._run([{"name": "d", "pperror": True}]), 1)
+
+
+class TestQueueConcurrency(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        logging.setLoggerClass(output.Logger)
+        cls.log = logging.getLogger(FakeChildExtractor.category)
+        logging.setLoggerClass(logging.Logger)
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        config.set(("base-directory",), self.dir.name)
+        config.set(("extractor", "fakejob", "queue-concurrency"), 3)
+        config.set(("extractor", "fakechild", "directory"), ())
+        config.set(("downloader", "workers"), 2)
+        self.handler = RecordingHandler()
+        self.log.addHandler(self.handler)
+        self.log.setLevel(logging.INFO)
+
+    def tearDown(self):
+        self.log.removeHandler(self.handler)
+        config.clear()
+        self.dir.cleanup()
+
+    def test_children(self):
+        parent = FakeJob(FakeQueueExtractor(6))
+        self.assertEqual(parent.run(), 1)
+        self.assertGreater(FakeChildExtractor.maximum, 1)
+        self.assertLessEqual(FakeChildExtractor.maximum, 3)
+
+        files = sorted(os.listdir(self.dir.name))
+        self.assertEqual(len(files), 17)
+        self.assertNotIn("3_b.txt", files)
+
+    def test_log_attribution(self):
+        FakeJob(FakeQueueExtractor(6)).run()
+
+        records = self.handler.records
+        self.assertEqual(len(records), 6 + 17)
+        for record in records:
+            # messages of child jobs and of their download threads
+            # are attributed to their own extractor and job
+            self.assertIsInstance(record.extractor, FakeChildExtractor)
+            self.assertIs(record.job.extractor, record.extractor)
+            self.assertTrue(record.args[0].startswith(record.extractor.url))
+
+        # the context of the main thread is unchanged
+        self.assertEqual(output.get_context(), (util.NONE, util.NONE))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Mike Fährmann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+
+import os.path
+import time
+import tempfile
+import threading
+import unittest
+
+from gallery_dl.scheduler import Scheduler, TokenBucket, SharedTokenBucket
+
+
+class TestScheduler(unittest.TestCase):
+
+    def test_limits(self):
+        scheduler = Scheduler(0, 4, 0.5, {
+            "example.org": {"concurrency": 1},
+            "a.example.org": {"interval": 2.0},
+        })
+        self.assertEqual(scheduler.limits("example.com"), (4, 0.5))
+        self.assertEqual(scheduler.limits("example.org"), (1, 0.5))
+        self.assertEqual(scheduler.limits("i.example.org"), (1, 0.5))
+        self.assertEqual(scheduler.limits("a.example.org"), (4, 2.0))
+        self.assertEqual(scheduler.limits("b.a.example.org"), (4, 2.0))
+
+    def test_unlimited(self):
+        scheduler = Scheduler()
+        with scheduler.slot("https://example.org/"):
+            self.assertFalse(scheduler.active)
+
+    def test_concurrency(self):
+        scheduler = Scheduler(0, 2)
+        active = []
+        maximum = []
+        lock = threading.Lock()
+
+        def request():
+            with scheduler.slot("https://example.org/file"):
+                with lock:
+                    active.append(1)
+                    maximum.append(len(active))
+                time.sleep(0.02)
+                with lock:
+                    active.pop()
+
+        self._run_threads(request, 6)
+        self.assertEqual(max(maximum), 2)
+        self.assertEqual(scheduler.count, 0)
+        self.assertFalse(scheduler.active)
+
+    def test_interval(self):
+        scheduler = Scheduler(0, 0, 0.05)
+        start = time.time()
+        for _ in range(3):
+            with scheduler.slot("https://example.org/"):
+                pass
+        self.assertGreaterEqual(time.time() - start, 0.1)
+
+        # different hosts are not affected
+        start = time.time()
+        with scheduler.slot("https://example.com/"):
+            pass
+        self.assertLess(time.time() - start, 0.05)
+
+    def test_fairness(self):
+        scheduler = Scheduler(1)
+        order = []
+
+        def request(host):
+            with scheduler.slot("https://" + host + "/"):
+                order.append(host)
+
+        scheduler.acquire("a")
+        threads = []
+        for host in ("a", "a", "a", "b"):
+            thread = threading.Thread(target=request, args=(host,))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.02)
+        scheduler.release("a")
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order, ["a", "b", "a", "a"])
+
+    def test_throttle(self):
+        scheduler = Scheduler(hosts={"example.org": {"concurrency": 2}})
+        self.assertIsNone(scheduler.throttle("https://example.org/"))
+
+        scheduler = Scheduler(rate="1M", hosts={
+            "example.org": {"rate": "100k"},
+        })
+        throttle = scheduler.throttle("https://example.com/")
+        self.assertEqual(len(throttle.buckets), 1)
+        self.assertEqual(throttle.buckets[0].rate, 1048576)
+        self.assertEqual(throttle.chunk_size, 104857)
+
+        throttle = scheduler.throttle("https://i.example.org/")
+        self.assertEqual(len(throttle.buckets), 2)
+        self.assertEqual(throttle.buckets[1].rate, 102400)
+        self.assertEqual(throttle.chunk_size, 16384)
+
+        # buckets are shared by all transfers from the same domain
+        self.assertIs(
+            throttle.buckets[1],
+            scheduler.throttle("https://example.org/").buckets[1],
+        )
+
+    @staticmethod
+    def _run_threads(target, num):
+        threads = [threading.Thread(target=target) for _ in range(num)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_reserve(self):
+        bucket = TokenBucket(1000)
+        self.assertEqual(bucket.reserve(600), 0.0)
+        self.assertEqual(bucket.reserve(400), 0.0)
+
+        # tokens exhausted: wait for the deficit
+        self.assertAlmostEqual(bucket.reserve(500), 0.5, 1)
+        self.assertAlmostEqual(bucket.reserve(500), 1.0, 1)
+
+    def test_refill(self):
+        bucket = TokenBucket(1000)
+        bucket.reserve(1000)
+        bucket.last -= 0.5
+        self.assertAlmostEqual(bucket.reserve(500), 0.0, 1)
+
+        # no more than one second worth of tokens
+        bucket.last -= 10.0
+        self.assertEqual(bucket.reserve(1000), 0.0)
+        self.assertGreater(bucket.reserve(100), 0.0)
+
+    def test_shared(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "rate")
+            bucket1 = SharedTokenBucket(1000, path, "")
+            bucket2 = SharedTokenBucket(1000, path, "")
+            other = SharedTokenBucket(1000, path, "example.org")
+
+            self.assertEqual(bucket1.reserve(1000), 0.0)
+            self.assertAlmostEqual(bucket2.reserve(500), 0.5, 1)
+            self.assertEqual(other.reserve(1000), 0.0)
+            self.assertAlmostEqual(bucket1.reserve(500), 1.0, 1)
+
+            # invalid file content
+            with open(path, "w") as file:
+                file.write("foobar")
+            self.assertEqual(bucket1.reserve(1000), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
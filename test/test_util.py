@@ -8,11 +8,15 @@
 # published by the Free Software Foundation.
 
 import unittest
+from unittest.mock import patch
 import sys
+import os
+import time
 import random
 import string
+import tempfile
 
-from gallery_dl import util, text, exception
+from gallery_dl import util, text, exception, config, extractor
 
 
 class TestRange(unittest.TestCase):
@@ -76,6 +80,19 @@ class TestPredicate(unittest.TestCase):
         with self.assertRaises(exception.StopExtraction):
             bool(pred(dummy, dummy))
 
+        pred = util.RangePredicate("20-, 2-4, 8, 10-12")
+        result = [i for i in range(1, 30) if pred(dummy, dummy)]
+        self.assertEqual(
+            result, [2, 3, 4, 8, 10, 11, 12] + list(range(20, 30)))
+        self.assertFalse(pred.exhausted)
+
+        pred = util.RangePredicate("2-3")
+        self.assertFalse(pred(dummy, dummy))
+        self.assertTrue(pred(dummy, dummy))
+        self.assertFalse(pred.exhausted)
+        self.assertTrue(pred(dummy, dummy))
+        self.assertTrue(pred.exhausted)
+
     def test_unique_predicate(self):
         dummy = None
         pred = util.UniquePredicate()
@@ -159,6 +176,7 @@ class TestISO639_1(unittest.TestCase):
 
 
 class TestFormatter(unittest.TestCase):
+    formatter = util.Formatter
 
     kwdict = {
         "a": "hElLo wOrLd",
@@ -273,12 +291,193 @@ class TestFormatter(unittest.TestCase):
         self._run_test("{a!l:Rl//}" , "heo word")
         self._run_test("{name:Rame/othing/}", "Nothing")
 
+    def test_literals(self):
+        self._run_test("", "")
+        self._run_test("foo", "foo")
+        self._run_test("{{}}'\"\\{name}", "{}'\"\\Name")
+        self._run_test("{name!u}_{l!S}{l[1:]!S}", "NAME_a, b, cb, c")
+
     def _run_test(self, format_string, result, default=None):
-        formatter = util.Formatter(format_string, default)
+        formatter = self.formatter(format_string, default)
         output = formatter.format_map(self.kwdict)
         self.assertEqual(output, result, format_string)
 
 
+class TestCompiledFormatter(TestFormatter):
+    formatter = util.CompiledFormatter
+
+    def test_cache(self):
+        fmt = "{a!l:Rl/_/}-{title3:?[/]/}"
+        formatter1 = self.formatter(fmt)
+        formatter2 = self.formatter(fmt, "default")
+        self.assertIn(fmt, util.CompiledFormatter.cache)
+        self.assertEqual(formatter1.format_map(self.kwdict), "he__o wor_d-")
+        self.assertEqual(formatter2.format_map({}), "defau_t-[default]")
+
+    @unittest.skipUnless(os.environ.get("GALLERYDL_BENCHMARK"),
+                         "set GALLERYDL_BENCHMARK to run benchmarks")
+    def test_benchmark(self, num=200000):
+        fmt = ("{category}_{id:>010}_{title!l:R /_/}{page:?_p//}"
+               "{tags:J,/}.{extension}")
+        kwdict = {"category": "test", "id": 12345, "title": "Foo Bar",
+                  "page": 2, "tags": ["a", "b", "c"], "extension": "jpg"}
+
+        print(file=sys.stderr)
+        for formatter in (util.Formatter, util.CompiledFormatter):
+            format_map = formatter(fmt).format_map
+            start = time.perf_counter()
+            for _ in range(num):
+                format_map(kwdict)
+            elapsed = time.perf_counter() - start
+            print("{:<18}: {:.0f} calls/s".format(
+                formatter.__name__, num / elapsed), file=sys.stderr)
+
+
+class TestPathFormat(unittest.TestCase):
+    DIRECTORY_FMT = ["{category}", "{id:?_//>03}", "{title!l:R /_/}"]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.TemporaryDirectory()
+        config.set(("base-directory",), cls.dir.name)
+        config.set(("extractor", "test", "directory"), cls.DIRECTORY_FMT)
+        config.set(("extractor", "test", "filename"),
+                   "{id}_{num:>03}_{title:J, /}.{extension}")
+        cls.extractor = extractor.find("test:")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.dir.cleanup()
+        config.clear()
+
+    def test_set_directory(self):
+        pathfmt = util.PathFormat(self.extractor)
+        kwdict = {"category": "test", "id": 5, "title": "Foo Bar"}
+
+        with patch("os.makedirs") as makedirs:
+            for _ in range(3):
+                pathfmt.set_directory(kwdict)
+            kwdict["id"] = 6
+            pathfmt.set_directory(kwdict)
+            pathfmt.copy().set_directory(kwdict)
+
+        self.assertEqual(pathfmt.directory, os.path.join(
+            self.dir.name, "test", "_006", "foo_bar"))
+        self.assertEqual(makedirs.call_count, 2)
+
+    def test_exists(self):
+        pathfmt = util.PathFormat(self.extractor)
+        kwdict = {"category": "test", "id": 7, "title": "exists",
+                  "num": 1, "extension": "jpg"}
+        pathfmt.set_directory(kwdict)
+        for name in ("7_001_e, x, i, s, t, s.jpg", "other.txt"):
+            open(os.path.join(pathfmt.realdirectory, name), "w").close()
+
+        with patch("os.path.exists", return_value=False) as exists:
+            pathfmt.set_keywords(kwdict)
+            self.assertTrue(pathfmt.exists())
+            kwdict["num"] = 2
+            pathfmt.set_keywords(kwdict)
+            self.assertFalse(pathfmt.exists())
+        self.assertEqual(exists.call_count, 1)
+
+        # finalized files get added to the index
+        with pathfmt.open() as file:
+            file.write(b"")
+        pathfmt.finalize()
+        with patch("os.path.exists") as exists:
+            self.assertTrue(pathfmt.exists())
+        self.assertEqual(exists.call_count, 0)
+
+    def test_enumerate(self):
+        config.set(("extractor", "test", "skip"), "enumerate")
+        try:
+            pathfmt = util.PathFormat(self.extractor)
+        finally:
+            config.unset(("extractor", "test", "skip"))
+        pathfmt.check_file = pathfmt._enum_file
+        kwdict = {"category": "test", "id": 8, "title": "enum",
+                  "num": 1, "extension": "jpg"}
+        pathfmt.set_directory(kwdict)
+        pathfmt.set_keywords(kwdict)
+        for suffix in ("", ".1", ".2", ".3"):
+            open(pathfmt.realpath + suffix, "w").close()
+
+        with patch("os.path.exists", return_value=False) as exists:
+            pathfmt.set_keywords(kwdict)
+            self.assertFalse(pathfmt.exists())
+        self.assertEqual(pathfmt.suffix, ".4")
+        self.assertTrue(pathfmt.realpath.endswith(".jpg.4"))
+        self.assertEqual(exists.call_count, 1)
+
+        with pathfmt.open() as file:
+            file.write(b"")
+        pathfmt.finalize()
+        pathfmt.set_keywords(kwdict)
+        self.assertFalse(pathfmt.exists())
+        self.assertEqual(pathfmt.suffix, ".5")
+
+    def test_listing(self):
+        pathfmt = util.PathFormat(self.extractor)
+        kwdict = {"category": "test", "id": 9, "title": "listing",
+                  "num": 1, "extension": "jpg"}
+        pathfmt.set_directory(kwdict)
+        pathfmt.set_keywords(kwdict)
+        self.assertFalse(pathfmt.exists())
+        self.assertEqual(list(pathfmt.listing), [pathfmt.realdirectory])
+
+        # changing directories drops the index of the previous one
+        kwdict["id"] = 10
+        pathfmt.set_directory(kwdict)
+        self.assertEqual(pathfmt.listing, {})
+        pathfmt.set_keywords(kwdict)
+        self.assertFalse(pathfmt.exists())
+        self.assertEqual(list(pathfmt.listing), [pathfmt.realdirectory])
+
+        # deleted files get removed from the index
+        with pathfmt.open() as file:
+            file.write(b"")
+        pathfmt.delete = True
+        pathfmt.finalize()
+        with patch("os.path.exists", return_value=False):
+            self.assertFalse(pathfmt.exists())
+
+        with pathfmt.open() as file:
+            file.write(b"")
+        pathfmt.finalize()
+        self.assertTrue(pathfmt.exists())
+        self.assertTrue(pathfmt.deduplicate(pathfmt.realpath, "skip"))
+        self.assertFalse(os.path.exists(pathfmt.realpath))
+        with patch("os.path.exists", return_value=False):
+            self.assertFalse(pathfmt.exists())
+
+    def test_directory_format_error(self):
+        config.set(("extractor", "test", "directory"), ["{id:?/}"])
+        try:
+            with self.assertRaises(exception.FormatError):
+                util.PathFormat(extractor.find("test:"))
+        finally:
+            config.set(("extractor", "test", "directory"), self.DIRECTORY_FMT)
+
+    @unittest.skipUnless(os.environ.get("GALLERYDL_BENCHMARK"),
+                         "set GALLERYDL_BENCHMARK to run benchmarks")
+    def test_benchmark(self, num=100000):
+        pathfmt = util.PathFormat(self.extractor)
+        kwdict = {"category": "test", "id": 5, "title": "Foo Bar",
+                  "num": 0, "extension": "jpg"}
+
+        start = time.perf_counter()
+        for i in range(num):
+            kwdict["id"] = i % 100
+            kwdict["num"] = i
+            pathfmt.set_directory(kwdict)
+            pathfmt.set_keywords(kwdict)
+        elapsed = time.perf_counter() - start
+
+        print("\nset_directory + build_path: {:.0f} paths/s".format(
+            num / elapsed), file=sys.stderr)
+
+
 class TestOther(unittest.TestCase):
 
     def test_bencode(self):
@@ -391,5 +590,169 @@ class TestOther(unittest.TestCase):
         self.assertIs(obj["key"], obj)
 
 
+class TestDownloadArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "archive.sqlite3")
+        self.extractor = extractor.find("test:")
+        self.extractor.archive_fmt = "{id}"
+
+    def tearDown(self):
+        config.clear()
+        self.dir.cleanup()
+
+    def test_batch(self):
+        config.set(("extractor", "archive-batch"), 3)
+        archive = util.DownloadArchive(self.path, self.extractor)
+        other = util.DownloadArchive(self.path, self.extractor)
+
+        archive.add({"id": 1})
+        archive.add({"id": 2})
+        self.assertTrue(archive.check({"id": 1}))
+        self.assertFalse(other.check({"id": 1}))
+
+        archive.add({"id": 3})
+        self.assertFalse(archive.pending)
+        for i in range(1, 4):
+            self.assertTrue(other.check({"id": i}))
+        self.assertFalse(other.check({"id": 4}))
+
+        archive.add({"id": 4})
+        archive.close()
+        self.assertTrue(other.check({"id": 4}))
+        other.close()
+
+    def test_batch_interval(self):
+        config.set(("extractor", "archive-batch-interval"), 0.0)
+        archive = util.DownloadArchive(self.path, self.extractor)
+        archive.add({"id": 1})
+        self.assertFalse(archive.pending)
+        archive.close()
+
+    def test_no_batch(self):
+        config.set(("extractor", "archive-batch"), 1)
+        config.set(("extractor", "archive-synchronous"), "full")
+        archive = util.DownloadArchive(self.path, self.extractor)
+        other = util.DownloadArchive(self.path, self.extractor)
+
+        archive.add({"id": 1})
+        self.assertFalse(archive.pending)
+        self.assertTrue(other.check({"id": 1}))
+        archive.cursor.execute("PRAGMA synchronous")
+        self.assertEqual(archive.cursor.fetchone()[0], 2)
+        archive.cursor.execute("PRAGMA journal_mode")
+        self.assertEqual(archive.cursor.fetchone()[0], "wal")
+
+        archive.close()
+        other.close()
+
+    def test_galleries(self):
+        config.set(("extractor", "archive-galleries"), True)
+        archive = util.DownloadArchive(self.path, self.extractor)
+        self.assertFalse(archive.check_gallery("test1"))
+
+        archive.add_gallery("test1", "10")
+        self.assertTrue(archive.check_gallery("test1"))
+        self.assertTrue(archive.check_gallery("test1", "10"))
+        self.assertFalse(archive.check_gallery("test1", "11"))
+
+        archive.add_gallery("test1", "11")
+        self.assertTrue(archive.check_gallery("test1", "11"))
+        self.assertFalse(archive.check_gallery("test2"))
+        archive.close()
+
+    def test_preload(self):
+        archive = util.DownloadArchive(self.path, self.extractor)
+        for i in range(10):
+            archive.add({"id": i})
+        archive.close()
+
+        for preload, keys, bloom in (
+                (True, True, False), ("1k", False, True),
+                ("10", False, False)):
+            util.DownloadArchive._preloaded.clear()
+            config.set(("extractor", "archive-preload"), preload)
+            archive = util.DownloadArchive(self.path, self.extractor)
+            self.assertEqual(archive.keys is not None, keys)
+            self.assertEqual(archive.bloom is not None, bloom)
+
+            for i in range(10):
+                self.assertTrue(archive.check({"id": i}))
+            new = {"id": "new" + str(preload)}
+            self.assertFalse(archive.check(new))
+            archive.add(new)
+            self.assertTrue(archive.check(new))
+            archive.close()
+
+        self.assertEqual(archive.keys, None)
+        util.DownloadArchive._preloaded.clear()
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_bloom_filter(self):
+        bloom = util.BloomFilter(1000)
+        self.assertEqual(len(bloom.bits), util.BloomFilter.memory(1000))
+        self.assertEqual(bloom.hashes, 7)
+
+        keys = [str(i) for i in range(1000)]
+        bloom.update(keys[:500])
+        for key in keys[500:]:
+            bloom.add(key)
+        for key in keys:
+            self.assertIn(key, bloom)
+
+        positives = sum(str(i) in bloom for i in range(1000, 11000))
+        self.assertLess(positives, 300)
+
+
+class TestContentIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_index(self):
+        index = util.ContentIndex(os.path.join(self.dir.name, "index"))
+        self.assertIsNone(index.get("abcdef"))
+
+        index.add("abcdef", "/tmp/file.jpg")
+        self.assertEqual(index.get("abcdef"), "/tmp/file.jpg")
+        index.add("abcdef", "/tmp/other.jpg")
+        self.assertEqual(index.get("abcdef"), "/tmp/other.jpg")
+
+    def test_deduplicate(self):
+        original = os.path.join(self.dir.name, "original")
+        with open(original, "w") as file:
+            file.write("content")
+
+        for mode in ("hardlink", "skip"):
+            pathfmt = self._pathfmt(mode)
+            self.assertTrue(pathfmt.deduplicate(original, mode))
+
+            if mode == "skip":
+                self.assertFalse(os.path.exists(pathfmt.realpath))
+            else:
+                self.assertTrue(os.path.samefile(original, pathfmt.realpath))
+
+        # failure keeps the downloaded file
+        pathfmt = self._pathfmt("missing")
+        missing = os.path.join(self.dir.name, "missing")
+        self.assertFalse(pathfmt.deduplicate(missing))
+        with open(pathfmt.realpath) as file:
+            self.assertEqual(file.read(), "content")
+
+    def _pathfmt(self, name):
+        pathfmt = util.PathFormat.__new__(util.PathFormat)
+        pathfmt.listing = {}
+        pathfmt.realpath = os.path.join(self.dir.name, name + ".txt")
+        with open(pathfmt.realpath, "w") as file:
+            file.write("content")
+        return pathfmt
+
+
 if __name__ == '__main__':
     unittest.main()